@@ -0,0 +1,419 @@
+"""Headless benchmarks of the web-ui's own hot paths, written out as JSON.
+
+Needs neither a GPU nor a browser: the UI is built and launched on localhost,
+and the events are sent with gradio_client. Run from the repository root:
+
+    python -m benchmarks.suite [--output results.json] [--sessions 1 4 16]
+
+Benchmarks:
+    build          WebUI construction with every tab, eager and on-demand forms
+    generate_args  introspecting and building the form of every registered config
+    args_cmd       get_model_args / get_data_parser_args / generate_cmd per method
+    events         Show Command round trip through the gradio queue under N
+                   concurrent sessions
+    payload        components and bytes the browser sends with the config
+                   handlers, the form values stay on the server
+    training_latency
+                   event latency while a synthetic training loop runs on a
+                   thread of the web-ui process or in a worker process
+
+Compare the JSON of two releases to track regressions.
+"""
+
+import argparse
+import collections
+import functools
+import json
+import math
+import multiprocessing
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+# keep the launched UI from reporting to the gradio analytics service
+os.environ.setdefault("GRADIO_ANALYTICS_ENABLED", "False")
+
+import gradio as gr
+
+from utils.arg_spec_cache import get_package_version
+from utils.status_channel import StatusChannel
+from utils.utils import generate_args, get_arg_specs
+from webui import WebUI, get_parser
+
+BENCHMARKS = (
+    "build", "generate_args", "args_cmd", "events", "payload", "training_latency"
+)
+# the handlers whose inputs the browser sends on Train, Process, Export and the like
+PAYLOAD_HANDLERS = (
+    "run_train",
+    "run_sweep",
+    "run_dataprocessor",
+    "run_batch",
+    "run_exporter",
+    "generate_cmd",
+)
+TRAINING_STATES = ("initializing", "training", "stopped")
+
+
+def summarize(times_ms):
+    times_ms = sorted(times_ms)
+    return {
+        "count": len(times_ms),
+        "median_ms": statistics.median(times_ms),
+        "p95_ms": times_ms[math.ceil(len(times_ms) * 0.95) - 1],
+        "max_ms": times_ms[-1],
+        "total_ms": sum(times_ms),
+    }
+
+
+def timed_ms(fn):
+    start = time.perf_counter()
+    result = fn()
+    return (time.perf_counter() - start) * 1000, result
+
+
+def build_app(extra_argv=()):
+    # the port is never bound by the constructor, only by launch
+    return WebUI(get_parser().parse_args(list(extra_argv)))
+
+
+def bench_build(repeat):
+    # the first build pays for the imports, keep it out of the numbers
+    build_app()
+    results = {}
+    for mode, extra in [("eager", []), ("lazy", ["--lazy_config_forms"])]:
+        times = []
+        tabs = {}
+        for _ in range(repeat):
+            elapsed, app = timed_ms(functools.partial(build_app, extra))
+            times.append(elapsed)
+            for name, ms in app.setup_times.items():
+                tabs.setdefault(name, []).append(ms)
+        results[mode] = {
+            **summarize(times),
+            "blocks": len(app.demo.blocks),
+            "setup_ui_ms": {name: statistics.median(ms) for name, ms in tabs.items()},
+        }
+    return results
+
+
+def get_registered_configs(trainer):
+    """(group, name, config) of every config the web-ui builds a form for."""
+    from nerfstudio.configs import method_configs as mc
+    from nerfstudio.configs.external_methods import ExternalMethodDummyTrainerConfig
+
+    from modules.data_processor_tab import get_dataprocessor_configs
+    from modules.exporter_tab import get_exporter_configs
+
+    trainer.load_registry()
+    configs = []
+    for name in trainer.method_descriptions:
+        config = mc.all_methods.get(name)
+        if config is not None and type(config) is not ExternalMethodDummyTrainerConfig:
+            configs.append(("model", name, config.pipeline.model))
+    for name, config in trainer.dataparsers.items():
+        configs.append(("dataparser", name, config))
+    for name, config in get_dataprocessor_configs().items():
+        configs.append(("dataprocessor", name, config))
+    for name, config in get_exporter_configs().items():
+        configs.append(("exporter", name, config))
+    return configs
+
+
+def bench_generate_args(trainer, repeat):
+    """Uncached introspection and component creation of every registered form."""
+    configs = get_registered_configs(trainer)
+    introspect = {}
+    build = {}
+    slowest = (0.0, None)
+    for group, name, config in configs:
+        for _ in range(repeat):
+            elapsed, _ = timed_ms(functools.partial(get_arg_specs, config))
+            introspect.setdefault(group, []).append(elapsed)
+            # components are created in a Blocks context, as in setup_ui
+            with gr.Blocks():
+                elapsed, _ = timed_ms(functools.partial(generate_args, config))
+            build.setdefault(group, []).append(elapsed)
+            slowest = max(slowest, (elapsed, f"{group}:{name}"))
+    return {
+        "configs": len(configs),
+        "get_arg_specs": {group: summarize(ms) for group, ms in introspect.items()},
+        "generate_args": {group: summarize(ms) for group, ms in build.items()},
+        "slowest": {"config": slowest[1], "ms": slowest[0]},
+    }
+
+
+def check_cmd(cmd):
+    """Fail the benchmark if generate_cmd stopped at a check instead of a command."""
+    if not cmd.startswith("ns-train "):
+        raise RuntimeError(f"generate_cmd returned {cmd!r} instead of a command")
+    return cmd
+
+
+def bench_args_cmd(trainer, repeat):
+    trainer.load_registry()
+    dataparser = next(iter(trainer.dataparsers), "default")
+    model_args = []
+    dataparser_args = []
+    cmd = []
+    # an existing folder, so the command is built past the input checks
+    with tempfile.TemporaryDirectory() as data_path:
+        for method in trainer.method_descriptions:
+            for _ in range(repeat):
+                model_args.append(
+                    timed_ms(functools.partial(trainer.get_model_args, method))[0]
+                )
+                dataparser_args.append(
+                    timed_ms(
+                        functools.partial(trainer.get_data_parser_args, dataparser)
+                    )[0]
+                )
+                elapsed, result = timed_ms(
+                    functools.partial(
+                        trainer.generate_cmd,
+                        data_path, method, 30000, 2000, dataparser, "viewer",
+                    )
+                )
+                check_cmd(result)
+                cmd.append(elapsed)
+    return {
+        "methods": len(trainer.method_descriptions),
+        "get_model_args": summarize(model_args),
+        "get_data_parser_args": summarize(dataparser_args),
+        "generate_cmd": summarize(cmd),
+    }
+
+
+def describe_error(error):
+    return f"{type(error).__name__}: {error}"
+
+
+def run_session(
+    url, data_path, method, dataparser, requests, ready, latencies, errors
+):
+    """Send requests Show Command events, errors gets "type: message" of failures."""
+    from gradio_client import Client
+
+    # every client is a session of its own, connecting is not part of the numbers
+    try:
+        client = Client(url, verbose=False)
+    except Exception as e:  # noqa: BLE001
+        client = None
+        connect_error = describe_error(e)
+    ready.wait()
+    if client is None:
+        errors.extend([connect_error] * requests)
+        return
+    for _ in range(requests):
+        start = time.perf_counter()
+        try:
+            check_cmd(
+                client.predict(
+                    data_path, method, 30000, 2000, dataparser, "viewer",
+                    api_name="/generate_cmd",
+                )
+            )
+        except Exception as e:  # noqa: BLE001
+            errors.append(describe_error(e))
+            continue
+        latencies.append((time.perf_counter() - start) * 1000)
+
+
+def bench_events(sessions, requests):
+    app = build_app(["--lazy_config_forms"])
+    trainer = app.trainer_tab
+    trainer.load_registry()
+    method = next(iter(trainer.method_descriptions))
+    dataparser = next(iter(trainer.dataparsers), "default")
+    app.demo.queue()
+    app.launch(server_name="127.0.0.1", prevent_thread_lock=True, quiet=True)
+    results = {}
+    # an existing folder, so the command is built past the input checks
+    data_dir = tempfile.TemporaryDirectory()
+    try:
+        for count in sessions:
+            latencies = []
+            errors = []
+            ready = threading.Barrier(count + 1)
+            threads = [
+                threading.Thread(
+                    target=run_session,
+                    args=(
+                        app.demo.local_url, data_dir.name, method, dataparser,
+                        requests, ready, latencies, errors,
+                    ),
+                )
+                for _ in range(count)
+            ]
+            for thread in threads:
+                thread.start()
+            ready.wait()
+            start = time.perf_counter()
+            for thread in threads:
+                thread.join()
+            elapsed = time.perf_counter() - start
+            results[str(count)] = {
+                **(summarize(latencies) if latencies else {"count": 0}),
+                "errors": len(errors),
+                # each distinct "type: message" and how often it happened
+                "error_messages": dict(collections.Counter(errors).most_common()),
+                "events_per_sec": len(latencies) / elapsed,
+            }
+    finally:
+        app.demo.close()
+        data_dir.cleanup()
+    return results
+
+
+def bench_payload():
+    """Components and JSON bytes each config handler receives from the browser."""
+    app = build_app()
+    results = {}
+    for fn in app.demo.fns.values():
+        if fn.name not in PAYLOAD_HANDLERS:
+            continue
+        # gr.State values are kept on the server, the browser does not send them
+        sent = [block for block in fn.inputs if not isinstance(block, gr.State)]
+        payload = json.dumps({"data": [block.value for block in sent]}, default=str)
+        owner = type(getattr(fn.fn, "__self__", None)).__name__
+        key = f"{owner}.{fn.name}"
+        previous = results.get(key, {"components": 0, "bytes": 0})
+        results[key] = {
+            "components": max(previous["components"], len(sent)),
+            "bytes": max(previous["bytes"], len(payload)),
+        }
+    return results
+
+
+def train_step(work):
+    total = 0
+    for i in range(work):
+        total += i
+    return total
+
+
+def train_in_thread(work, status, stop_event):
+    step = 0
+    while not stop_event.is_set():
+        train_step(work)
+        step += 1
+        status["step"] = step
+
+
+def train_in_worker(work, channel):
+    step = 0
+    channel.publish(state="training")
+    while channel.poll() != "stop":
+        train_step(work)
+        step += 1
+        channel.publish(step=step)
+    channel.publish(state="stopped")
+
+
+def measure_handler(handler, events):
+    """Latency of handler calls submitted to a worker thread, as gradio does."""
+    latencies = []
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        for _ in range(events):
+            elapsed, _ = timed_ms(lambda: executor.submit(handler).result())
+            latencies.append(elapsed)
+            time.sleep(0.005)
+    return summarize(latencies)
+
+
+def bench_training_latency(events, step_work=20000, handler_work=50000):
+    """Event latency with the training loop on a web-ui thread or in a worker.
+
+    The training step is pure Python, so the numbers show GIL contention only.
+    Each event does handler_work iterations of Python work, standing in for the
+    request parsing and response serialization gradio does around a handler.
+    """
+    status = {"step": 0}
+    stop_event = threading.Event()
+    thread = threading.Thread(
+        target=train_in_thread, args=(step_work, status, stop_event)
+    )
+    thread.start()
+    try:
+        in_process = measure_handler(
+            lambda: (train_step(handler_work), status["step"]), events
+        )
+    finally:
+        stop_event.set()
+        thread.join()
+
+    context = multiprocessing.get_context("spawn")
+    channel = StatusChannel(fields=("step",), states=TRAINING_STATES, context=context)
+    process = context.Process(target=train_in_worker, args=(step_work, channel))
+    process.start()
+    try:
+        while channel.read()["state"] != "training":
+            time.sleep(0.01)
+        worker = measure_handler(
+            lambda: (train_step(handler_work), int(channel.read()["step"])), events
+        )
+    finally:
+        channel.send("stop")
+        process.join()
+    return {"in_process": in_process, "worker": worker}
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--output", type=str, default=None, help="JSON file to write")
+    parser.add_argument("--only", nargs="+", choices=BENCHMARKS, default=BENCHMARKS)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--sessions", type=int, nargs="+", default=[1, 4, 16])
+    parser.add_argument("--requests", type=int, default=20, help="events per session")
+    parser.add_argument(
+        "--latency_events", type=int, default=200, help="events of training_latency"
+    )
+    bench_args = parser.parse_args()
+
+    report = {
+        "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "versions": {
+            package: get_package_version(package)
+            for package in ("gradio", "nerfstudio")
+        },
+        "results": {},
+    }
+    results = report["results"]
+    trainer = None
+    if {"generate_args", "args_cmd"} & set(bench_args.only):
+        trainer = build_app(["--lazy_config_forms"]).trainer_tab
+    for name in bench_args.only:
+        print(f"running {name}...", file=sys.stderr)
+        if name == "build":
+            results[name] = bench_build(bench_args.repeat)
+        elif name == "generate_args":
+            results[name] = bench_generate_args(trainer, bench_args.repeat)
+        elif name == "args_cmd":
+            results[name] = bench_args_cmd(trainer, bench_args.repeat)
+        elif name == "events":
+            results[name] = bench_events(bench_args.sessions, bench_args.requests)
+        elif name == "payload":
+            results[name] = bench_payload()
+        elif name == "training_latency":
+            results[name] = bench_training_latency(bench_args.latency_events)
+
+    text = json.dumps(report, indent=2)
+    if bench_args.output:
+        with open(bench_args.output, "w") as f:
+            f.write(text + "\n")
+        print(f"results written to {bench_args.output}", file=sys.stderr)
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
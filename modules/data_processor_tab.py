@@ -1,36 +1,69 @@
-import multiprocessing
+import copy
+import functools
 import os
+import subprocess
+import time
 from pathlib import Path
 import argparse
 import gradio as gr
 from utils.utils import (
-    get_folder_path,
     browse_folder,
     browse_video,
     submit,
-    generate_args,
+    render_args,
+    render_form_groups,
+    get_form_args,
 )
-from nerfstudio.scripts.process_data import (
-    ImagesToNerfstudioDataset,
-    # ProcessMetashape,
-    ProcessODM,
-    ProcessPolycam,
-    # ProcessRealityCapture,
-    ProcessRecord3D,
-    VideoToNerfstudioDataset,
+from utils.arg_spec_cache import CACHE_DIR, arg_spec_cache
+from utils.auto_preset import get_plan
+from utils.dir_browser import setup_dir_browser
+from utils.downscale import DownscaleDataset
+from utils.frames import get_video_info
+from utils.incremental_sfm import AppendImages
+from utils.jobs import (
+    VIDEO_EXTENSIONS,
+    JobPool,
+    ProcessingJob,
+    find_captures,
+    get_batch_report,
+    get_cache_key,
+    get_cache_parts,
+    get_output_names,
 )
+from utils.logs import JobLog, get_log_settings, stream_log
+from utils.output_cache import OutputCache
+from utils.preflight import PREFLIGHT_COLUMNS, get_report, scan_folder
+from utils.status_stream import StatusBroadcaster
 from utils.utils import run_cmd
 
-current_path = Path(__file__).parent
-dataprocessor_configs = {
-    "ImagesToNerfstudioDataset": ImagesToNerfstudioDataset(current_path, current_path),
-    "VideoToNerfstudioDataset": VideoToNerfstudioDataset(current_path, current_path),
-    "ProcessPolycam": ProcessPolycam(current_path, current_path),
-    # "ProcessMetashape": ProcessMetashape(current_path, current_path, current_path),
-    # "ProcessRealityCapture": ProcessRealityCapture(current_path, current_path, current_path),
-    "ProcessRecord3D": ProcessRecord3D(current_path, current_path),
-    "ProcessODM": ProcessODM(current_path, current_path),
-}
+
+@functools.cache
+def get_dataprocessor_configs():
+    # process_data pulls in most of nerfstudio, import it when the tab is opened
+    from nerfstudio.scripts.process_data import (
+        ImagesToNerfstudioDataset,
+        # ProcessMetashape,
+        ProcessODM,
+        ProcessPolycam,
+        # ProcessRealityCapture,
+        ProcessRecord3D,
+        VideoToNerfstudioDataset,
+    )
+
+    current_path = Path(__file__).parent
+    return {
+        "ImagesToNerfstudioDataset": ImagesToNerfstudioDataset(
+            current_path, current_path
+        ),
+        "VideoToNerfstudioDataset": VideoToNerfstudioDataset(
+            current_path, current_path
+        ),
+        "ProcessPolycam": ProcessPolycam(current_path, current_path),
+        # "ProcessMetashape": ProcessMetashape(current_path, current_path, current_path),
+        # "ProcessRealityCapture": ProcessRealityCapture(current_path, current_path, current_path),
+        "ProcessRecord3D": ProcessRecord3D(current_path, current_path),
+        "ProcessODM": ProcessODM(current_path, current_path),
+    }
 
 
 class DataProcessorTab:
@@ -39,207 +72,731 @@ class DataProcessorTab:
         self.root_dir = args.root_dir  # root directory
         self.run_in_new_terminal = args.run_in_new_terminal  # run in new terminal
 
-        self.dataprocessor_args = {}
-        self.dataprocessor_args_cmd = ""
+        # build the form of the selected config only, instead of all of them
+        self.lazy_config_forms = args.lazy_config_forms
 
-        self.dataprocessor_groups = []  # keep track of the dataprocessor groups
-        self.dataprocessor_group_idx = {}  # keep track of the dataprocessor group index
-        self.dataprocessor_arg_list = []  # gr components for the dataprocessor args
-        self.dataprocessor_arg_names = []  # keep track of the dataprocessor args names
-        self.dataprocessor_arg_idx = {}  # record the start and end index of the dataprocessor args
+        self.jobs = {}  # processing jobs by id, several can run at once
+        self.jobs_broadcaster = StatusBroadcaster(
+            self.get_jobs_view, min_interval=args.status_interval
+        )
+        self.batch = []  # jobs of the latest batch
+        self.batch_submitted = None
+        # outputs of earlier runs, reused when the same input is processed again
+        self.processing_cache = None
+        if args.processing_cache_size > 0:
+            self.processing_cache = OutputCache(
+                CACHE_DIR / "processing", int(args.processing_cache_size * 1e9)
+            )
+        self.log_settings = get_log_settings(args)
+        self.log_viewers = {}  # job whose log each session is following
 
-        self.p = None
+    def load(self, dataprocessor):
+        """Load the data processors and reveal the tab content when it is opened."""
+        return (
+            gr.update(visible=False),
+            gr.update(visible=True),
+            gr.update(
+                choices=list(get_dataprocessor_configs().keys()), value=dataprocessor
+            ),
+            True,
+        )
 
     def setup_ui(self):
-        with gr.Tab(label="Process Data"):
-            status = gr.Textbox(label="Status", lines=1, placeholder="Waiting")
-            with gr.Row():
-                dataprocessor = gr.Radio(
-                    choices=list(dataprocessor_configs.keys()), label="Method", scale=5
-                )
-                run_button = gr.Button(value="Process", variant="primary", scale=1)
-                cmd_button = gr.Button(value="Show Command", scale=1)
-                stop_button = gr.Button(value="Stop", variant="stop", scale=1)
-
-            if os.name == "nt":
-                with gr.Row():
-                    data_path = gr.Textbox(
-                        label="Data Path",
-                        lines=1,
-                        placeholder="Path to the data",
-                        scale=4,
-                    )
-                    browse_button = gr.Button(value="Browse Image", scale=1)
-                    browse_button.click(browse_folder, None, outputs=data_path)
-                    browse_video_button = gr.Button(value="Browse Video", scale=1)
-                    browse_video_button.click(browse_video, None, outputs=data_path)
-                    gr.ClearButton(components=[data_path], scale=1)
+        with gr.Tab(label="Process Data") as self.tab:
+            placeholder = gr.Markdown("Loading the data processors...")
+            with gr.Column(visible=False) as content:
+                status = gr.Textbox(label="Status", lines=1, placeholder="Waiting")
                 with gr.Row():
-                    output_dir = gr.Textbox(
-                        label="Output Path",
-                        lines=1,
-                        placeholder="Path to the output folder",
-                        scale=4,
+                    dataprocessor = gr.Radio(
+                        choices=[], label="Method", scale=5
                     )
-                    out_button = gr.Button(value="Browse", scale=1)
-                    out_button.click(browse_folder, None, outputs=output_dir)
-                    gr.ClearButton(components=[output_dir], scale=1)
-            else:
+                    run_button = gr.Button(value="Process", variant="primary", scale=1)
+                    cmd_button = gr.Button(value="Show Command", scale=1)
+                    stop_button = gr.Button(value="Stop", variant="stop", scale=1)
                 with gr.Row():
-                    data_path = gr.Textbox(
-                        label="Data Path",
-                        lines=1,
-                        placeholder="Path to the data",
+                    jobs_table = gr.Dataframe(
+                        headers=["Job", "Method", "Data", "Stage", "Elapsed", "ETA"],
+                        label="Jobs",
+                        interactive=False,
                         scale=5,
                     )
-                    input_button = gr.Button(value="Submit", scale=1)
-                with gr.Row():
-                    file_explorer = gr.FileExplorer(
-                        label="Browse",
+                    job = gr.Dropdown(
+                        choices=[],
+                        label="Job",
+                        info="Shown in the log, stopped by Stop (all if empty)",
                         scale=1,
-                        root_dir=self.root_dir,
-                        file_count="multiple",
-                        height=300,
                     )
-                    file_explorer.change(
-                        get_folder_path, inputs=file_explorer, outputs=data_path
+                with gr.Accordion("Log", open=False):
+                    log = gr.Textbox(
+                        show_label=False, lines=15, max_lines=15, autoscroll=True
                     )
+
+                if os.name == "nt":
+                    with gr.Row():
+                        data_path = gr.Textbox(
+                            label="Data Path",
+                            lines=1,
+                            placeholder="Path to the data",
+                            scale=4,
+                        )
+                        browse_button = gr.Button(value="Browse Image", scale=1)
+                        browse_button.click(browse_folder, None, outputs=data_path)
+                        browse_video_button = gr.Button(value="Browse Video", scale=1)
+                        browse_video_button.click(browse_video, None, outputs=data_path)
+                        gr.ClearButton(components=[data_path], scale=1)
+                    with gr.Row():
+                        output_dir = gr.Textbox(
+                            label="Output Path",
+                            lines=1,
+                            placeholder="Path to the output folder",
+                            scale=4,
+                        )
+                        out_button = gr.Button(value="Browse", scale=1)
+                        out_button.click(browse_folder, None, outputs=output_dir)
+                        gr.ClearButton(components=[output_dir], scale=1)
+                else:
+                    with gr.Row():
+                        data_path = gr.Textbox(
+                            label="Data Path",
+                            lines=1,
+                            placeholder="Path to the data",
+                            scale=5,
+                        )
+                        input_button = gr.Button(value="Submit", scale=1)
+                    with gr.Accordion("Browse", open=True):
+                        setup_dir_browser(self.root_dir, data_path)
                     input_button.click(submit, inputs=data_path, outputs=data_path)
-                with gr.Row():
-                    output_dir = gr.Textbox(
-                        label="Output Path",
-                        lines=1,
-                        placeholder="Path to the output folder",
-                        scale=5,
-                    )
-                    out_button = gr.Button(value="Submit", scale=1)
-                with gr.Row():
-                    file_explorer = gr.FileExplorer(
-                        label="Browse",
-                        scale=1,
-                        root_dir=self.root_dir,
-                        file_count="multiple",
+                    with gr.Row():
+                        output_dir = gr.Textbox(
+                            label="Output Path",
+                            lines=1,
+                            placeholder="Path to the output folder",
+                            scale=5,
+                        )
+                        out_button = gr.Button(value="Submit", scale=1)
+                    with gr.Accordion("Browse", open=True):
+                        setup_dir_browser(self.root_dir, output_dir)
+                    out_button.click(submit, inputs=output_dir, outputs=output_dir)
+
+                with gr.Accordion("Preflight", open=False):
+                    with gr.Row():
+                        gr.Markdown(
+                            "Check the images in the Data Path for problems before "
+                            "running COLMAP. Results are cached per folder."
+                        )
+                        preflight_button = gr.Button(
+                            value="Analyze Data Path", scale=0
+                        )
+                    preflight_report = gr.Markdown()
+                    preflight_table = gr.Dataframe(
+                        headers=PREFLIGHT_COLUMNS,
+                        interactive=False,
                         height=300,
                     )
-                    file_explorer.change(
-                        get_folder_path, inputs=file_explorer, outputs=output_dir
+                    preflight_button.click(
+                        self.run_preflight,
+                        inputs=data_path,
+                        outputs=[preflight_report, preflight_table],
                     )
-                    out_button.click(submit, inputs=output_dir, outputs=output_dir)
 
-            with gr.Accordion("Data Processor Config", open=False):
-                for key, config in dataprocessor_configs.items():
-                    with gr.Group(visible=False) as group:
-                        generated_args, labels = generate_args(config, visible=True)
-                        self.dataprocessor_arg_list += generated_args
-                        self.dataprocessor_arg_names += labels
-                        self.dataprocessor_arg_idx[key] = [
-                            len(self.dataprocessor_arg_list) - len(generated_args),
-                            len(self.dataprocessor_arg_list),
-                        ]
-                        self.dataprocessor_groups.append(group)
-                        self.dataprocessor_group_idx[key] = (
-                            len(self.dataprocessor_groups) - 1
+                # values entered in the config forms, per browser session
+                dataprocessor_arg_values = gr.State({})
+                # set by load, the forms of all the configs are built after it
+                configs_loaded = gr.State(False)
+                with gr.Accordion("Data Processor Config", open=False):
+                    if self.lazy_config_forms:
+
+                        # not rebuilt on edits, only when another processor is selected
+                        @gr.render(
+                            inputs=[dataprocessor, dataprocessor_arg_values],
+                            triggers=[dataprocessor.change],
                         )
-                dataprocessor.change(
-                    self.update_dataprocessor_args_visibility,
-                    inputs=dataprocessor,
-                    outputs=self.dataprocessor_groups,
+                        def render_dataprocessor_args(dataprocessor, values):
+                            specs = self.get_dataprocessor_arg_specs(dataprocessor)
+                            arg_spec_cache.save()
+                            if specs:
+                                render_args(
+                                    specs,
+                                    dataprocessor_arg_values,
+                                    dataprocessor,
+                                    values.get(dataprocessor),
+                                )
+
+                    else:
+
+                        @gr.render(
+                            inputs=[dataprocessor, dataprocessor_arg_values],
+                            triggers=[configs_loaded.change],
+                        )
+                        def render_all_dataprocessor_args(dataprocessor_value, values):
+                            render_form_groups(
+                                {
+                                    key: self.get_dataprocessor_arg_specs(key)
+                                    for key in get_dataprocessor_configs()
+                                },
+                                dataprocessor_arg_values,
+                                values,
+                                dataprocessor,
+                                dataprocessor_value,
+                            )
+                            arg_spec_cache.save()
+
+                with gr.Accordion("Auto Preset", open=False):
+                    with gr.Row():
+                        auto_preset = gr.Checkbox(
+                            label="Auto Preset",
+                            info="Choose the matching method and downscales from "
+                            "the data and the cores, overriding the config",
+                            value=False,
+                            scale=3,
+                        )
+                        plan_button = gr.Button(value="Show Plan", scale=1)
+                    plan = gr.Markdown()
+                    plan_button.click(
+                        self.show_plan,
+                        inputs=[dataprocessor, data_path, dataprocessor_arg_values],
+                        outputs=plan,
+                    )
+
+                # nested like the other layout blocks
+                with gr.Accordion(  # noqa: SIM117
+                    "Cache", open=False, visible=self.processing_cache is not None
+                ):
+                    with gr.Row():
+                        use_cache = gr.Checkbox(
+                            label="Reuse Cached Results",
+                            value=self.processing_cache is not None,
+                            scale=2,
+                        )
+                        forget_button = gr.Button(value="Forget Cached Result", scale=1)
+                        clear_cache_button = gr.Button(value="Clear Cache", scale=1)
+
+                with gr.Accordion("Batch", open=False):
+                    cpu_count = os.cpu_count() or 1
+                    with gr.Row():
+                        batch_dir = gr.Textbox(
+                            label="Captures Path",
+                            lines=1,
+                            placeholder="Folder with one video or image folder per capture",
+                            scale=4,
+                        )
+                        batch_button = gr.Button(value="Process Batch", scale=1)
+                    with gr.Row():
+                        max_workers = gr.Slider(
+                            minimum=1,
+                            maximum=cpu_count,
+                            step=1,
+                            label="Parallel Jobs",
+                            value=min(2, cpu_count),
+                        )
+                        cpu_threads = gr.Slider(
+                            minimum=1,
+                            maximum=cpu_count,
+                            step=1,
+                            label="CPU Threads Per Job",
+                            value=max(1, cpu_count // 2),
+                        )
+                    batch_report = gr.Textbox(label="Batch Report", lines=1)
+
+                with gr.Accordion("Frame Extraction", open=False):
+                    with gr.Row():
+                        parallel_extraction = gr.Checkbox(
+                            label="Parallel Frame Extraction",
+                            info="Extract the frames of a video from several time "
+                            "segments at once, the frames/s are shown in the log",
+                            value=False,
+                            scale=2,
+                        )
+                        extract_segments = gr.Slider(
+                            minimum=2,
+                            maximum=max(cpu_count, 2),
+                            step=1,
+                            label="Segments",
+                            info="At most one per core of the job",
+                            value=max(cpu_count, 2),
+                            scale=2,
+                        )
+                    keyframes = gr.Checkbox(
+                        label="Sharpness Keyframes",
+                        info="Keep the sharpest frame of each window instead of "
+                        "evenly spaced frames, skipping blurry and redundant ones",
+                        value=False,
+                    )
+
+                with gr.Accordion("Downscaling", open=False):
+                    parallel_downscale = gr.Checkbox(
+                        label="Parallel Downscaling",
+                        info="Build the images_2/4/8 levels of processed images in "
+                        "a process pool, decoding each image once",
+                        value=False,
+                    )
+                    with gr.Row():
+                        downscale_levels = gr.Slider(
+                            minimum=1,
+                            maximum=4,
+                            step=1,
+                            label="Downscale Levels",
+                            info="For Downscale Dataset, jobs use num_downscales",
+                            value=3,
+                            scale=3,
+                        )
+                        downscale_button = gr.Button(
+                            value="Downscale Dataset", scale=1
+                        )
+                    gr.Markdown(
+                        "Downscale Dataset builds the levels of the already "
+                        "processed dataset in the Output Path."
+                    )
+
+                with gr.Accordion("Append Images", open=False):
+                    gr.Markdown(
+                        "Adds the new images in the Data Path to the dataset in the "
+                        "Output Path, which was processed with COLMAP. Only the new "
+                        "images are matched and registered into the existing model, "
+                        "with the matching method of the selected data processor."
+                    )
+                    append_button = gr.Button(value="Append to Dataset")
+
+                run_button.click(
+                    self.run_dataprocessor,
+                    inputs=[
+                        dataprocessor,
+                        data_path,
+                        output_dir,
+                        use_cache,
+                        parallel_extraction,
+                        extract_segments,
+                        parallel_downscale,
+                        keyframes,
+                        auto_preset,
+                        dataprocessor_arg_values,
+                    ],
+                    outputs=[status, job],
+                ).success(
+                    self.stream_jobs,
+                    inputs=None,
+                    outputs=[jobs_table, batch_report],
+                    concurrency_limit=None,
+                )
+                batch_button.click(
+                    self.run_batch,
+                    inputs=[
+                        batch_dir,
+                        output_dir,
+                        max_workers,
+                        cpu_threads,
+                        use_cache,
+                        parallel_extraction,
+                        extract_segments,
+                        parallel_downscale,
+                        keyframes,
+                        auto_preset,
+                        dataprocessor_arg_values,
+                    ],
+                    outputs=[status, job],
+                ).success(
+                    self.stream_jobs,
+                    inputs=None,
+                    outputs=[jobs_table, batch_report],
+                    concurrency_limit=None,
+                )
+                cmd_button.click(
+                    self.generate_cmd,
+                    inputs=[
+                        dataprocessor,
+                        data_path,
+                        output_dir,
+                        dataprocessor_arg_values,
+                    ],
+                    outputs=status,
                 )
 
-            run_button.click(
-                self.get_dataprocessor_args,
-                inputs=[dataprocessor] + self.dataprocessor_arg_list,
-                outputs=None,
-            ).then(
-                self.run_dataprocessor,
-                inputs=[dataprocessor, data_path, output_dir],
-                outputs=status,
-            )
-            cmd_button.click(
-                self.get_dataprocessor_args,
-                inputs=[dataprocessor] + self.dataprocessor_arg_list,
-                outputs=None,
-            ).then(
-                self.generate_cmd,
-                inputs=[dataprocessor, data_path, output_dir],
-                outputs=status,
-            )
+                forget_button.click(
+                    self.forget_cached,
+                    inputs=[
+                        dataprocessor,
+                        data_path,
+                        parallel_downscale,
+                        keyframes,
+                        auto_preset,
+                        dataprocessor_arg_values,
+                    ],
+                    outputs=status,
+                )
+                downscale_button.click(
+                    self.run_downscale,
+                    inputs=[output_dir, downscale_levels],
+                    outputs=[status, job],
+                ).success(
+                    self.stream_jobs,
+                    inputs=None,
+                    outputs=[jobs_table, batch_report],
+                    concurrency_limit=None,
+                )
+                append_button.click(
+                    self.run_append,
+                    inputs=[
+                        dataprocessor,
+                        data_path,
+                        output_dir,
+                        dataprocessor_arg_values,
+                    ],
+                    outputs=[status, job],
+                ).success(
+                    self.stream_jobs,
+                    inputs=None,
+                    outputs=[jobs_table, batch_report],
+                    concurrency_limit=None,
+                )
+                clear_cache_button.click(self.clear_cache, inputs=None, outputs=status)
+                stop_button.click(self.stop, inputs=job, outputs=status)
+                job.change(
+                    self.stream_job_log,
+                    inputs=job,
+                    outputs=log,
+                    concurrency_limit=None,
+                    # the stream of the job shown before only ends once this one
+                    # has started, it must not wait for it
+                    trigger_mode="multiple",
+                )
 
-            stop_button.click(self.stop, inputs=None, outputs=status)
+            self.load_listener = {
+                "fn": self.load,
+                "inputs": dataprocessor,
+                "outputs": [placeholder, content, dataprocessor, configs_loaded],
+            }
+            self.tab.select(**self.load_listener)
 
-    def update_status(self, data_path, method, data_parser, visualizer):
-        if self.trainer is not None and self.trainer.step != 0:
-            return "Step: " + str(self.trainer.step)
-        else:
-            check = self.check(data_path, method, data_parser, visualizer)
-            if check is not None:
-                return check
-            return "Initializing..."
+    def get_jobs_view(self):
+        table = [job.get_row() for job in self.jobs.values()]
+        if not self.batch:
+            return table, ""
+        return table, get_batch_report(self.batch, self.batch_submitted)
 
-    def run_dataprocessor(self, datapocessor, data_path, output_dir):
+    async def stream_jobs(self):
+        stream = self.jobs_broadcaster.subscribe()
+        try:
+            async for table, report in stream:
+                yield table, report
+                if not any(job.is_running() for job in self.jobs.values()):
+                    break
+        finally:
+            await stream.aclose()
+
+    async def stream_job_log(self, job_id, request: gr.Request):
+        self.log_viewers[request.session_hash] = job_id
+        if job_id not in self.jobs:
+            yield ""
+            return
+        stream = stream_log(lambda: self.jobs[job_id].log)
+        try:
+            async for text in stream:
+                if self.log_viewers.get(request.session_hash) != job_id:
+                    # another job was selected, its stream has taken over
+                    break
+                yield text
+        finally:
+            await stream.aclose()
+            if self.log_viewers.get(request.session_hash) == job_id:
+                del self.log_viewers[request.session_hash]
+
+    def run_dataprocessor(
+        self,
+        datapocessor,
+        data_path,
+        output_dir,
+        use_cache=False,
+        parallel_extraction=False,
+        extract_segments=None,
+        parallel_downscale=False,
+        keyframes=False,
+        auto_preset=False,
+        form_values=None,
+    ):
         if datapocessor == "":
-            return "Please select a data processor"
+            raise gr.Error("Please select a data processor")
         if data_path == "":
-            return "Please select a data path"
+            raise gr.Error("Please select a data path")
         if output_dir == "":
-            return "Please select a output directory"
+            raise gr.Error("Please select a output directory")
+
+        form_args, _ = self.get_dataprocessor_args(datapocessor, form_values)
+        args, plan = form_args, None
+        if auto_preset:
+            args, plan = self.get_auto_args(data_path, args)
 
         if self.run_in_new_terminal:
-            cmd = self.generate_cmd(datapocessor, data_path, output_dir)
+            cmd = self.generate_cmd(datapocessor, data_path, output_dir, form_values)
+            if auto_preset:
+                # the later flags override the ones of the form
+                cmd += "".join(
+                    f" --{key} {value}"
+                    for key, value in args.items()
+                    if value != form_args[key]
+                )
             run_cmd(cmd)
+            return "Processing in a new terminal", gr.update()
         else:
-            data_path = Path(data_path)
-            output_dir = Path(output_dir)
-            processor = dataprocessor_configs[datapocessor]
-            processor.data = data_path
-            processor.output_dir = output_dir
-            for key, value in self.dataprocessor_args.items():
-                setattr(processor, key, value)
-            # TODO: this will lead werid errors when running subprocesses in this subprocess
-            self.p = multiprocessing.Process(target=processor.main)
-            self.p.start()
-            self.p.join()
-            return "Processing finished"
-
-    def get_dataprocessor_args(self, dataprocessor, *args):
-        temp_args = {}
-        args = list(args)
+            job = self.create_job(
+                datapocessor,
+                data_path,
+                output_dir,
+                args,
+                use_cache,
+                extract_segments=int(extract_segments) if parallel_extraction else None,
+                parallel_downscale=parallel_downscale,
+                keyframes=keyframes,
+                plan=plan,
+            ).start()
+            return f"Submitted job {job.id}", gr.update(
+                choices=list(self.jobs.keys()), value=job.id
+            )
+
+    def create_job(
+        self,
+        dataprocessor,
+        data_path,
+        output_dir,
+        args,
+        use_cache=False,
+        cpu_threads=None,
+        extract_segments=None,
+        parallel_downscale=False,
+        keyframes=False,
+        plan=None,
+    ):
+        # every job gets its own copy, the registry entry is only a template
+        processor = copy.deepcopy(get_dataprocessor_configs()[dataprocessor])
+        processor.data = Path(data_path)
+        processor.output_dir = Path(output_dir)
+        for key, value in args.items():
+            setattr(processor, key, value)
+        log = JobLog("process", **self.log_settings)
+        job = ProcessingJob(dataprocessor, processor, log, cpu_threads)
+        if plan:
+            for line in plan.replace("**", "").split("\n\n"):
+                log.write(line)
+        # the frames are the same either way, so extract_segments is not part of
+        # the cache key, parallel_downscale and keyframes are
+        job.extract_segments = extract_segments
+        job.parallel_downscale = parallel_downscale
+        job.keyframes = keyframes
+        if use_cache and self.processing_cache is not None:
+            # the worker fingerprints the input and looks it up, not the handler
+            job.cache = (
+                self.processing_cache,
+                get_cache_parts(dataprocessor, args, parallel_downscale, keyframes),
+            )
+        self.jobs[job.id] = job
+        return job
+
+    def forget_cached(
+        self,
+        dataprocessor,
+        data_path,
+        parallel_downscale=False,
+        keyframes=False,
+        auto_preset=False,
+        form_values=None,
+    ):
+        """Drop the cached result of processing data_path with the current arguments."""
+        if self.processing_cache is None:
+            raise gr.Error("The processing cache is disabled")
+        if dataprocessor == "" or data_path == "":
+            raise gr.Error("Please select a data processor and a data path")
+        args, _ = self.get_dataprocessor_args(dataprocessor, form_values)
+        if auto_preset:
+            args, _ = self.get_auto_args(data_path, args)
+        key = get_cache_key(
+            self.processing_cache,
+            get_cache_parts(dataprocessor, args, parallel_downscale, keyframes),
+            data_path,
+        )
+        if not self.processing_cache.invalidate(key):
+            return "Nothing cached for this input"
+        return "Forgot the cached result"
+
+    def clear_cache(self):
+        if self.processing_cache is None:
+            raise gr.Error("The processing cache is disabled")
+        self.processing_cache.clear()
+        return "Processing cache cleared"
+
+    def run_batch(
+        self,
+        batch_dir,
+        output_dir,
+        max_workers,
+        cpu_threads,
+        use_cache=False,
+        parallel_extraction=False,
+        extract_segments=None,
+        parallel_downscale=False,
+        keyframes=False,
+        auto_preset=False,
+        form_values=None,
+    ):
+        """Process every capture in batch_dir into its own folder in output_dir."""
+        if batch_dir == "" or not Path(batch_dir).is_dir():
+            raise gr.Error("Please select a folder of captures")
+        if output_dir == "":
+            raise gr.Error("Please select a output directory")
+        if self.run_in_new_terminal:
+            raise gr.Error("Batch processing is not available in a new terminal")
+        captures = find_captures(batch_dir)
+        if not captures:
+            raise gr.Error("No videos or image folders found in " + batch_dir)
+
+        # the values entered in the forms apply to the captures of that kind
+        processor_args = {}
+        for dataprocessor, _ in captures:
+            if dataprocessor not in processor_args:
+                processor_args[dataprocessor], _ = self.get_dataprocessor_args(
+                    dataprocessor, form_values
+                )
+
+        # a pool of its own, so the limits of a batch still running are kept
+        pool = JobPool(int(max_workers), int(cpu_threads))
+        self.batch = []
+        self.batch_submitted = time.time()
+        # scene.mp4 and scene/ would be processed into the same folder otherwise
+        names = get_output_names(captures)
+        for (dataprocessor, path), name in zip(captures, names):
+            args, plan = processor_args[dataprocessor], None
+            if auto_preset:
+                # each capture gets its own plan, for the cores of one job
+                args, plan = self.get_auto_args(path, args, int(cpu_threads))
+            job = self.create_job(
+                dataprocessor,
+                path,
+                Path(output_dir) / name,
+                args,
+                use_cache,
+                int(cpu_threads),
+                int(extract_segments) if parallel_extraction else None,
+                parallel_downscale,
+                keyframes,
+                plan,
+            )
+            self.batch.append(pool.submit(job))
+        return f"Submitted {len(self.batch)} jobs", gr.update(
+            choices=list(self.jobs.keys()), value=self.batch[0].id
+        )
+
+    def run_preflight(self, data_path):
+        """Report on the images in data_path, or the frames of a video."""
+        if data_path == "" or not Path(data_path).exists():
+            raise gr.Error("Please select a data path")
+        path = Path(data_path)
+        if path.is_file():
+            if path.suffix.lower() not in VIDEO_EXTENSIONS:
+                raise gr.Error("Please select a folder of images or a video")
+            try:
+                num_frames, fps = get_video_info(path)
+            except (OSError, ValueError, subprocess.CalledProcessError) as e:
+                raise gr.Error(f"Could not read {path.name}: {e}")
+            return (
+                (
+                    f"**{path.name}**: {num_frames} frames at {fps:.2f} fps, "
+                    f"{num_frames / fps:.1f}s. The frames are analyzed once extracted."
+                ),
+                {"headers": PREFLIGHT_COLUMNS, "data": []},
+            )
+        report, rows = get_report(scan_folder(path))
+        return report, {"headers": PREFLIGHT_COLUMNS, "data": rows}
+
+    def get_auto_args(self, data_path, args, cores=None):
+        """args with the auto preset's settings for data_path, and its plan."""
+        try:
+            settings, plan = get_plan(data_path, args, cores)
+        except (OSError, ValueError, subprocess.CalledProcessError) as e:
+            raise gr.Error(f"The auto preset needs a video or a folder of images: {e}")
+        return dict(args, **settings), plan
+
+    def show_plan(self, dataprocessor, data_path, form_values=None):
+        """The auto preset's settings and estimated runtime for data_path."""
+        if data_path == "" or not Path(data_path).exists():
+            raise gr.Error("Please select a data path")
+        args, _ = self.get_dataprocessor_args(dataprocessor, form_values)
+        return self.get_auto_args(data_path, args)[1]
+
+    def run_downscale(self, output_dir, num_downscales):
+        """Build the downscaled levels of the dataset processed into output_dir."""
+        if output_dir == "" or not (Path(output_dir) / "images").is_dir():
+            raise gr.Error("Please select a processed dataset with an images folder")
+        if self.run_in_new_terminal:
+            raise gr.Error("Downscaling is not available in a new terminal")
+        log = JobLog("process", **self.log_settings)
+        job = ProcessingJob(
+            "Downscale", DownscaleDataset(output_dir, int(num_downscales)), log
+        )
+        job.parallel_downscale = True
+        self.jobs[job.id] = job
+        job.start()
+        return f"Submitted job {job.id}", gr.update(
+            choices=list(self.jobs.keys()), value=job.id
+        )
+
+    def run_append(self, dataprocessor, data_path, output_dir, form_values=None):
+        """Add the new images in data_path to the dataset in output_dir."""
+        if data_path == "" or not Path(data_path).is_dir():
+            raise gr.Error("Please select a folder of images as the data path")
+        if output_dir == "" or not (Path(output_dir) / "colmap").is_dir():
+            raise gr.Error("Please select a dataset processed with COLMAP")
+        if self.run_in_new_terminal:
+            raise gr.Error("Appending is not available in a new terminal")
+        args, _ = self.get_dataprocessor_args(dataprocessor, form_values)
+        processor = AppendImages(
+            data_path,
+            output_dir,
+            matching_method=args.get("matching_method", "vocab_tree"),
+            colmap_cmd=args.get("colmap_cmd", "colmap"),
+            gpu=args.get("gpu", True),
+            verbose=args.get("verbose", False),
+        )
+        job = ProcessingJob("Append", processor, JobLog("process", **self.log_settings))
+        self.jobs[job.id] = job
+        job.start()
+        return f"Submitted job {job.id}", gr.update(
+            choices=list(self.jobs.keys()), value=job.id
+        )
+
+    def get_dataprocessor_arg_specs(self, dataprocessor):
+        if not dataprocessor:
+            return None
+        return arg_spec_cache.get(
+            dataprocessor, get_dataprocessor_configs()[dataprocessor]
+        )
+
+    def get_dataprocessor_args(self, dataprocessor, form_values=None):
+        """The config values a session entered and their command line flags."""
         cmd = ""
-        names = self.dataprocessor_arg_names[
-            self.dataprocessor_arg_idx[dataprocessor][0] : self.dataprocessor_arg_idx[
-                dataprocessor
-            ][1]
-        ]
-        values = args[
-            self.dataprocessor_arg_idx[dataprocessor][0] : self.dataprocessor_arg_idx[
-                dataprocessor
-            ][1]
-        ]
-        for key, value in zip(names, values):
+        # fields that were never edited keep the config defaults
+        specs = self.get_dataprocessor_arg_specs(dataprocessor) or []
+        temp_args = get_form_args(specs, form_values, dataprocessor)
+        for key, value in temp_args.items():
             if isinstance(value, bool):
-                key = "no-" + key if not value else key
-                cmd += f" --{key}"
+                flag = key if value else "no-" + key
+                cmd += f" --{flag}"
             else:
                 cmd += f" --{key} {value}"
-            temp_args[key] = value
-        self.dataprocessor_args = temp_args
-        self.dataprocessor_args_cmd = cmd
-
-    def update_dataprocessor_args_visibility(self, dataprocessor):
-        idx = self.dataprocessor_group_idx[dataprocessor]
-        update_info = [gr.update(visible=False)] * len(self.dataprocessor_groups)
-        update_info[idx] = gr.update(visible=True)
-        return update_info
+        return temp_args, cmd
 
-    def stop(self):
-        self.p.terminate()
-        return "Process stopped"
+    def stop(self, job_id=None):
+        if job_id:
+            stopped = [job_id] if self.jobs[job_id].stop() else []
+        else:
+            stopped = [job.id for job in self.jobs.values() if job.stop()]
+        if not stopped:
+            raise gr.Error("No running processing job to stop")
+        return "Stopped job " + ", ".join(str(job_id) for job_id in stopped)
 
     def generate_cmd(
         self,
         dataprocessor,
         data_path,
         output_dir,
+        form_values=None,
     ):
         if dataprocessor == "":
             raise gr.Error("Please select a data processor")
@@ -262,6 +819,7 @@ class DataProcessorTab:
         else:
             raise gr.Error("Invalid method")
 
-        cmd = f"ns-process-data {method} --data {data_path} --output_dir {output_dir} {self.dataprocessor_args_cmd}"
+        _, args_cmd = self.get_dataprocessor_args(dataprocessor, form_values)
+        cmd = f"ns-process-data {method} --data {data_path} --output_dir {output_dir} {args_cmd}"
 
         return cmd
@@ -1,34 +1,47 @@
+import copy
+import functools
 import multiprocessing
 import os
 from pathlib import Path
 import argparse
 import gradio as gr
 from utils.utils import (
-    get_folder_path,
     browse_folder,
     browse_cfg,
     submit,
-    generate_args,
-)
-from nerfstudio.scripts.exporter import (
-    ExportCameraPoses,
-    ExportGaussianSplat,
-    ExportMarchingCubesMesh,
-    ExportPointCloud,
-    ExportPoissonMesh,
-    ExportTSDFMesh,
+    render_args,
+    render_form_groups,
+    get_form_args,
 )
+from utils.arg_spec_cache import CACHE_DIR, arg_spec_cache
+from utils.dir_browser import setup_dir_browser
+from utils.exports import format_timings, get_export_key, run_exports
+from utils.logs import JobLog, get_log_settings, stream_log
+from utils.output_cache import OutputCache
+from utils.run_index import setup_run_browser
+
 
-current_path = Path(__file__).parent
+@functools.cache
+def get_exporter_configs():
+    # the exporters import torch, import them when the tab is opened
+    from nerfstudio.scripts.exporter import (
+        ExportCameraPoses,
+        ExportGaussianSplat,
+        ExportMarchingCubesMesh,
+        ExportPointCloud,
+        ExportPoissonMesh,
+        ExportTSDFMesh,
+    )
 
-exporter_configs = {
-    "ExportCameraPoses": ExportCameraPoses(current_path, current_path),
-    "ExportGaussianSplat": ExportGaussianSplat(current_path, current_path),
-    "ExportMarchingCubesMesh": ExportMarchingCubesMesh(current_path, current_path),
-    "ExportPointCloud": ExportPointCloud(current_path, current_path),
-    "ExportPoissonMesh": ExportPoissonMesh(current_path, current_path),
-    "ExportTSDFMesh": ExportTSDFMesh(current_path, current_path),
-}
+    current_path = Path(__file__).parent
+    return {
+        "ExportCameraPoses": ExportCameraPoses(current_path, current_path),
+        "ExportGaussianSplat": ExportGaussianSplat(current_path, current_path),
+        "ExportMarchingCubesMesh": ExportMarchingCubesMesh(current_path, current_path),
+        "ExportPointCloud": ExportPointCloud(current_path, current_path),
+        "ExportPoissonMesh": ExportPoissonMesh(current_path, current_path),
+        "ExportTSDFMesh": ExportTSDFMesh(current_path, current_path),
+    }
 
 
 class ExporterTab:
@@ -36,161 +49,286 @@ class ExporterTab:
         super().__init__()
         self.root_dir = args.root_dir  # root directory
         self.run_in_new_terminal = args.run_in_new_terminal  # run in new terminal
+        self.run_index_interval = args.run_index_interval
 
-        self.exporter_args = {}
-
-        self.exporter_groups = []  # keep track of the exporter groups
-        self.exporter_group_idx = {}  # keep track of the exporter group index
-        self.exporter_arg_list = []  # gr components for the exporter args
-        self.exporter_arg_names = []  # keep track of the exporter args names
-        self.exporter_arg_idx = {}  # record the start and end index of the exporter args
+        # build the forms of the selected exporters only, instead of all of them
+        self.lazy_config_forms = args.lazy_config_forms
 
         self.p = None
+        self.timings_conn = None  # receives (stage, seconds) from the export worker
+        self.timings = []  # stages of the current export that are already done
+        # exports of earlier runs, reused for the same checkpoint and arguments
+        self.export_cache = None
+        if args.export_cache_size > 0:
+            self.export_cache = OutputCache(
+                CACHE_DIR / "exports", int(args.export_cache_size * 1e9)
+            )
+        self.log_settings = get_log_settings(args)
+        self.log = None  # output of the current export
+        self.run_browser = None  # listener filling the run table, see setup_run_browser
+
+    def load(self, exporters, *browser_inputs):
+        """Load the exporters and the runs and reveal the tab content when opened."""
+        updates = (
+            gr.update(visible=False),
+            gr.update(visible=True),
+            gr.update(choices=list(get_exporter_configs().keys()), value=exporters),
+            True,
+        )
+        if self.run_browser is None:
+            return updates
+        return updates + tuple(self.run_browser["fn"](*browser_inputs))
 
     def setup_ui(self):
-        with gr.Tab(label="Export"):
-            status = gr.Textbox(label="Status", lines=1, placeholder="Waiting")
-            with gr.Row():
-                exporter = gr.Radio(
-                    choices=list(exporter_configs.keys()), label="Method", scale=5
-                )
-                run_button = gr.Button(
-                    value="Export", variant="primary", scale=1)
-                stop_button = gr.Button(value="Stop", variant="stop", scale=1)
-            if os.name == "nt":
-                with gr.Row():
-                    data_path = gr.Textbox(
-                        label="Data Path",
-                        lines=1,
-                        placeholder="Path to the model config",
-                        scale=4,
-                    )
-                    browse_button = gr.Button(value="Browse Config", scale=1)
-                    browse_button.click(browse_cfg, None, outputs=data_path)
-                    gr.ClearButton(components=[data_path], scale=1)
-                with gr.Row():
-                    output_dir = gr.Textbox(
-                        label="Output Path",
-                        lines=1,
-                        placeholder="Path to the output folder",
-                        scale=4,
-                    )
-                    out_button = gr.Button(value="Browse", scale=1)
-                    out_button.click(browse_folder, None, outputs=output_dir)
-                    gr.ClearButton(components=[output_dir], scale=1)
-            else:
+        with gr.Tab(label="Export") as self.tab:
+            placeholder = gr.Markdown("Loading the exporters...")
+            with gr.Column(visible=False) as content:
+                status = gr.Textbox(label="Status", lines=1, placeholder="Waiting")
                 with gr.Row():
-                    data_path = gr.Textbox(
-                        label="Data Path",
-                        lines=1,
-                        placeholder="Path to the model config",
-                        scale=5,
-                    )
-                    input_button = gr.Button(value="Submit", scale=1)
-                with gr.Row():
-                    file_explorer = gr.FileExplorer(
-                        label="Browse",
-                        scale=1,
-                        root_dir=self.root_dir,
-                        file_count="single",
-                        height=300,
-                        glob="*.yml",
-                    )
-                    file_explorer.change(
-                        lambda x: str(x), inputs=file_explorer, outputs=data_path
+                    exporters = gr.CheckboxGroup(
+                        choices=[], label="Methods", scale=5
                     )
-                    input_button.click(
-                        submit, inputs=data_path, outputs=data_path)
-                with gr.Row():
-                    output_dir = gr.Textbox(
-                        label="Output Path",
-                        lines=1,
-                        placeholder="Path to the output folder",
+                    run_button = gr.Button(
+                        value="Export", variant="primary", scale=1)
+                    stop_button = gr.Button(value="Stop", variant="stop", scale=1)
+                with gr.Row(visible=self.export_cache is not None):
+                    use_cache = gr.Checkbox(
+                        label="Reuse Cached Exports",
+                        value=self.export_cache is not None,
                         scale=5,
                     )
-                    out_button = gr.Button(value="Submit", scale=1)
-                with gr.Row():
-                    file_explorer = gr.FileExplorer(
-                        label="Browse",
-                        scale=1,
-                        root_dir=self.root_dir,
-                        file_count="multiple",
-                        height=300,
+                    clear_cache_button = gr.Button(value="Clear Export Cache", scale=1)
+                    clear_cache_button.click(
+                        self.clear_cache, inputs=None, outputs=status
                     )
-                    file_explorer.change(
-                        get_folder_path, inputs=file_explorer, outputs=output_dir
+                with gr.Accordion("Log", open=False):
+                    log = gr.Textbox(
+                        show_label=False, lines=15, max_lines=15, autoscroll=True
                     )
-                    out_button.click(submit, inputs=output_dir,
-                                     outputs=output_dir)
-            with gr.Accordion("Exporter Config", open=False):
-                for key, config in exporter_configs.items():
-                    with gr.Group(visible=False) as group:
-                        generated_args, labels = generate_args(
-                            config, visible=True)
-                        self.exporter_arg_list += generated_args
-                        self.exporter_arg_names += labels
-                        self.exporter_arg_idx[key] = [
-                            len(self.exporter_arg_list) - len(generated_args),
-                            len(self.exporter_arg_list),
-                        ]
-                        self.exporter_groups.append(group)
-                        self.exporter_group_idx[key] = len(
-                            self.exporter_groups) - 1
-                exporter.change(
-                    self.update_exporter_args_visibility,
-                    inputs=exporter,
-                    outputs=self.exporter_groups,
+                if os.name == "nt":
+                    with gr.Row():
+                        data_path = gr.Textbox(
+                            label="Data Path",
+                            lines=1,
+                            placeholder="Path to the model config",
+                            scale=4,
+                        )
+                        browse_button = gr.Button(value="Browse Config", scale=1)
+                        browse_button.click(browse_cfg, None, outputs=data_path)
+                        gr.ClearButton(components=[data_path], scale=1)
+                    with gr.Row():
+                        output_dir = gr.Textbox(
+                            label="Output Path",
+                            lines=1,
+                            placeholder="Path to the output folder",
+                            scale=4,
+                        )
+                        out_button = gr.Button(value="Browse", scale=1)
+                        out_button.click(browse_folder, None, outputs=output_dir)
+                        gr.ClearButton(components=[output_dir], scale=1)
+                else:
+                    with gr.Row():
+                        data_path = gr.Textbox(
+                            label="Data Path",
+                            lines=1,
+                            placeholder="Path to the model config",
+                            scale=5,
+                        )
+                        input_button = gr.Button(value="Submit", scale=1)
+                    with gr.Accordion("Runs", open=True):
+                        # indexed in the background instead of walking root_dir
+                        self.run_browser = setup_run_browser(
+                            self.root_dir, self.run_index_interval, data_path
+                        )
+                    input_button.click(submit, inputs=data_path, outputs=data_path)
+                    with gr.Row():
+                        output_dir = gr.Textbox(
+                            label="Output Path",
+                            lines=1,
+                            placeholder="Path to the output folder",
+                            scale=5,
+                        )
+                        out_button = gr.Button(value="Submit", scale=1)
+                    with gr.Accordion("Browse", open=True):
+                        setup_dir_browser(self.root_dir, output_dir)
+                    out_button.click(submit, inputs=output_dir, outputs=output_dir)
+                # values entered in the config forms, per browser session
+                exporter_arg_values = gr.State({})
+                # set by load, the forms of all the configs are built after it
+                configs_loaded = gr.State(False)
+                with gr.Accordion("Exporter Config", open=False):
+                    if self.lazy_config_forms:
+
+                        # not rebuilt on edits, only when the exporters change
+                        @gr.render(
+                            inputs=[exporters, exporter_arg_values],
+                            triggers=[exporters.change],
+                        )
+                        def render_exporter_args(exporters, values):
+                            for exporter in exporters:
+                                specs = self.get_exporter_arg_specs(exporter)
+                                if specs:
+                                    with gr.Group():
+                                        gr.Markdown(exporter)
+                                        render_args(
+                                            specs,
+                                            exporter_arg_values,
+                                            exporter,
+                                            values.get(exporter),
+                                        )
+                            arg_spec_cache.save()
+
+                    else:
+
+                        @gr.render(
+                            inputs=[exporters, exporter_arg_values],
+                            triggers=[configs_loaded.change],
+                        )
+                        def render_all_exporter_args(selected, values):
+                            render_form_groups(
+                                {
+                                    key: self.get_exporter_arg_specs(key)
+                                    for key in get_exporter_configs()
+                                },
+                                exporter_arg_values,
+                                values,
+                                exporters,
+                                selected,
+                                titled=True,
+                            )
+                            arg_spec_cache.save()
+
+                export_event = run_button.click(
+                    self.run_exporter,
+                    inputs=[
+                        exporters,
+                        data_path,
+                        output_dir,
+                        use_cache,
+                        exporter_arg_values,
+                    ],
+                    outputs=status,
                 )
-            run_button.click(
-                self.get_exporter_args,
-                inputs=[exporter] + self.exporter_arg_list,
-                outputs=None,
-            ).then(
-                self.run_exporter,
-                inputs=[exporter, data_path, output_dir],
-                outputs=status,
-            )
-            stop_button.click(self.stop, inputs=None, outputs=status)
+                export_event.success(self.follow_export, inputs=None, outputs=status)
+                export_event.success(
+                    functools.partial(stream_log, lambda: self.log),
+                    inputs=None,
+                    outputs=log,
+                    concurrency_limit=None,
+                )
+                stop_button.click(self.stop, inputs=None, outputs=status)
 
-    def update_exporter_args_visibility(self, exporter):
-        idx = self.exporter_group_idx[exporter]
-        update_info = [gr.update(visible=False)] * len(self.exporter_groups)
-        update_info[idx] = gr.update(visible=True)
-        return update_info
+            browser = self.run_browser or {"inputs": [], "outputs": []}
+            self.load_listener = {
+                "fn": self.load,
+                "inputs": [exporters, *browser["inputs"]],
+                "outputs": [placeholder, content, exporters, configs_loaded]
+                + browser["outputs"],
+            }
+            self.tab.select(**self.load_listener)
 
-    def run_exporter(self, exporter, data_path, output_dir):
-        if exporter == "":
-            return "Please select a exporter"
+    def run_exporter(
+        self, exporters, data_path, output_dir, use_cache=False, form_values=None
+    ):
+        # raise instead of returning, so the follow-up events do not run
+        if not exporters:
+            raise gr.Error("Please select a exporter")
         if data_path == "":
-            return "Please select a data path"
+            raise gr.Error("Please select a data path")
         if output_dir == "":
-            return "Please select a output directory"
+            raise gr.Error("Please select a output directory")
+        if self.p is not None and self.p.is_alive():
+            raise gr.Error("An export is already running, please stop it first")
         data_path = Path(data_path)
         output_dir = Path(output_dir)
-        exporter = exporter_configs[exporter]
-        exporter.load_config = data_path
-        exporter.output_dir = output_dir
 
-        for key, value in self.exporter_args.items():
-            setattr(exporter, key, value)
-        self.p = multiprocessing.Process(target=exporter.main)
+        exporter_args = self.get_exporter_args(exporters, form_values)
+        jobs = []
+        self.timings = []
+        for name in exporters:
+            # the registry entry is only a template
+            exporter = copy.deepcopy(get_exporter_configs()[name])
+            exporter.load_config = data_path
+            # several exporters would overwrite each other's mesh.ply and the like
+            exporter.output_dir = output_dir / name if len(exporters) > 1 else output_dir
+            for key, value in exporter_args[name].items():
+                setattr(exporter, key, value)
+            key = None
+            if use_cache and self.export_cache is not None:
+                key = get_export_key(self.export_cache, exporter, exporter_args[name])
+            # exports only add their own files, the folder may hold others
+            if key is not None and self.export_cache.restore(
+                key, exporter.output_dir, merge=True
+            ):
+                self.timings.append((name, "cached"))
+                continue
+            cache = (self.export_cache, key) if key is not None else None
+            jobs.append((name, exporter, cache))
+
+        self.log = JobLog("export", **self.log_settings)
+        if not jobs:
+            self.log.write("Every export was restored from the cache")
+            self.log.close()
+            self.p = None
+            self.timings_conn = None
+            return "Exporting..."
+        log_socket = self.log.open_socket()
+        # all exporters run in one worker, so the pipeline is loaded only once;
+        # spawned, as forking the threaded web-ui server is unsafe
+        context = multiprocessing.get_context("spawn")
+        self.timings_conn, worker_conn = context.Pipe(duplex=False)
+        self.p = context.Process(
+            target=run_exports, args=(jobs, worker_conn, log_socket)
+        )
         self.p.start()
+        worker_conn.close()
+        if log_socket is not None:
+            log_socket.close()
+        return "Exporting..."
+
+    def follow_export(self):
+        """Report the time of each stage as the worker finishes it."""
+        timings = list(self.timings)
+        if self.p is None:
+            yield "Exporting finished. " + format_timings(timings)
+            return
+        while True:
+            try:
+                timings.append(self.timings_conn.recv())
+            except EOFError:
+                break
+            yield "Exporting... " + format_timings(timings)
         self.p.join()
-        return "Exporting finished"
-
-    def get_exporter_args(self, exporter, *args):
-        temp_args = {}
-        args = list(args)
-        names = self.exporter_arg_names[
-            self.exporter_arg_idx[exporter][0]: self.exporter_arg_idx[exporter][1]
-        ]
-        values = args[
-            self.exporter_arg_idx[exporter][0]: self.exporter_arg_idx[exporter][1]
-        ]
-        for key, value in zip(names, values):
-            temp_args[key] = value
-        self.exporter_args = temp_args
+        if self.p.exitcode != 0:
+            yield (
+                "Exporting failed. Please check the log for more information. "
+                + format_timings(timings)
+            )
+        else:
+            yield "Exporting finished. " + format_timings(timings)
+
+    def get_exporter_arg_specs(self, exporter):
+        if not exporter:
+            return None
+        return arg_spec_cache.get(exporter, get_exporter_configs()[exporter])
+
+    def get_exporter_args(self, exporters, form_values=None):
+        """The config values a session entered, per exporter."""
+        exporter_args = {}
+        for exporter in exporters:
+            # fields that were never edited keep the config defaults
+            specs = self.get_exporter_arg_specs(exporter) or []
+            exporter_args[exporter] = get_form_args(specs, form_values, exporter)
+        return exporter_args
+
+    def clear_cache(self):
+        if self.export_cache is None:
+            raise gr.Error("The export cache is disabled")
+        self.export_cache.clear()
+        return "Export cache cleared"
 
     def stop(self):
+        if self.p is None or not self.p.is_alive():
+            raise gr.Error("No export is running")
         self.p.terminate()
         return "Export stopped"
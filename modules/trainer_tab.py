@@ -1,15 +1,35 @@
+import functools
 import os
+import time
 from pathlib import Path
 import webbrowser
 import argparse
 import gradio as gr
-from traitlets import Instance
 
-from nerfstudio.configs import dataparser_configs as dc, method_configs as mc
-from nerfstudio.configs.external_methods import ExternalMethodDummyTrainerConfig
 from utils.trainer import WebUITrainer
-from utils.utils import run_cmd, get_folder_path, browse_folder, submit, generate_args
-from nerfstudio.viewer_legacy.server import viewer_utils
+from utils.utils import (
+    run_cmd,
+    browse_folder,
+    submit,
+    render_args,
+    render_form_groups,
+    get_form_args,
+)
+from utils.arg_spec_cache import arg_spec_cache
+from utils.dir_browser import setup_dir_browser
+from utils.logs import JobLog, get_log_settings
+from utils.status_stream import StatusBroadcaster, follow
+from utils.sweeps import (
+    MAX_TRIALS,
+    SWEEP_MODES,
+    DevicePool,
+    Sweep,
+    SuccessiveHalving,
+    SweepTrial,
+    expand_sweep,
+    parse_sweep,
+)
+from utils.telemetry import METRICS, JobTelemetry
 
 
 class TrainerTab(WebUITrainer):
@@ -18,22 +38,10 @@ class TrainerTab(WebUITrainer):
         self.root_dir = args.root_dir  # root directory
         self.run_in_new_terminal = args.run_in_new_terminal  # run in new terminal
 
-        self.model_args_cmd = ""
-        self.dataparser_args_cmd = ""
-        self.model_args = {}
-        self.dataparser_args = {}
-
-        self.dataparser_groups = []  # keep track of the dataparser groups
-        self.dataparser_group_idx = {}  # keep track of the dataparser group index
-        self.dataparser_arg_list = []  # gr components for the dataparser args
-        self.dataparser_arg_names = []  # keep track of the dataparser args names
-        self.dataparser_arg_idx = {}  # record the start and end index of the dataparser args
-
-        self.model_groups = []  # keep track of the model groups
-        self.model_group_idx = {}  # keep track of the model group index
-        self.model_arg_list = []  # gr components for the model args
-        self.model_arg_names = []  # keep track of the model args names
-        self.model_arg_idx = {}  # record the start and end index of the model args
+        # build the form of the selected config only, instead of all of them
+        self.lazy_config_forms = args.lazy_config_forms
+        self.model_arg_specs = {}  # cached field specs of each method's model config
+        self.dataparser_arg_specs = {}  # cached field specs of each dataparser config
 
         self.num_devices = args.num_devices
         self.device_type = args.device_type
@@ -42,7 +50,34 @@ class TrainerTab(WebUITrainer):
         self.dist_url = args.dist_url
         self.user_websocket_port = args.websocket_port
 
+        # the method registry imports torch, so it is loaded when the tab is opened
         self.use_external_methods = args.use_external_methods
+        self.method_descriptions = {}
+        self.dataparsers = {}
+
+        self.websocket_port = None
+
+        # one sampler serves the status of the current run to every connected client
+        self.status_broadcaster = StatusBroadcaster(
+            self.get_status, min_interval=args.status_interval
+        )
+        self.log_settings = get_log_settings(args)
+        self.log = None  # output of the current run
+        self.profile_sample_every = args.profile_every
+        self.telemetry_interval = args.telemetry_interval
+        self.telemetry = None  # resource use of the current run
+
+        self.sweep = None  # trials of the current hyperparameter sweep
+        # one trial per device at a time
+        self.sweep_pool = DevicePool(max_workers=self.num_devices)
+        self.sweep_broadcaster = StatusBroadcaster(
+            self.get_sweep_view, min_interval=args.status_interval
+        )
+
+    def load_registry(self):
+        from nerfstudio.configs import dataparser_configs as dc
+        from nerfstudio.configs import method_configs as mc
+
         if self.use_external_methods:
             self.method_descriptions = mc.all_descriptions
             self.dataparsers = dc.all_dataparsers
@@ -50,250 +85,446 @@ class TrainerTab(WebUITrainer):
             self.method_descriptions = mc.descriptions
             self.dataparsers = dc.dataparsers
 
-        self.websocket_port = None
+    def load(self, method, dataparser):
+        """Load the registry and reveal the tab content the first time it is opened."""
+        if not self.method_descriptions:
+            self.load_registry()
+        return (
+            gr.update(visible=False),
+            gr.update(visible=True),
+            gr.update(choices=list(self.method_descriptions.keys()), value=method),
+            gr.update(
+                choices=["default"] + list(self.dataparsers.keys()), value=dataparser
+            ),
+            True,
+        )
 
     def setup_ui(self):
-        with gr.Tab(label="Train"):
-            status = gr.Textbox(label="Status", lines=1, placeholder="Waiting")
-            with gr.Row():
-                run_button = gr.Button(value="Train", variant="primary")
-                stop_button = gr.Button(value="Stop", variant="stop")
-                pause_button = gr.Button(value="Pause", variant="secondary")
-                cmd_button = gr.Button(value="Show Command")
-                viser_button = gr.Button(value="Open Viser", variant="secondary")
-                viser_button.click(self.open_viser, inputs=None, outputs=None)
-
-            with gr.Row():
-                max_num_iterations = gr.Slider(
-                    minimum=0,
-                    maximum=50000,
-                    step=100,
-                    label="Max Num Iterations",
-                    value=30000,
-                )
-                steps_per_save = gr.Slider(
-                    minimum=0,
-                    maximum=10000,
-                    step=100,
-                    label="Steps Per Save",
-                    value=2000,
-                )
-
-            if os.name == "nt":
-                with gr.Row():
-                    data_path = gr.Textbox(
-                        label="Data Path",
-                        lines=1,
-                        placeholder="Path to the data folder",
-                        scale=4,
-                    )
-                    browse_button = gr.Button(value="Browse", scale=1)
-                    browse_button.click(browse_folder, None, outputs=data_path)
-                    gr.ClearButton(components=[data_path], scale=1)
-            else:
-                with gr.Row():
-                    data_path = gr.Textbox(
-                        label="Data Path",
-                        lines=1,
-                        placeholder="Path to the data folder",
-                        scale=5,
+        with gr.Tab(label="Train") as self.tab:
+            placeholder = gr.Markdown("Loading the method registry...")
+            with gr.Column(visible=False) as content:
+                status = gr.Textbox(label="Status", lines=1, placeholder="Waiting")
+                with gr.Accordion("Log", open=False):
+                    log = gr.Textbox(
+                        show_label=False, lines=15, max_lines=15, autoscroll=True
                     )
-                    choose_button = gr.Button(value="Submit", scale=1)
-                with gr.Row():
-                    file_explorer = gr.FileExplorer(
-                        label="Browse",
-                        scale=1,
-                        root_dir=self.root_dir,
-                        file_count="multiple",
-                        height=300,
+                with gr.Accordion("Profile", open=False):
+                    with gr.Row():
+                        profile = gr.Checkbox(
+                            label="Profile Steps",
+                            info="Time the phases of every "
+                            f"{self.profile_sample_every}th step",
+                            value=False,
+                            scale=2,
+                        )
+                        profile_button = gr.Button(value="Download Profile", scale=1)
+                    profile_files = gr.File(
+                        label="Chrome Trace and Summary", file_count="multiple"
                     )
-                    file_explorer.change(
-                        get_folder_path, inputs=file_explorer, outputs=data_path
+                    profile_button.click(
+                        self.get_profile, inputs=None, outputs=profile_files
                     )
-                    choose_button.click(submit, inputs=data_path, outputs=data_path)
+                with gr.Accordion("Telemetry", open=False):
+                    telemetry_text = gr.Markdown("No run yet")
+                    telemetry_plots = []
+                    with gr.Row():
+                        for label in METRICS.values():
+                            telemetry_plots.append(
+                                gr.LinePlot(
+                                    x="Minutes",
+                                    y=label,
+                                    title=label,
+                                    height=200,
+                                    width=260,
+                                    min_width=260,
+                                )
+                            )
+                with gr.Row():
+                    run_button = gr.Button(value="Train", variant="primary")
+                    stop_button = gr.Button(value="Stop", variant="stop")
+                    pause_button = gr.Button(value="Pause", variant="secondary")
+                    cmd_button = gr.Button(value="Show Command")
+                    viser_button = gr.Button(value="Open Viser", variant="secondary")
+                    viser_button.click(self.open_viser, inputs=None, outputs=None)
 
-            with gr.Row():
-                with gr.Column():
-                    method = gr.Radio(
-                        choices=list(self.method_descriptions.keys()), label="Method"
-                    )
-                    description = gr.Textbox(label="Description", visible=True)
-                    method.change(
-                        self.get_model_description, inputs=method, outputs=description
-                    )
-                with gr.Column():
-                    dataparser = gr.Radio(
-                        choices=["default"] + list(self.dataparsers.keys()),
-                        label="Data Parser",
-                        value="default",
+                with gr.Row():
+                    max_num_iterations = gr.Slider(
+                        minimum=0,
+                        maximum=50000,
+                        step=100,
+                        label="Max Num Iterations",
+                        value=30000,
                     )
-                    visualizer = gr.Radio(
-                        choices=[
-                            "viewer",
-                            "wandb",
-                            "tensorboard",
-                            "comet",
-                            "viewer+wandb",
-                            "viewer+tensorboard",
-                            "viewer+comet",
-                            "viewer_legacy",
-                        ],
-                        label="Visualizer",
-                        value="viewer",
+                    steps_per_save = gr.Slider(
+                        minimum=0,
+                        maximum=10000,
+                        step=100,
+                        label="Steps Per Save",
+                        value=2000,
                     )
 
-            with gr.Accordion("Model Config", open=False):
-                for key, value in self.method_descriptions.items():
-                    with gr.Group(visible=False) as group:
-                        if key in mc.all_methods:
-                            if (
-                                type(mc.all_methods[key])
-                                is ExternalMethodDummyTrainerConfig
-                            ):
-                                continue
-
-                            model_config = mc.all_methods[key].pipeline.model  # type: ignore
-                            generated_args, labels = generate_args(
-                                model_config, visible=True
-                            )
-                            self.model_arg_list += generated_args
-                            self.model_arg_names += labels
-                            self.model_arg_idx[key] = [
-                                len(self.model_arg_list) - len(generated_args),
-                                len(self.model_arg_list),
-                            ]
-                            self.model_groups.append(group)
-                            self.model_group_idx[key] = len(self.model_groups) - 1
-                method.change(
-                    self.update_model_args_visibility,
-                    inputs=method,
-                    outputs=self.model_groups,
-                )
+                if os.name == "nt":
+                    with gr.Row():
+                        data_path = gr.Textbox(
+                            label="Data Path",
+                            lines=1,
+                            placeholder="Path to the data folder",
+                            scale=4,
+                        )
+                        browse_button = gr.Button(value="Browse", scale=1)
+                        browse_button.click(browse_folder, None, outputs=data_path)
+                        gr.ClearButton(components=[data_path], scale=1)
+                else:
+                    with gr.Row():
+                        data_path = gr.Textbox(
+                            label="Data Path",
+                            lines=1,
+                            placeholder="Path to the data folder",
+                            scale=5,
+                        )
+                        choose_button = gr.Button(value="Submit", scale=1)
+                    with gr.Accordion("Browse", open=True):
+                        setup_dir_browser(self.root_dir, data_path)
+                    choose_button.click(submit, inputs=data_path, outputs=data_path)
 
-            with gr.Accordion("Data Parser Config", open=False):
-                for key, parser_config in self.dataparsers.items():
-                    with gr.Group(visible=False) as group:
-                        generated_args, labels = generate_args(
-                            parser_config, visible=True
+                with gr.Row():
+                    with gr.Column():
+                        method = gr.Radio(
+                            choices=list(self.method_descriptions.keys()), label="Method"
+                        )
+                        description = gr.Textbox(label="Description", visible=True)
+                        method.change(
+                            self.get_model_description, inputs=method, outputs=description
+                        )
+                    with gr.Column():
+                        dataparser = gr.Radio(
+                            choices=["default"] + list(self.dataparsers.keys()),
+                            label="Data Parser",
+                            value="default",
+                        )
+                        visualizer = gr.Radio(
+                            choices=[
+                                "viewer",
+                                "wandb",
+                                "tensorboard",
+                                "comet",
+                                "viewer+wandb",
+                                "viewer+tensorboard",
+                                "viewer+comet",
+                                "viewer_legacy",
+                            ],
+                            label="Visualizer",
+                            value="viewer",
                         )
-                        self.dataparser_arg_list += generated_args
-                        self.dataparser_arg_names += labels
-                        self.dataparser_arg_idx[key] = [
-                            len(self.dataparser_arg_list) - len(generated_args),
-                            len(self.dataparser_arg_list),
-                        ]
-                        self.dataparser_groups.append(group)
-                        self.dataparser_group_idx[key] = len(self.dataparser_groups) - 1
-                dataparser.change(
-                    self.update_dataparser_args_visibility,
-                    inputs=dataparser,
-                    outputs=self.dataparser_groups,
-                )
 
-            update_event = run_button.click(
-                self.update_status,
-                inputs=[data_path, method, dataparser, visualizer],
-                outputs=status,
-                every=1,
-            )
+                # values entered in the config forms, per browser session
+                model_arg_values = gr.State({})
+                dataparser_arg_values = gr.State({})
+                # set by load, the forms of all the configs are built after it
+                registry_loaded = gr.State(False)
+                with gr.Accordion("Model Config", open=False):
+                    if self.lazy_config_forms:
+
+                        # not rebuilt on edits, only when another method is selected
+                        @gr.render(
+                            inputs=[method, model_arg_values], triggers=[method.change]
+                        )
+                        def render_model_args(method, values):
+                            specs = self.get_model_arg_specs(method)
+                            arg_spec_cache.save()
+                            if specs:
+                                render_args(
+                                    specs, model_arg_values, method, values.get(method)
+                                )
+
+                    else:
+
+                        @gr.render(
+                            inputs=[method, model_arg_values],
+                            triggers=[registry_loaded.change],
+                        )
+                        def render_all_model_args(method_value, values):
+                            render_form_groups(
+                                {
+                                    key: self.get_model_arg_specs(key)
+                                    for key in self.method_descriptions
+                                },
+                                model_arg_values,
+                                values,
+                                method,
+                                method_value,
+                            )
+                            arg_spec_cache.save()
 
-            run_button.click(
-                self.get_model_args,
-                inputs=[method] + self.model_arg_list,
-                outputs=None,
-            ).then(
-                self.get_data_parser_args,
-                inputs=[dataparser] + self.dataparser_arg_list,  # type: ignore
-                outputs=None,
-            ).then(
-                self.run_train,
-                inputs=[
-                    data_path,
-                    method,
-                    max_num_iterations,
-                    steps_per_save,
-                    dataparser,
-                    visualizer,
-                ],
-                outputs=None,
-            )
+                with gr.Accordion("Data Parser Config", open=False):
+                    if self.lazy_config_forms:
 
-            pause_button.click(self.pause, inputs=None, outputs=pause_button)
+                        @gr.render(
+                            inputs=[dataparser, dataparser_arg_values],
+                            triggers=[dataparser.change],
+                        )
+                        def render_dataparser_args(dataparser, values):
+                            specs = self.get_dataparser_arg_specs(dataparser)
+                            arg_spec_cache.save()
+                            if specs:
+                                render_args(
+                                    specs,
+                                    dataparser_arg_values,
+                                    dataparser,
+                                    values.get(dataparser),
+                                )
+
+                    else:
+
+                        @gr.render(
+                            inputs=[dataparser, dataparser_arg_values],
+                            triggers=[registry_loaded.change],
+                        )
+                        def render_all_dataparser_args(dataparser_value, values):
+                            render_form_groups(
+                                {
+                                    key: self.get_dataparser_arg_specs(key)
+                                    for key in self.dataparsers
+                                },
+                                dataparser_arg_values,
+                                values,
+                                dataparser,
+                                dataparser_value,
+                            )
+                            arg_spec_cache.save()
+
+                with gr.Accordion("Sweep", open=False):
+                    sweep_fields = gr.Textbox(
+                        label="Swept Fields",
+                        info="One model config field per line, the other fields "
+                        "keep the Model Config values. Each trial trains on one of "
+                        f"the {self.num_devices} devices, its log is written to the "
+                        "log folder.",
+                        lines=4,
+                        placeholder="num_proposal_iterations = 1, 2\n"
+                        "near_plane = 0.01..0.1\n"
+                        "far_plane = 100..10000 log",
+                    )
+                    with gr.Row():
+                        sweep_mode = gr.Radio(
+                            choices=list(SWEEP_MODES), label="Mode", value="grid"
+                        )
+                        sweep_points = gr.Slider(
+                            minimum=1,
+                            maximum=10,
+                            step=1,
+                            label="Points Per Range",
+                            info="Grid mode",
+                            value=3,
+                        )
+                        sweep_trials = gr.Slider(
+                            minimum=1,
+                            maximum=MAX_TRIALS,
+                            step=1,
+                            label="Trials",
+                            info="Random mode",
+                            value=8,
+                        )
+                        sweep_seed = gr.Number(label="Seed", value=0, precision=0)
+                    with gr.Row():
+                        early_stop = gr.Checkbox(
+                            label="Early Termination",
+                            info="Evaluate at rung steps and stop the trials "
+                            "outside the best 1 / reduction factor",
+                            value=False,
+                        )
+                        first_rung = gr.Slider(
+                            minimum=100,
+                            maximum=50000,
+                            step=100,
+                            label="First Rung Step",
+                            value=2000,
+                        )
+                        reduction_factor = gr.Slider(
+                            minimum=2,
+                            maximum=5,
+                            step=1,
+                            label="Reduction Factor",
+                            info="Rungs are this many times apart",
+                            value=3,
+                        )
+                        rung_metric = gr.Radio(
+                            choices=["psnr", "ssim", "lpips"],
+                            label="Rung Metric",
+                            value="psnr",
+                        )
+                    with gr.Row():
+                        sweep_button = gr.Button(value="Run Sweep", variant="primary")
+                        sweep_stop_button = gr.Button(value="Stop Sweep", variant="stop")
+                    sweep_status = gr.Textbox(label="Sweep Status", lines=1)
+                    sweep_table = gr.Dataframe(
+                        headers=["Trial", "State", "Step"],
+                        label="Results",
+                        interactive=False,
+                    )
 
-            stop_button.click(
-                self.stop, inputs=None, outputs=status, cancels=[update_event]
-            )
+                run_button.click(
+                    self.run_train,
+                    inputs=[
+                        data_path,
+                        method,
+                        max_num_iterations,
+                        steps_per_save,
+                        dataparser,
+                        visualizer,
+                        profile,
+                        model_arg_values,
+                        dataparser_arg_values,
+                    ],
+                    outputs=status,
+                )
 
-            cmd_button.click(
-                self.get_model_args,
-                inputs=[method] + self.model_arg_list,
-                outputs=None,
-            ).then(
-                self.get_data_parser_args,
-                inputs=[dataparser] + self.dataparser_arg_list,  # type: ignore
-                outputs=None,
-            ).then(
-                self.generate_cmd,
-                inputs=[
-                    data_path,
-                    method,
-                    max_num_iterations,
-                    steps_per_save,
-                    dataparser,
-                    visualizer,
-                ],
-                outputs=status,
-            )
+                sweep_button.click(
+                    self.run_sweep,
+                    inputs=[
+                        data_path,
+                        method,
+                        max_num_iterations,
+                        steps_per_save,
+                        dataparser,
+                        visualizer,
+                        sweep_fields,
+                        sweep_mode,
+                        sweep_points,
+                        sweep_trials,
+                        sweep_seed,
+                        early_stop,
+                        first_rung,
+                        reduction_factor,
+                        rung_metric,
+                        model_arg_values,
+                        dataparser_arg_values,
+                    ],
+                    outputs=sweep_status,
+                )
+                sweep_stop_button.click(self.stop_sweep, inputs=None, outputs=sweep_status)
+
+                pause_button.click(self.pause, inputs=None, outputs=pause_button)
+
+                stop_button.click(self.stop, inputs=None, outputs=status)
+
+                cmd_button.click(
+                    self.generate_cmd,
+                    inputs=[
+                        data_path,
+                        method,
+                        max_num_iterations,
+                        steps_per_save,
+                        dataparser,
+                        visualizer,
+                        model_arg_values,
+                        dataparser_arg_values,
+                    ],
+                    outputs=status,
+                )
 
-    def update_status(self, data_path, method, data_parser, visualizer):
-        if self.trainer is not None and self.trainer.step != 0:
-            if self.trainer.training_state == "paused":
+            self.load_listener = {
+                "fn": self.load,
+                "inputs": [method, dataparser],
+                "outputs": [placeholder, content, method, dataparser, registry_loaded],
+            }
+            self.tab.select(**self.load_listener)
+            # started on every page load, so each client and reloaded page follows
+            # the current run and sweep, whichever session started them
+            self.session_streams = [
+                {"fn": self.stream_status, "outputs": status},
+                {"fn": functools.partial(follow, lambda: self.log), "outputs": log},
+                {
+                    "fn": functools.partial(follow, lambda: self.telemetry),
+                    "outputs": [telemetry_text, *telemetry_plots],
+                },
+                {"fn": self.stream_sweep, "outputs": [sweep_table, sweep_status]},
+            ]
+
+    def get_status(self):
+        # the worker publishes into shared memory, reading it never waits on training
+        if self.channel is None:
+            # no run yet, or running in a new terminal
+            return ""
+        status = self.channel.read()
+        if status["state"] == "failed":
+            return "Training failed. Please check the log for more information."
+        elif status["state"] == "stopped":
+            return "Stopped. Config and checkpoint saved at " + self.get_saved_paths()
+        elif status["state"] == "completed":
+            return "Training Finished! Press stop to shut down the viewer."
+        elif not self.is_running():
+            return "Training process exited. Please check the log for more information."
+        elif status["step"] != 0:
+            if status["state"] == "paused":
                 return "Paused"
-            elif self.trainer.training_state == "completed":
-                return "Training Finished! Press stop to shut down the viewer."
-            else:
-                return "Step: " + str(self.trainer.step)
+            return "Step: {} | Loss: {:.4f} | {:.1f} it/s".format(
+                int(status["step"]), status["loss"], status["steps_per_sec"]
+            )
         else:
-            check = self.check(data_path, method, data_parser, visualizer)
-            if check is not None:
-                return check
-            return "Initializing... Please check the terminal for more information."
+            return "Initializing... Please check the log for more information."
+
+    async def stream_status(self):
+        """Push the status of the current run to a client while it is connected."""
+        stream = self.status_broadcaster.subscribe()
+        try:
+            async for status in stream:
+                yield status
+        finally:
+            await stream.aclose()
+
+    def read_step(self):
+        # the step counter only moves while training, not while loading or paused
+        return self.channel.read()["step"]
 
     def pause(self):
         """Pause or resume the training."""
-        """FIXME: If paused by webui, the viser pause button will work as resume button. """
-        if self.trainer is not None:
-            if self.trainer.training_state == "paused":
-                self.trainer.training_state = "training"
+        if self.is_running():
+            if self.channel.read()["state"] == "paused":
+                self.channel.send("resume")
                 return "Pause"
             else:
-                self.trainer.training_state = "paused"
+                self.channel.send("pause")
                 return "Resume"
 
         else:
             raise gr.Error("Please run the training first")
 
     def stop(self):
-        # stop the training
-        if self.trainer is not None:
-            config_path = self.config.get_base_dir() / "config.yml"
-            ckpt_path = self.trainer.checkpoint_dir
-            self.trainer.shutdown()
-            print(
-                "Stopped. Config and checkpoint saved at "
-                + str(config_path)
-                + " and "
-                + str(ckpt_path)
-            )
-            return (
-                "Stopped. Config and checkpoint saved at "
-                + str(config_path)
-                + " and "
-                + str(ckpt_path)
-            )
+        # stop the training, the worker saves a checkpoint before it exits
+        if self.is_running():
+            self.channel.send("stop")
+            print("Stopped. Config and checkpoint saved at " + self.get_saved_paths())
+            return "Stopped. Config and checkpoint saved at " + self.get_saved_paths()
         else:
             raise gr.Error("Please run the training first")
 
+    def get_profile(self):
+        """Paths of the Chrome trace and the summary of the current run's profile."""
+        if self.config is None or self.channel is None:
+            raise gr.Error("Please run the training first")
+        if self.profile_every == 0:
+            raise gr.Error("This run is not profiled, check Profile Steps before training")
+        if self.is_running():
+            # the samples live in the worker, ask it to write them out
+            requested = time.time()
+            self.channel.send("save_profile")
+            deadline = requested + 10
+            while self.channel.read()["profile_saved"] < requested:
+                if time.time() > deadline or not self.is_running():
+                    break
+                time.sleep(0.1)
+        profile_dir = self.get_profile_dir()
+        paths = [profile_dir / "trace.json", profile_dir / "summary.json"]
+        if not all(path.exists() for path in paths):
+            raise gr.Error("No profile was written yet, please try again in a moment")
+        return [str(path) for path in paths]
+
+    def get_saved_paths(self):
+        config_path = self.config.get_base_dir() / "config.yml"
+        ckpt_path = self.config.get_checkpoint_dir()
+        return str(config_path) + " and " + str(ckpt_path)
+
     def run_train(
         self,
         data_path,
@@ -302,7 +533,11 @@ class TrainerTab(WebUITrainer):
         steps_per_save,
         data_parser,
         visualizer,
+        profile=False,
+        model_values=None,
+        dataparser_values=None,
     ):
+        """Train with the values the session entered in the config forms."""
         cmd = self.generate_cmd(
             data_path,
             method,
@@ -310,18 +545,31 @@ class TrainerTab(WebUITrainer):
             steps_per_save,
             data_parser,
             visualizer,
+            model_values,
+            dataparser_values,
         )
         print(cmd)
         if self.run_in_new_terminal:
             run_cmd(cmd)
+            return "Training in a new terminal, please check it for more information."
         else:
-            # set up the config
-            config = mc.all_methods[method]
-            config.data = Path(data_path)
-            config.max_num_iterations = max_num_iterations
-            config.steps_per_save = steps_per_save
-            config.vis = visualizer
-
+            if self.is_running():
+                raise gr.Error("Training is already running, please stop it first")
+            if self.sweep is not None and self.sweep.is_running():
+                raise gr.Error("A sweep is running, please stop it first")
+
+            from nerfstudio.viewer_legacy.server import viewer_utils
+
+            config = self.build_config(
+                data_path,
+                method,
+                max_num_iterations,
+                steps_per_save,
+                data_parser,
+                visualizer,
+                model_values,
+                dataparser_values,
+            )
             if self.user_websocket_port > 0 and viewer_utils.is_port_open(
                 self.user_websocket_port
             ):
@@ -329,17 +577,144 @@ class TrainerTab(WebUITrainer):
             else:
                 self.websocket_port = viewer_utils.get_free_port()
             config.viewer.websocket_port = self.websocket_port
+            self.config = config
+            # train in a worker process so the web-ui stays responsive
+            self.log = JobLog("train", **self.log_settings)
+            self.profile_every = self.profile_sample_every if profile else 0
+            self.start(self.log, self.profile_every)
+            self.telemetry = JobTelemetry(
+                self.process.pid,
+                read_step=self.read_step,
+                # splatfacto and other methods without ray batches only get steps/s
+                rays_per_step=getattr(
+                    config.pipeline.datamanager, "train_num_rays_per_batch", None
+                ),
+                interval=self.telemetry_interval,
+            ).start()
+            return "Initializing... Please check the log for more information."
+
+    def build_config(
+        self,
+        data_path,
+        method,
+        max_num_iterations,
+        steps_per_save,
+        data_parser,
+        visualizer,
+        model_values=None,
+        dataparser_values=None,
+    ):
+        """The method's config with the values entered in the tab."""
+        from nerfstudio.configs import method_configs as mc
+
+        config = mc.all_methods[method]
+        config.data = Path(data_path)
+        config.max_num_iterations = max_num_iterations
+        config.steps_per_save = steps_per_save
+        config.vis = visualizer
+
+        if data_parser != "default":
+            config.pipeline.datamanager.dataparser = self.dataparsers[data_parser]
+            dataparser_args, _ = self.get_data_parser_args(
+                data_parser, dataparser_values
+            )
+            for key, value in dataparser_args.items():
+                setattr(config.pipeline.datamanager.dataparser, key, value)
 
-            if data_parser != "default":
-                config.pipeline.datamanager.dataparser = self.dataparsers[data_parser]
-                for key, value in self.dataparser_args.items():
-                    setattr(config.pipeline.datamanager.dataparser, key, value)
+        model_args, _ = self.get_model_args(method, model_values)
+        for key, value in model_args.items():
+            setattr(config.pipeline.model, key, value)
+        return config
 
-            for key, value in self.model_args.items():
-                setattr(config.pipeline.model, key, value)
-            # from nerfstudio.scripts import train
-            self.config = config
-            self.main()
+    def run_sweep(
+        self,
+        data_path,
+        method,
+        max_num_iterations,
+        steps_per_save,
+        data_parser,
+        visualizer,
+        fields,
+        mode,
+        points,
+        num_trials,
+        seed,
+        early_stop=False,
+        first_rung=2000,
+        reduction_factor=3,
+        rung_metric="psnr",
+        model_values=None,
+        dataparser_values=None,
+    ):
+        """Queue one training run per combination of the swept field values."""
+        check = self.check(data_path, method, data_parser, visualizer)
+        if check is not None:
+            raise gr.Error(check)
+        if self.run_in_new_terminal:
+            raise gr.Error("Sweeps are not available in a new terminal")
+        if self.is_running():
+            raise gr.Error("Training is already running, please stop it first")
+        if self.sweep is not None and self.sweep.is_running():
+            raise gr.Error("A sweep is already running, please stop it first")
+        specs = self.get_model_arg_specs(method)
+        if not specs:
+            raise gr.Error(f"{method} has no model config to sweep")
+        try:
+            sweep = parse_sweep(fields, specs)
+            overrides = expand_sweep(
+                sweep, specs, mode, int(num_trials), int(points), seed
+            )
+        except ValueError as e:
+            raise gr.Error(str(e))
+        scheduler = None
+        if early_stop:
+            scheduler = SuccessiveHalving(
+                int(first_rung), max_num_iterations, int(reduction_factor), rung_metric
+            )
+            if not scheduler.rung_steps:
+                raise gr.Error("The first rung must come before Max Num Iterations")
+
+        config = self.build_config(
+            data_path,
+            method,
+            max_num_iterations,
+            steps_per_save,
+            data_parser,
+            visualizer,
+            model_values,
+            dataparser_values,
+        )
+        timestamp = time.strftime("%Y-%m-%d_%H%M%S")
+        trials = []
+        for index, trial_overrides in enumerate(overrides, start=1):
+            log = JobLog(f"sweep-trial{index:03d}", **self.log_settings)
+            trial = SweepTrial(index, config, trial_overrides, timestamp, log)
+            if scheduler is not None:
+                trial.rung_steps = scheduler.rung_steps
+                trial.rung_metric = rung_metric
+            trials.append(self.sweep_pool.submit(trial))
+        self.sweep = Sweep(trials, list(sweep), scheduler)
+        return f"Submitted {len(trials)} trials"
+
+    def get_sweep_view(self):
+        if self.sweep is None:
+            return {"headers": ["Trial", "State", "Step"], "data": []}, ""
+        return self.sweep.get_table(), self.sweep.get_summary()
+
+    async def stream_sweep(self):
+        stream = self.sweep_broadcaster.subscribe()
+        try:
+            async for table, summary in stream:
+                yield table, summary
+        finally:
+            await stream.aclose()
+
+    def stop_sweep(self):
+        if self.sweep is None or not self.sweep.is_running():
+            raise gr.Error("No sweep is running")
+        # queued trials are dropped, running ones save a checkpoint and exit
+        self.sweep.stop()
+        return "Stopping the sweep..."
 
     def generate_cmd(
         self,
@@ -349,6 +724,8 @@ class TrainerTab(WebUITrainer):
         steps_per_save,
         data_parser,
         visualizer,
+        model_values=None,
+        dataparser_values=None,
     ):
         # generate the command
         if data_parser == "":
@@ -362,9 +739,13 @@ class TrainerTab(WebUITrainer):
         check = self.check(data_path, method, data_parser, visualizer)
         if check is not None:
             return check
+        _, model_args_cmd = self.get_model_args(method, model_values)
+        _, dataparser_args_cmd = self.get_data_parser_args(
+            data_parser, dataparser_values
+        )
         if data_parser == "default":
             data_parser = ""
-        cmd = f"ns-train {method} {self.model_args_cmd} --vis {visualizer} --max-num-iterations {max_num_iterations} --steps-per-save {steps_per_save} --data {data_path} {data_parser} {self.dataparser_args_cmd}"
+        cmd = f"ns-train {method} {model_args_cmd} --vis {visualizer} --max-num-iterations {max_num_iterations} --steps-per-save {steps_per_save} --data {data_path} {data_parser} {dataparser_args_cmd}"
         return cmd
 
     def check(self, data_path, method, data_parser, visualizer):
@@ -379,73 +760,64 @@ class TrainerTab(WebUITrainer):
         else:
             return None
 
-    def get_model_args(self, method, *args):
-        temp_args = {}
-        args = list(args)
+    def get_model_arg_specs(self, method):
+        """Return the field specs of a method's model config, None if it has no form."""
+        if not method:
+            return None
+        if method not in self.model_arg_specs:
+            from nerfstudio.configs import method_configs as mc
+            from nerfstudio.configs.external_methods import (
+                ExternalMethodDummyTrainerConfig,
+            )
+
+            config = mc.all_methods.get(method)
+            if config is None or type(config) is ExternalMethodDummyTrainerConfig:
+                self.model_arg_specs[method] = None
+            else:
+                self.model_arg_specs[method] = arg_spec_cache.get(
+                    method, config.pipeline.model  # type: ignore
+                )
+        return self.model_arg_specs[method]
+
+    def get_dataparser_arg_specs(self, dataparser):
+        """Return the field specs of a dataparser config, None for the default one."""
+        if not dataparser or dataparser == "default":
+            return None
+        if dataparser not in self.dataparser_arg_specs:
+            if not self.dataparsers:
+                self.load_registry()
+            self.dataparser_arg_specs[dataparser] = arg_spec_cache.get(
+                dataparser, self.dataparsers[dataparser]
+            )
+        return self.dataparser_arg_specs[dataparser]
+
+    def get_model_args(self, method, form_values=None):
+        """The model config values a session entered and their command line flags."""
         cmd = ""
-        values = args[self.model_arg_idx[method][0] : self.model_arg_idx[method][1]]
-        names = self.model_arg_names[
-            self.model_arg_idx[method][0] : self.model_arg_idx[method][1]
-        ]
-        for key, value in zip(names, values):
+        # fields that were never edited keep the config defaults
+        specs = self.get_model_arg_specs(method) or []
+        temp_args = get_form_args(specs, form_values, method)
+        for key, value in temp_args.items():
             cmd += f"--pipeline.model.{key} {value} "
-            temp_args[key] = value
         # remove the last space
-        self.model_args_cmd = cmd[:-1]
-        self.model_args = temp_args
+        return temp_args, cmd[:-1]
 
-    def get_data_parser_args(self, dataparser, *args):
+    def get_data_parser_args(self, dataparser, form_values=None):
         if dataparser == "default":
-            self.dataparser_args_cmd = ""
-            self.dataparser_args = {}
-            return
+            return {}, ""
 
-        temp_args = {}
-        args = list(args)
         cmd = ""
-        names = self.dataparser_arg_names[
-            self.dataparser_arg_idx[dataparser][0] : self.dataparser_arg_idx[
-                dataparser
-            ][1]
-        ]
-        values = args[
-            self.dataparser_arg_idx[dataparser][0] : self.dataparser_arg_idx[
-                dataparser
-            ][1]
-        ]
-        for key, value in zip(names, values):
+        specs = self.get_dataparser_arg_specs(dataparser) or []
+        temp_args = get_form_args(specs, form_values, dataparser)
+        for key, value in temp_args.items():
             # change key to --{key}
             cmd += f"--{key} {value} "
-            temp_args[key] = value
         # remove the last space
-        self.dataparser_args_cmd = cmd[:-1]
-        self.dataparser_args = temp_args
+        return temp_args, cmd[:-1]
 
     def get_model_description(self, method):
         return self.method_descriptions[method]
 
-    def update_dataparser_args_visibility(self, dataparser):
-        # print(group_keys)
-        # print(dataparser_args)
-        if dataparser == "default":
-            return [gr.update(visible=False)] * len(self.dataparser_groups)
-
-        idx = self.dataparser_group_idx[dataparser]
-        # if the dataparser is not the current one, then hide the dataparser args
-        update_info = [gr.update(visible=False)] * len(self.dataparser_groups)
-        update_info[idx] = gr.update(visible=True)
-        return update_info
-
-    def update_model_args_visibility(self, method):
-        if method not in self.model_group_idx.keys():
-            return [gr.update(visible=False)] * len(self.model_groups)
-
-        idx = self.model_group_idx[method]
-        # if the method is not the current one, then hide the model args
-        update_info = [gr.update(visible=False)] * len(self.model_groups)
-        update_info[idx] = gr.update(visible=True)
-        return update_info
-
     def open_viser(self):
         # open url in a new tab, if a browser window is already open.
         if self.websocket_port is None:
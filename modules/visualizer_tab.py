@@ -1,76 +1,103 @@
+import functools
 import os
+import signal
 import subprocess
 import webbrowser
 import argparse
 import gradio as gr
 
-
-from nerfstudio.viewer_legacy.server import viewer_utils
 from utils.utils import (
     run_cmd,
     browse_cfg,
 )
+from utils.logs import JobLog, get_log_settings, stream_log
+from utils.run_index import setup_run_browser
 
 
 class VisualizerTab:
     def __init__(self, args: argparse.Namespace):
         self.root_dir = args.root_dir  # root directory
         self.run_in_new_terminal = args.run_in_new_terminal # run in new terminal
+        self.run_index_interval = args.run_index_interval
 
         self.p = None
         self.websocket_port = None
+        self.log_settings = get_log_settings(args)
+        self.log = None  # output of the current viewer
+        self.run_browser = None  # listener filling the run table, see setup_run_browser
 
-    def setup_ui(self):
-        with gr.Tab(label="Visualize"):
-            status = gr.Textbox(label="Status", lines=1, placeholder="Waiting")
-            with gr.Row():
-                vis_button = gr.Button(value="Run Viser", variant="primary")
-                stop_button = gr.Button(value="Stop", variant="stop")
-                vis_cmd_button = gr.Button(value="Show Command")
-                viser_button = gr.Button(value="Open Viser", variant="secondary")
-                viser_button.click(self.open_viser)
+    def load(self, *browser_inputs):
+        """Start the run index and reveal the tab content when it is opened."""
+        updates = (gr.update(visible=False), gr.update(visible=True))
+        if self.run_browser is None:
+            return updates
+        return updates + tuple(self.run_browser["fn"](*browser_inputs))
 
-            if os.name == "nt":
-                with gr.Row():
-                    config_path = gr.Textbox(
-                        label="Config Path",
-                        lines=1,
-                        placeholder="Path to the config",
-                        scale=4,
-                    )
-                    cfg_browse_button = gr.Button(value="Browse", scale=1)
-                    cfg_browse_button.click(browse_cfg, None, outputs=config_path)
-                    gr.ClearButton(components=[config_path], scale=1)
-            else:
-                with gr.Row():
-                    config_path = gr.Textbox(
-                        label="Config Path",
-                        lines=1,
-                        placeholder="Path to the config",
-                        scale=5,
-                    )
-                    cfg_choose_button = gr.Button(value="Submit", scale=1)
+    def setup_ui(self):
+        with gr.Tab(label="Visualize") as self.tab:
+            placeholder = gr.Markdown("Loading the runs...")
+            with gr.Column(visible=False) as content:
+                status = gr.Textbox(label="Status", lines=1, placeholder="Waiting")
                 with gr.Row():
-                    cfg_file_explorer = gr.FileExplorer(
-                        label="Browse",
-                        scale=1,
-                        root_dir=self.root_dir,
-                        file_count="single",
-                        height=300,
-                        glob="*.yml",
-                    )
-                    cfg_file_explorer.change(
-                        lambda x: str(x), inputs=cfg_file_explorer, outputs=config_path
+                    vis_button = gr.Button(value="Run Viser", variant="primary")
+                    stop_button = gr.Button(value="Stop", variant="stop")
+                    vis_cmd_button = gr.Button(value="Show Command")
+                    viser_button = gr.Button(value="Open Viser", variant="secondary")
+                    viser_button.click(self.open_viser)
+                with gr.Accordion("Log", open=False):
+                    log = gr.Textbox(
+                        show_label=False, lines=15, max_lines=15, autoscroll=True
                     )
+
+                if os.name == "nt":
+                    with gr.Row():
+                        config_path = gr.Textbox(
+                            label="Config Path",
+                            lines=1,
+                            placeholder="Path to the config",
+                            scale=4,
+                        )
+                        cfg_browse_button = gr.Button(value="Browse", scale=1)
+                        cfg_browse_button.click(browse_cfg, None, outputs=config_path)
+                        gr.ClearButton(components=[config_path], scale=1)
+                else:
+                    with gr.Row():
+                        config_path = gr.Textbox(
+                            label="Config Path",
+                            lines=1,
+                            placeholder="Path to the config",
+                            scale=5,
+                        )
+                        cfg_choose_button = gr.Button(value="Submit", scale=1)
+                    with gr.Accordion("Runs", open=True):
+                        # indexed in the background instead of walking root_dir per visit
+                        self.run_browser = setup_run_browser(
+                            self.root_dir, self.run_index_interval, config_path
+                        )
                     cfg_choose_button.click(
                         lambda x: str(x), inputs=config_path, outputs=config_path
                     )
 
-            vis_button.click(self.run_vis, inputs=[config_path], outputs=status)
-            vis_cmd_button.click(
-                self.generate_vis_cmd, inputs=[config_path], outputs=status
-            )
-            stop_button.click(self.stop, inputs=None, outputs=status)
+                vis_button.click(
+                    self.run_vis, inputs=[config_path], outputs=status
+                ).success(
+                    functools.partial(stream_log, lambda: self.log),
+                    inputs=None,
+                    outputs=log,
+                    concurrency_limit=None,
+                )
+                vis_cmd_button.click(
+                    self.generate_vis_cmd, inputs=[config_path], outputs=status
+                )
+                stop_button.click(self.stop, inputs=None, outputs=status)
+
+            browser = self.run_browser or {"inputs": [], "outputs": []}
+            self.load_listener = {
+                "fn": self.load,
+                "inputs": browser["inputs"],
+                "outputs": [placeholder, content] + browser["outputs"],
+            }
+            self.tab.select(**self.load_listener)
 
     def run_vis(self, config_path):
         cmd = self.generate_vis_cmd(config_path)
@@ -78,9 +105,22 @@ class VisualizerTab:
         if self.run_in_new_terminal:
             run_cmd(cmd)
         else:
+            from nerfstudio.viewer_legacy.server import viewer_utils
+
             self.websocket_port = viewer_utils.get_free_port()
             cmd = f"{cmd} --viewer.websocket-port {self.websocket_port}"
-            self.p = subprocess.Popen(cmd, shell=True)
+            self.log = JobLog("viewer", **self.log_settings)
+            self.p = subprocess.Popen(
+                cmd,
+                shell=True,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.STDOUT,
+                env={**os.environ, "PYTHONUNBUFFERED": "1"},
+                # own process group, so stopping it also stops ns-viewer, not
+                # only the shell running it
+                start_new_session=os.name != "nt",
+            )
+            self.log.attach(self.p.stdout)
         return "Viewer is on url: http://localhost:{}/".format(self.websocket_port)
 
     def generate_vis_cmd(self, config_path):
@@ -107,7 +147,13 @@ class VisualizerTab:
             return None
 
     def stop(self):
-        self.p.terminate()
+        if self.p is None or self.p.poll() is not None:
+            raise gr.Error("No viewer is running")
+        try:
+            os.killpg(self.p.pid, signal.SIGTERM)
+        except (AttributeError, ProcessLookupError, PermissionError):
+            # no process groups on this platform
+            self.p.terminate()
         return "Viewer stopped"
 
     def open_viser(self):
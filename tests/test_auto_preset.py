@@ -0,0 +1,50 @@
+from PIL import Image
+
+from utils.auto_preset import get_num_downscales, get_num_pairs, get_plan
+
+
+def make_photos(folder, count, size):
+    folder.mkdir()
+    Image.new("RGB", size).save(folder / "photo_000.jpg")
+    # only the first image is opened, the others are counted
+    for i in range(1, count):
+        (folder / f"photo_{i:03d}.jpg").touch()
+    (folder / "notes.txt").touch()
+
+
+def test_get_num_downscales():
+    assert get_num_downscales(1600) == 0
+    assert get_num_downscales(1601) == 1
+    assert get_num_downscales(4000) == 2
+    assert get_num_downscales(100000) == 4
+
+
+def test_get_num_pairs():
+    assert get_num_pairs("exhaustive", 10) == 45
+    assert get_num_pairs("sequential", 10) == 45
+    assert get_num_pairs("sequential", 100) == 1500
+    assert get_num_pairs("vocab_tree", 1000) == 100000
+
+
+def test_get_plan_matches_few_photos_exhaustively(tmp_path):
+    make_photos(tmp_path / "photos", 20, (4000, 3000))
+    args = {"num_downscales": 3, "matching_method": "vocab_tree", "gpu": False}
+    settings, summary = get_plan(tmp_path / "photos", args, cores=1)
+    assert settings == {"num_downscales": 2, "matching_method": "exhaustive"}
+    assert "20 photos of 4000 px on 1 core" in summary
+
+
+def test_get_plan_uses_a_vocab_tree_for_many_photos(tmp_path):
+    make_photos(tmp_path / "photos", 100, (1200, 800))
+    args = {"num_downscales": 3, "matching_method": "exhaustive", "gpu": False}
+    settings, _ = get_plan(tmp_path / "photos", args, cores=1)
+    assert settings == {"num_downscales": 0, "matching_method": "vocab_tree"}
+    # the GPU matches them all quickly enough
+    settings, _ = get_plan(tmp_path / "photos", dict(args, gpu=True), cores=1)
+    assert settings["matching_method"] == "exhaustive"
+
+
+def test_get_plan_sets_only_the_processor_fields(tmp_path):
+    make_photos(tmp_path / "photos", 5, (800, 600))
+    settings, _ = get_plan(tmp_path / "photos", {"num_downscales": 3})
+    assert settings == {"num_downscales": 0}
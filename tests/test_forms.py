@@ -0,0 +1,82 @@
+from dataclasses import dataclass
+from typing import Literal
+
+import gradio as gr
+
+from utils.utils import (
+    get_arg_specs,
+    get_form_args,
+    render_args,
+    render_form_groups,
+    set_form_value,
+    show_forms,
+)
+
+
+@dataclass
+class ModelConfig:
+    lr: float = 0.01
+    steps: int = 100
+    use_x: bool = False
+    name: str = "model"
+    mode: Literal["a", "b"] = "a"
+
+
+def test_get_arg_specs():
+    specs = {spec["name"]: spec for spec in get_arg_specs(ModelConfig())}
+    assert [specs[name]["kind"] for name in ("lr", "steps", "use_x", "name")] == [
+        "float", "int", "bool", "str"
+    ]
+    assert specs["mode"]["choices"] == ["a", "b"]
+
+
+def test_form_values_are_kept_per_key():
+    values = {}
+    values = set_form_value("m0", "lr", 0.5, values)
+    values = set_form_value("m1", "steps", 7, values)
+    assert values == {"m0": {"lr": 0.5}, "m1": {"steps": 7}}
+
+
+def test_get_form_args_uses_defaults_for_fields_never_edited():
+    specs = get_arg_specs(ModelConfig())
+    args = get_form_args(specs, {"m0": {"lr": 0.5}}, "m0")
+    assert args == {"lr": 0.5, "steps": 100, "use_x": False, "name": "model", "mode": "a"}
+    # another session, or another method, still sees the defaults
+    assert get_form_args(specs, {}, "m0")["lr"] == 0.01
+    assert get_form_args(specs, None, "m1")["lr"] == 0.01
+
+
+def test_render_args_shows_the_session_values():
+    specs = get_arg_specs(ModelConfig())
+    with gr.Blocks():
+        form_values = gr.State({})
+        components = render_args(specs, form_values, "m0", {"lr": 0.5})
+    assert [component.label for component in components] == [
+        spec["name"] for spec in specs
+    ]
+    assert components[0].value == 0.5
+    assert components[1].value == 100
+
+
+def test_show_forms():
+    hidden = {"__type__": "update", "visible": False}
+    shown = {"__type__": "update", "visible": True}
+    assert show_forms(["a", "b"], "b") == [hidden, shown]
+    assert show_forms(["a", "b"], ["a", "b"]) == [shown, shown]
+    # a single output takes the bare update
+    assert show_forms(["a"], None) == hidden
+
+
+def test_render_form_groups_shows_the_selected_form():
+    specs = get_arg_specs(ModelConfig())
+    with gr.Blocks() as demo:
+        method = gr.Radio(choices=["m0", "m1", "m2"], value="m1")
+        form_values = gr.State({})
+        render_form_groups(
+            {"m0": specs, "m1": specs, "m2": None}, form_values, {}, method, "m1"
+        )
+    groups = [block for block in demo.blocks.values() if isinstance(block, gr.Group)]
+    # m2 has no form
+    assert [group.visible for group in groups] == [False, True]
+    toggles = [fn for fn in demo.fns.values() if (method._id, "change") in fn.targets]
+    assert len(toggles) == 1 and toggles[0].outputs == groups
@@ -0,0 +1,37 @@
+from utils.jobs import find_captures, get_output_names
+
+
+def test_find_captures(tmp_path):
+    (tmp_path / "garden.mp4").write_bytes(b"")
+    (tmp_path / "notes.txt").write_text("")
+    (tmp_path / "room").mkdir()
+    (tmp_path / "room" / "0001.jpg").write_bytes(b"")
+    (tmp_path / "empty").mkdir()
+    assert find_captures(tmp_path) == [
+        ("VideoToNerfstudioDataset", tmp_path / "garden.mp4"),
+        ("ImagesToNerfstudioDataset", tmp_path / "room"),
+    ]
+
+
+def make_captures(root, names):
+    """Captures of find_captures, a name with a suffix is a video."""
+    captures = []
+    for name in names:
+        path = root / name
+        if path.suffix:
+            path.write_bytes(b"")
+            captures.append(("VideoToNerfstudioDataset", path))
+        else:
+            path.mkdir()
+            captures.append(("ImagesToNerfstudioDataset", path))
+    return captures
+
+
+def test_output_names_are_unique(tmp_path):
+    captures = make_captures(tmp_path, ["scene", "scene.mp4", "Scene.MOV", "garden.mp4"])
+    assert get_output_names(captures) == ["scene", "scene_mp4", "Scene_mov", "garden"]
+
+
+def test_output_names_do_not_collide_with_renamed_captures(tmp_path):
+    captures = make_captures(tmp_path, ["a.mp4", "a.mov", "a_mp4"])
+    assert get_output_names(captures) == ["a_mp4", "a_mov", "a_mp4_2"]
@@ -0,0 +1,33 @@
+import numpy as np
+
+from utils.keyframes import get_sharpness, select_keyframes
+
+
+def test_get_sharpness():
+    flat = np.full((8, 8), 128, np.float32)
+    checkerboard = np.indices((8, 8)).sum(0) % 2 * 255.0
+    assert get_sharpness(flat) == 0
+    assert get_sharpness(checkerboard) > get_sharpness(checkerboard / 2) > 0
+    # a batch is scored per image
+    batch = get_sharpness(np.stack([flat, checkerboard]))
+    assert batch.shape == (2,)
+    assert batch[1] == get_sharpness(checkerboard)
+
+
+def test_select_keyframes_skips_blurry_and_redundant_windows():
+    # four windows of ten frames, each sharpest in its middle
+    sharpness = np.full(40, 10.0)
+    sharpness[5::10] = 20.0
+    sharpness[10:20] = 1.0  # out of focus
+    motion = np.ones(40)
+    motion[0] = 0.0
+    motion[6:30] = 0.0  # the camera stops after the first keyframe
+    keyframes, blurry, redundant = select_keyframes(sharpness, motion, 4)
+    assert keyframes == [5, 35]
+    assert (blurry, redundant) == (1, 1)
+
+
+def test_select_keyframes_of_a_short_video():
+    keyframes, blurry, redundant = select_keyframes(np.ones(3), np.ones(3), 10)
+    assert keyframes == [0, 1, 2]
+    assert (blurry, redundant) == (0, 0)
@@ -0,0 +1,57 @@
+import asyncio
+import gzip
+
+from utils.logs import JobLog, stream_log
+
+
+def test_memory_keeps_the_last_lines():
+    log = JobLog("job", log_dir=None, max_lines=3)
+    for i in range(5):
+        log.write(f"line {i}")
+    lines, cursor = log.read_since(0)
+    assert lines == ["line 2", "line 3", "line 4"]
+    assert log.read_since(cursor) == ([], 5)
+    log.write("line 5")
+    assert log.read_since(cursor) == (["line 5"], 6)
+
+
+def test_file_is_rotated_into_gzip_backups(tmp_path):
+    log = JobLog("job", log_dir=tmp_path, max_bytes=100, backup_count=2)
+    for i in range(50):
+        log.write(f"line {i:02d}")
+    log.close()
+    backups = sorted(tmp_path.glob("*.log.*.gz"))
+    assert len(backups) == 2
+    # the current file holds the last lines, the newest backup the ones before
+    current = log.path.read_text().splitlines()
+    assert current[-1] == "line 49"
+    with gzip.open(backups[0], "rt") as f:
+        assert f.read().splitlines()[-1] == f"line {int(current[0][5:]) - 1:02d}"
+
+
+def test_stream_starts_from_the_kept_lines_and_ends_with_the_log():
+    async def run():
+        log = JobLog("job", log_dir=None)
+        log.write("first")
+        texts = []
+        stream = stream_log(lambda: log)
+        async for text in stream:
+            texts.append(text)
+            if text == "first\n":
+                log.write("second")
+                log.close()
+        return texts
+
+    assert asyncio.run(run()) == ["", "first\n", "first\nsecond\n"]
+
+
+def test_stream_cuts_long_text():
+    async def run():
+        log = JobLog("job", log_dir=None)
+        for _ in range(10):
+            log.write("x" * 99)
+        log.close()
+        return [text async for text in log.stream(interval=0, max_chars=500)]
+
+    texts = asyncio.run(run())
+    assert len(texts[-1]) == 250
@@ -0,0 +1,102 @@
+import dataclasses
+import os
+import time
+from pathlib import Path
+
+import pytest
+
+from utils.jobs import ProcessingJob, get_cache_key, get_cache_parts
+from utils.output_cache import OutputCache, fingerprint, unshare_links
+
+
+def make_output(path, size=100):
+    (path / "images").mkdir(parents=True)
+    (path / "images" / "frame_00001.png").write_bytes(b"p" * size)
+    (path / "transforms.json").write_text("{}")
+    return path
+
+
+def test_fingerprint_follows_the_content(tmp_path):
+    (tmp_path / "a.jpg").write_bytes(b"abc")
+    before = fingerprint(tmp_path)
+    assert fingerprint(tmp_path) == before
+    (tmp_path / "a.jpg").write_bytes(b"abd")
+    assert fingerprint(tmp_path) != before
+
+
+def test_restore_links_a_stored_output(tmp_path):
+    cache = OutputCache(tmp_path / "cache", 10**6)
+    key = cache.get_key({"data": "x"})
+    assert not cache.restore(key, tmp_path / "missing")
+    cache.store(key, make_output(tmp_path / "run"), "run")
+    assert cache.restore(key, tmp_path / "restored")
+    image = tmp_path / "restored" / "images" / "frame_00001.png"
+    # images are hard linked, the rest is copied
+    assert image.stat().st_nlink == 3
+    assert (tmp_path / "restored" / "transforms.json").stat().st_nlink == 1
+    unshare_links(tmp_path / "restored")
+    assert image.stat().st_nlink == 1
+
+
+def test_restore_refuses_a_folder_with_other_files(tmp_path):
+    cache = OutputCache(tmp_path / "cache", 10**6)
+    key = cache.get_key({"data": "x"})
+    cache.store(key, make_output(tmp_path / "run"))
+    output_dir = tmp_path / "other"
+    output_dir.mkdir()
+    (output_dir / "notes.txt").write_text("")
+    with pytest.raises(FileExistsError):
+        cache.restore(key, output_dir)
+    assert sorted(os.listdir(output_dir)) == ["notes.txt"]
+    # exports add their files next to the others
+    assert cache.restore(key, output_dir, merge=True)
+    assert (output_dir / "transforms.json").exists()
+
+
+def test_least_recently_used_entries_are_evicted(tmp_path):
+    cache = OutputCache(tmp_path / "cache", 250)
+    keys = [cache.get_key({"data": i}) for i in range(3)]
+    for i, key in enumerate(keys[:2]):
+        cache.store(key, make_output(tmp_path / f"run{i}"))
+        time.sleep(0.01)
+    # using the first entry makes the second the least recently used
+    assert cache.restore(keys[0], tmp_path / "restored")
+    time.sleep(0.01)
+    cache.store(keys[2], make_output(tmp_path / "run2"))
+    assert sorted(cache.get_entries()) == sorted([keys[0], keys[2]])
+
+
+def test_invalidate_and_clear(tmp_path):
+    cache = OutputCache(tmp_path / "cache", 10**6)
+    key = cache.get_key({"data": "x"})
+    cache.store(key, make_output(tmp_path / "run"))
+    assert cache.invalidate(key)
+    assert not cache.invalidate(key)
+    cache.store(key, tmp_path / "run")
+    cache.clear()
+    assert cache.get_entries() == {}
+    assert not cache.restore(key, tmp_path / "restored")
+
+
+@dataclasses.dataclass
+class Processor:
+    data: Path
+    output_dir: Path
+
+
+def test_job_restores_a_hit_in_its_worker(tmp_path):
+    (tmp_path / "input").mkdir()
+    (tmp_path / "input" / "a.jpg").write_bytes(b"abc")
+    cache = OutputCache(tmp_path / "cache", 10**6)
+    parts = get_cache_parts("ImagesToNerfstudioDataset", {"num_downscales": 2})
+    key = get_cache_key(cache, parts, tmp_path / "input")
+    cache.store(key, make_output(tmp_path / "run"))
+    job = ProcessingJob(
+        "ImagesToNerfstudioDataset",
+        Processor(tmp_path / "input", tmp_path / "restored"),
+    )
+    job.cache = (cache, parts)
+    job.start()
+    job.process.join(60)
+    assert (job.get_stage(), job.is_cached()) == ("finished", True)
+    assert (tmp_path / "restored" / "transforms.json").exists()
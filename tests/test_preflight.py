@@ -0,0 +1,52 @@
+import os
+
+import numpy as np
+from PIL import Image
+
+from utils.preflight import PreflightCache, get_report, scan_folder
+
+
+def save_image(path, seed):
+    pixels = np.random.default_rng(seed).integers(0, 255, (64, 96, 3), np.uint8)
+    Image.fromarray(pixels).save(path)
+
+
+def test_scan_folder(tmp_path):
+    images = tmp_path / "images"
+    images.mkdir()
+    for i in range(3):
+        save_image(images / f"frame_{i}.png", i)
+    (images / "frame_3.png").write_bytes((images / "frame_0.png").read_bytes())
+    (images / "broken.jpg").write_bytes(b"not an image")
+    (images / "notes.txt").write_text("skipped")
+    scan = scan_folder(images, cache=None)
+    assert list(scan["images"]) == [
+        "broken.jpg",
+        "frame_0.png",
+        "frame_1.png",
+        "frame_2.png",
+        "frame_3.png",
+    ]
+    assert scan["analyzed"] == 5
+    assert scan["images"]["broken.jpg"][2] is None
+    assert scan["images"]["frame_1.png"][2]["width"] == 96
+    report, rows = get_report(scan)
+    assert "4 images" in report and "1 unreadable" in report
+    assert "duplicate of frame_0.png" in " ".join(str(row) for row in rows)
+
+
+def test_scan_folder_reanalyzes_only_changed_images(tmp_path):
+    images = tmp_path / "images"
+    images.mkdir()
+    for i in range(3):
+        save_image(images / f"frame_{i}.png", i)
+    cache = PreflightCache(tmp_path / "preflight")
+    assert scan_folder(images, cache=cache)["analyzed"] == 3
+    assert scan_folder(images, cache=cache)["analyzed"] == 0
+    folder_mtime = images.stat().st_mtime_ns
+    save_image(images / "frame_1.png", 10)
+    # rewritten in place, the folder's mtime does not tell
+    os.utime(images, ns=(folder_mtime, folder_mtime))
+    scan = scan_folder(images, cache=cache)
+    assert scan["analyzed"] == 1
+    assert scan["images"] == scan_folder(images, cache=None)["images"]
@@ -0,0 +1,63 @@
+import os
+
+import gradio as gr
+
+from utils import run_index
+from utils.run_index import RunIndex, get_run_index, setup_run_browser
+
+
+def test_setup_run_browser_does_not_scan(tmp_path, monkeypatch):
+    # the index is saved next to the test data, not in the user's cache
+    monkeypatch.setattr(run_index, "CACHE_DIR", tmp_path)
+    get_run_index.cache_clear()
+    with gr.Blocks():
+        config_path = gr.Textbox()
+        listener = setup_run_browser(str(tmp_path), 0, config_path)
+    assert get_run_index.cache_info().currsize == 0
+    rows, page, info = listener["fn"]("", 1)
+    assert rows == []
+    assert get_run_index.cache_info().currsize == 1
+    assert page == 1 and info.startswith("0 runs")
+
+
+def make_run(path, method="nerfacto", steps=()):
+    path.mkdir(parents=True)
+    (path / "config.yml").write_text(
+        f"method_name: {method}\nexperiment_name: poster\ntimestamp: '2024'\n"
+    )
+    (path / "nerfstudio_models").mkdir()
+    for step in steps:
+        (path / "nerfstudio_models" / f"step-{step:09d}.ckpt").write_bytes(b"0")
+
+
+def test_scan_finds_runs(tmp_path):
+    make_run(tmp_path / "runs" / "poster" / "nerfacto" / "2024", steps=(100, 2000))
+    (tmp_path / "data").mkdir()
+    (tmp_path / "data" / "config.yml").write_text("not: a run\n")
+    index = RunIndex(tmp_path / "runs", interval=0, path=tmp_path / "index.json")
+    index.scan()
+    rows, _, _, count = index.search("nerfacto")
+    assert count == 1
+    assert rows[0][:5] == ["nerfacto", "", "poster", "2024", 2000]
+    # the next index starts from the saved one
+    saved = RunIndex(tmp_path / "runs", interval=0, path=tmp_path / "index.json")
+    assert saved.runs == index.runs
+    assert index.search("splatfacto")[3] == 0
+
+
+def test_scan_notices_a_checkpoint_rewritten_in_place(tmp_path):
+    run = tmp_path / "run"
+    make_run(run, steps=(100,))
+    index = RunIndex(tmp_path, interval=0, path=tmp_path / "index.json")
+    index.scan()
+    size = index.runs[str(run)]["size"]
+    folders = [tmp_path, run, run / "nerfstudio_models"]
+    mtimes = [folder.stat().st_mtime_ns for folder in folders]
+    checkpoint = run / "nerfstudio_models" / "step-000000100.ckpt"
+    checkpoint.write_bytes(b"0" * 1000)
+    os.utime(checkpoint, ns=(0, 1))
+    # the folders look untouched, only the checkpoint changed
+    for folder, mtime in zip(folders, mtimes):
+        os.utime(folder, ns=(mtime, mtime))
+    index.scan()
+    assert index.runs[str(run)]["size"] == size + 999
@@ -0,0 +1,98 @@
+import asyncio
+import multiprocessing
+
+from utils.status_channel import StatusChannel
+from utils.status_stream import StatusBroadcaster, follow
+
+STATES = ("initializing", "training", "stopped")
+
+
+def train(channel):
+    channel.publish(state="training", step=5)
+    while channel.poll(1.0) != "stop":
+        pass
+    channel.publish(state="stopped", step=6)
+
+
+def test_channel_round_trip():
+    channel = StatusChannel(fields=("step", "loss"), states=STATES)
+    assert channel.read()["state"] == "initializing"
+    channel.publish(state="training", step=10, loss=0.5)
+    status = channel.read()
+    assert (status["state"], status["step"], status["loss"]) == ("training", 10, 0.5)
+    assert status["updated"] > 0
+    channel.send("pause")
+    assert channel.poll() == "pause"
+    assert channel.poll() is None
+
+
+def test_channel_between_processes():
+    context = multiprocessing.get_context("spawn")
+    channel = StatusChannel(fields=("step",), states=STATES, context=context)
+    process = context.Process(target=train, args=(channel,))
+    process.start()
+    try:
+        for _ in range(600):
+            if channel.read()["state"] == "training":
+                break
+            process.join(0.05)
+        assert channel.read()["step"] == 5
+        channel.send("stop")
+        process.join(10)
+    finally:
+        process.kill()
+    assert (channel.read()["state"], channel.read()["step"]) == ("stopped", 6)
+
+
+def test_broadcaster_pushes_changes_to_every_subscriber():
+    async def run():
+        status = {"value": "a"}
+        reads = []
+
+        def read():
+            reads.append(status["value"])
+            return status["value"]
+
+        broadcaster = StatusBroadcaster(read, min_interval=0.01)
+        first, second = broadcaster.subscribe(), broadcaster.subscribe()
+        assert [await anext(first), await anext(second)] == ["a", "a"]
+        status["value"] = "b"
+        assert [await anext(first), await anext(second)] == ["b", "b"]
+        await first.aclose()
+        await second.aclose()
+        await asyncio.sleep(0.05)
+        # one sampler read for all the subscribers, stopped once they are gone
+        assert broadcaster.sampler.done()
+        return len(reads)
+
+    reads = asyncio.run(run())
+    assert reads < 20
+
+
+class Source:
+    def __init__(self, updates):
+        self.updates = updates
+
+    async def stream(self):
+        for update in self.updates:
+            yield update
+        # a log keeps its stream open until its job ends
+        await asyncio.sleep(10)
+
+
+def test_follow_moves_on_to_the_next_source():
+    async def run():
+        sources = {"current": None}
+        updates = follow(lambda: sources["current"], interval=0.01)
+        first = asyncio.ensure_future(anext(updates))
+        await asyncio.sleep(0.05)
+        # nothing is yielded without a source
+        assert not first.done()
+        sources["current"] = Source(["one", "two"])
+        received = [await first, await anext(updates)]
+        sources["current"] = Source(["three"])
+        received.append(await asyncio.wait_for(anext(updates), 1.0))
+        await updates.aclose()
+        return received
+
+    assert asyncio.run(run()) == ["one", "two", "three"]
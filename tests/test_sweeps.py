@@ -0,0 +1,110 @@
+import os
+import time
+
+import pytest
+
+from utils.sweeps import (
+    DevicePool,
+    SuccessiveHalving,
+    expand_sweep,
+    get_rung_steps,
+    parse_sweep,
+)
+
+SPECS = [
+    {"name": "lr", "kind": "float", "default": 0.01},
+    {"name": "steps", "kind": "int", "default": 100},
+    {"name": "mode", "kind": "radio", "choices": ["a", "b"], "default": "a"},
+]
+
+
+def test_parse_sweep():
+    sweep = parse_sweep(
+        "--pipeline.model.lr = 0.001..0.1 log\nsteps = 1..9  # comment\nmode = a, b",
+        SPECS,
+    )
+    assert sweep == {"lr": (0.001, 0.1, True), "steps": (1, 9, False), "mode": ["a", "b"]}
+    with pytest.raises(ValueError, match="not a field"):
+        parse_sweep("other = 1", SPECS)
+    with pytest.raises(ValueError, match="one of"):
+        parse_sweep("mode = c", SPECS)
+
+
+def test_expand_sweep():
+    sweep = {"lr": (0.001, 0.1, True), "mode": ["a", "b"]}
+    grid = expand_sweep(sweep, SPECS, points=3)
+    assert len(grid) == 6
+    assert sorted({trial["lr"] for trial in grid}) == [0.001, 0.01, 0.1]
+    trials = expand_sweep(sweep, SPECS, mode="random", num_trials=5, seed=1)
+    assert trials == expand_sweep(sweep, SPECS, mode="random", num_trials=5, seed=1)
+    assert all(0.001 <= trial["lr"] <= 0.1 for trial in trials)
+
+
+def test_successive_halving_keeps_the_best_third():
+    assert get_rung_steps(100, 3000, 3) == [100, 300, 900, 2700]
+    scheduler = SuccessiveHalving(100, 3000, eta=3)
+    assert not scheduler.should_stop(0, 0, 20.0)
+    # worse than the only trial so far, which is the best third
+    assert scheduler.should_stop(0, 1, 18.0)
+    assert not scheduler.should_stop(0, 2, 25.0)
+
+
+class Trial:
+    """Stands in for a SweepTrial, its worker ends when finish is called."""
+
+    def __init__(self, fails=False):
+        self.fails = fails
+        self.device = None
+        self.error = None
+        self.process = None
+        self.done = False
+
+    def start_on(self, device):
+        if self.fails:
+            raise OSError("no free port")
+        self.device = device
+        read, self.write = os.pipe()
+        # readable once the write end is closed, like a process sentinel
+        self.process = type("Process", (), {"sentinel": read})()
+        return self
+
+    def finish(self):
+        self.done = True
+        os.close(self.write)
+
+    def fail(self, error):
+        self.error = error
+
+    def is_running(self):
+        return self.error is None and not self.done
+
+
+def wait_for(condition, timeout=5.0):
+    deadline = time.time() + timeout
+    while not condition():
+        assert time.time() < deadline
+        time.sleep(0.01)
+
+
+def test_device_pool_runs_a_trial_per_device():
+    pool = DevicePool(max_workers=2)
+    trials = [pool.submit(Trial()) for _ in range(3)]
+    assert [trial.device for trial in trials] == [0, 1, None]
+    trials[1].finish()
+    # the freed device goes to the queued trial
+    wait_for(lambda: trials[2].device == 1)
+    trials[0].finish()
+    trials[2].finish()
+    wait_for(lambda: pool.scheduler is None)
+
+
+def test_device_pool_goes_on_after_a_trial_fails_to_start():
+    pool = DevicePool(max_workers=1)
+    first = pool.submit(Trial())
+    failing = pool.submit(Trial(fails=True))
+    last = pool.submit(Trial())
+    first.finish()
+    wait_for(lambda: last.device == 0)
+    assert isinstance(failing.error, OSError)
+    last.finish()
+    wait_for(lambda: pool.scheduler is None)
@@ -0,0 +1,92 @@
+import functools
+import json
+import os
+from importlib import metadata
+from pathlib import Path
+
+from utils.utils import get_arg_specs
+
+CACHE_DIR = (
+    Path(os.environ.get("XDG_CACHE_HOME", Path.home() / ".cache")) / "nerfstudio-webui"
+)
+
+
+@functools.cache
+def get_package_version(package):
+    """Version of the distribution providing an importable top-level package."""
+    try:
+        return metadata.version(package)
+    except metadata.PackageNotFoundError:
+        pass
+    # the distribution name can differ from the package name, look it up
+    for distribution in metadata.packages_distributions().get(package, []):
+        try:
+            return metadata.version(distribution)
+        except metadata.PackageNotFoundError:
+            continue
+    return "unknown"
+
+
+class ArgSpecCache:
+    """On-disk cache of the field specs produced by get_arg_specs.
+
+    Entries are keyed by the registry name and the config class, and the whole file
+    is dropped when the installed nerfstudio version differs from the one that wrote
+    it. Configs from external packages also carry their package version in the key.
+    """
+
+    def __init__(self, path=CACHE_DIR / "arg_specs.json"):
+        self.path = Path(path)
+        self.version = get_package_version("nerfstudio")
+        self.entries = {}
+        self.dirty = False
+        self.load()
+
+    def load(self):
+        try:
+            cache = json.loads(self.path.read_text())
+        except (OSError, ValueError):
+            return
+        if cache.get("nerfstudio_version") == self.version:
+            self.entries = cache.get("entries", {})
+
+    def save(self):
+        if not self.dirty:
+            return
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            # write to a temporary file first so a crash never leaves a broken cache
+            tmp_path = self.path.with_suffix(".tmp")
+            tmp_path.write_text(
+                json.dumps(
+                    {"nerfstudio_version": self.version, "entries": self.entries}
+                )
+            )
+            os.replace(tmp_path, self.path)
+            self.dirty = False
+        except OSError as e:
+            print(f"Could not write the config schema cache to {self.path}: {e}")
+
+    def get_key(self, name, config):
+        config_class = type(config)
+        key = f"{name}:{config_class.__module__}.{config_class.__qualname__}"
+        package = config_class.__module__.split(".")[0]
+        if package != "nerfstudio":
+            key += f"@{get_package_version(package)}"
+        return key
+
+    def get(self, name, config):
+        """Return the field specs of config, introspecting it only on a cache miss."""
+        key = self.get_key(name, config)
+        if key not in self.entries:
+            self.entries[key] = get_arg_specs(config)
+            self.dirty = True
+        return self.entries[key]
+
+    def clear(self):
+        self.entries = {}
+        self.dirty = True
+        self.save()
+
+
+arg_spec_cache = ArgSpecCache()
@@ -0,0 +1,129 @@
+import math
+from pathlib import Path
+
+from PIL import Image
+
+from utils.frames import get_num_cores, get_video_info, get_video_size
+from utils.jobs import IMAGE_EXTENSIONS, VIDEO_EXTENSIONS, format_seconds
+
+MAX_TRAINING_SIZE = 1600  # long side the smallest downscaled level should fit in
+MAX_DOWNSCALES = 4
+# exhaustive matching is the most robust, it is used while it stays this fast
+EXHAUSTIVE_MAX_SECONDS = 600
+SEQUENTIAL_PAIRS = 15  # per frame, COLMAP's overlap of 10 plus loop detection
+VOCAB_TREE_PAIRS = 100  # per image, COLMAP's default number of retrieved images
+SIFT_MAX_SIZE = 3200  # COLMAP extracts features at most at this long side
+# rough COLMAP timings, (CPU seconds on one core, GPU seconds)
+EXTRACT_SECONDS = (2.0, 0.1)  # per image at SIFT_MAX_SIZE
+MATCH_SECONDS = (0.2, 0.01)  # per image pair
+MAPPING_SECONDS = 0.02  # times images ** 1.5, the mapper barely uses more cores
+
+
+def get_source(data_path, num_frames_target=300):
+    """Kind ("video" or "photos"), number of images and long side of the data."""
+    path = Path(data_path)
+    if path.is_file() and path.suffix.lower() in VIDEO_EXTENSIONS:
+        num_frames, _ = get_video_info(path)
+        return "video", min(num_frames, num_frames_target), max(get_video_size(path))
+    if path.is_dir():
+        images = sorted(
+            file for file in path.iterdir() if file.suffix.lower() in IMAGE_EXTENSIONS
+        )
+        for image_path in images:
+            try:
+                # only the header is read
+                with Image.open(image_path) as image:
+                    return "photos", len(images), max(image.size)
+            except OSError:
+                continue
+    raise ValueError(f"{path} is neither a video nor a folder of images")
+
+
+def get_num_pairs(matching_method, num_images):
+    exhaustive = num_images * (num_images - 1) // 2
+    if matching_method == "sequential":
+        return min(num_images * SEQUENTIAL_PAIRS, exhaustive)
+    if matching_method == "vocab_tree":
+        return min(num_images * VOCAB_TREE_PAIRS, exhaustive)
+    return exhaustive
+
+
+def estimate_seconds(matching_method, num_images, long_side, cores, gpu):
+    """Rough seconds of COLMAP's feature extraction, matching and mapping."""
+    device = 1 if gpu else 0
+    # CPU work is spread over the cores, the GPU does one thing at a time
+    divisor = 1 if gpu else cores
+    scale = (min(long_side, SIFT_MAX_SIZE) / SIFT_MAX_SIZE) ** 2
+    return {
+        "extraction": num_images * EXTRACT_SECONDS[device] * scale / divisor,
+        "matching": get_num_pairs(matching_method, num_images)
+        * MATCH_SECONDS[device]
+        / divisor,
+        "mapping": MAPPING_SECONDS * num_images**1.5,
+    }
+
+
+def get_num_downscales(long_side):
+    """Levels needed for the smallest one to fit in MAX_TRAINING_SIZE."""
+    if long_side <= MAX_TRAINING_SIZE:
+        return 0
+    return min(math.ceil(math.log2(long_side / MAX_TRAINING_SIZE)), MAX_DOWNSCALES)
+
+
+def get_plan(data_path, args, cores=None):
+    """Settings of the auto preset for data_path and a markdown summary of them.
+
+    Videos are matched sequentially, their frames overlap in order. Photos are
+    matched exhaustively while that is estimated to stay under
+    EXHAUSTIVE_MAX_SECONDS, with a vocabulary tree otherwise. Only the fields the
+    data processor has, passed in args, are part of the settings.
+    """
+    cores = cores or get_num_cores()
+    gpu = args.get("gpu", True)
+    kind, num_images, long_side = get_source(
+        data_path, args.get("num_frames_target", 300)
+    )
+    settings = {}
+    lines = [
+        (
+            f"**Auto preset** for {num_images} {'frames' if kind == 'video' else kind} "
+            f"of {long_side} px on {cores} core{'s' if cores > 1 else ''}"
+        )
+    ]
+    if "num_downscales" in args:
+        levels = get_num_downscales(long_side)
+        settings["num_downscales"] = levels
+        lines.append(
+            f"**Downscales:** {levels}, the smallest level is "
+            f"{long_side // 2**levels} px"
+            if levels
+            else f"**Downscales:** 0, the images fit in {MAX_TRAINING_SIZE} px"
+        )
+    if "matching_method" not in args:
+        return settings, "\n\n".join(lines)
+
+    if kind == "video":
+        method = "sequential"
+        reason = "the frames of a video overlap in order"
+    else:
+        exhaustive = estimate_seconds(
+            "exhaustive", num_images, long_side, cores, gpu
+        )["matching"]
+        if exhaustive <= EXHAUSTIVE_MAX_SECONDS:
+            method = "exhaustive"
+            reason = f"matching every pair takes about {format_seconds(exhaustive)}"
+        else:
+            method = "vocab_tree"
+            reason = f"matching every pair would take {format_seconds(exhaustive)}"
+    settings["matching_method"] = method
+    lines.append(f"**Matching:** {method}, {reason}")
+    stages = estimate_seconds(method, num_images, long_side, cores, gpu)
+    lines.append(
+        f"**Estimated COLMAP runtime on the {'GPU' if gpu else 'CPU'}:** "
+        f"{format_seconds(sum(stages.values()))} ("
+        + ", ".join(
+            f"{stage} {format_seconds(seconds)}" for stage, seconds in stages.items()
+        )
+        + "), a rough guide"
+    )
+    return settings, "\n\n".join(lines)
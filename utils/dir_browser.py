@@ -0,0 +1,203 @@
+import collections
+import math
+import os
+import threading
+from pathlib import Path
+
+import gradio as gr
+
+PAGE_SIZE = 50
+MAX_CACHED_LISTINGS = 256
+BROWSER_COLUMNS = ["Name", "Type", "Contents"]
+
+
+class ListingCache:
+    """Listings of folders, reused until the folder's mtime changes.
+
+    Adding or removing an entry changes the mtime of its folder, so a cached
+    listing is only read again when it would differ. At most max_entries listings
+    are kept, the least recently used are dropped first.
+    """
+
+    def __init__(self, max_entries=MAX_CACHED_LISTINGS):
+        self.max_entries = max_entries
+        self.listings = collections.OrderedDict()  # path -> (mtime, listing)
+        self.lock = threading.Lock()
+
+    def get(self, path):
+        """Folders, files with their size, and a summary of a folder.
+
+        Returns None if the folder cannot be read.
+        """
+        path = str(path)
+        try:
+            mtime = os.stat(path).st_mtime_ns
+        except OSError:
+            return None
+        with self.lock:
+            cached = self.listings.get(path)
+            if cached is not None and cached[0] == mtime:
+                self.listings.move_to_end(path)
+                return cached[1]
+        listing = self.read(path)
+        if listing is None:
+            return None
+        with self.lock:
+            self.listings[path] = (mtime, listing)
+            self.listings.move_to_end(path)
+            while len(self.listings) > self.max_entries:
+                self.listings.popitem(last=False)
+        return listing
+
+    @staticmethod
+    def read(path):
+        folders = []
+        files = []
+        extensions = collections.Counter()
+        total_size = 0
+        try:
+            with os.scandir(path) as entries:
+                for entry in entries:
+                    if entry.name.startswith("."):
+                        continue
+                    try:
+                        if entry.is_dir():
+                            folders.append(entry.name)
+                            continue
+                        size = entry.stat().st_size
+                    except OSError:
+                        continue  # removed while listing
+                    files.append((entry.name, size))
+                    extensions[os.path.splitext(entry.name)[1].lower() or "(none)"] += 1
+                    total_size += size
+        except OSError:
+            return None
+        folders.sort(key=str.lower)
+        files.sort(key=lambda file: file[0].lower())
+        return {
+            "folders": folders,
+            "files": files,
+            "extensions": extensions,
+            "size": total_size,
+        }
+
+
+listing_cache = ListingCache()
+
+
+def format_size(size):
+    for unit in ("B", "KB", "MB", "GB"):
+        if size < 1000:
+            return f"{size:.0f} {unit}" if unit == "B" else f"{size:.1f} {unit}"
+        size /= 1000
+    return f"{size:.1f} TB"
+
+
+def summarize_listing(listing):
+    """Counts instead of entries, e.g. 2 folders, 12000 files (11990 .png, ...)."""
+    extensions = ", ".join(
+        f"{count} {extension}"
+        for extension, count in listing["extensions"].most_common(4)
+    )
+    if len(listing["extensions"]) > 4:
+        extensions += ", ..."
+    summary = f"{len(listing['folders'])} folders, {len(listing['files'])} files"
+    if extensions:
+        summary += f" ({extensions})"
+    return summary + f", {format_size(listing['size'])}"
+
+
+def get_count(path):
+    listing = listing_cache.get(path)
+    if listing is None:
+        return ""
+    return f"{len(listing['folders'])} folders, {len(listing['files'])} files"
+
+
+class DirBrowser:
+    """One folder level at a time under root, paginated.
+
+    Only the rows of the shown page are built, and subfolders are summarized by
+    their counts instead of being expanded.
+    """
+
+    def __init__(self, root, page_size=PAGE_SIZE):
+        self.root = Path(root).resolve()
+        self.page_size = page_size
+
+    def resolve(self, folder):
+        """folder as a path inside root, root itself if it is outside or gone."""
+        path = Path(folder or self.root).resolve()
+        if path != self.root and self.root not in path.parents:
+            return self.root
+        return path if path.is_dir() else self.root
+
+    def get_page(self, folder, page=1):
+        """Table, folder, page number and summary to show folder's page."""
+        folder = self.resolve(folder)
+        listing = listing_cache.get(folder)
+        if listing is None:
+            return [], str(folder), 1, f"Cannot read {folder}"
+        entries = [(name, None) for name in listing["folders"]] + listing["files"]
+        num_pages = max(math.ceil(len(entries) / self.page_size), 1)
+        page = min(max(int(page or 1), 1), num_pages)
+        rows = []
+        for name, size in entries[(page - 1) * self.page_size : page * self.page_size]:
+            if size is None:
+                # subfolders of the shown page only, each listing is cached
+                rows.append([name, "folder", get_count(folder / name)])
+            else:
+                extension = os.path.splitext(name)[1].lower()
+                rows.append([name, extension or "file", format_size(size)])
+        info = (
+            f"**{folder}**: {summarize_listing(listing)}"
+            f" | page {page} of {num_pages}"
+        )
+        return rows, str(folder), page, info
+
+    def go_up(self, folder):
+        folder = self.resolve(folder)
+        return self.get_page(folder.parent if folder != self.root else folder)
+
+    def select(self, folder, table, evt: gr.SelectData):
+        """Enter a selected folder, and write the selected path to the path box."""
+        name, kind = table.iloc[evt.index[0], 0], table.iloc[evt.index[0], 1]
+        path = self.resolve(folder) / name
+        if kind == "folder":
+            return (*self.get_page(path), str(path))
+        return gr.update(), str(self.resolve(folder)), gr.update(), gr.update(), str(path)
+
+
+def setup_dir_browser(root_dir, path_box):
+    """Lazy replacement of gr.FileExplorer, selections are written to path_box."""
+    browser = DirBrowser(root_dir)
+    folder = gr.State(str(browser.root))
+    with gr.Row():
+        up_button = gr.Button(value="Up", scale=1)
+        info = gr.Markdown(value=lambda: browser.get_page(None)[3])
+    table = gr.Dataframe(
+        headers=BROWSER_COLUMNS,
+        # evaluated on every page load, so it is never a stale listing
+        value=lambda: browser.get_page(None)[0],
+        interactive=False,
+        height=300,
+    )
+    with gr.Row():
+        previous_button = gr.Button(value="Previous", scale=1)
+        page = gr.Number(value=1, label="Page", precision=0, minimum=1, scale=1)
+        next_button = gr.Button(value="Next", scale=1)
+
+    outputs = [table, folder, page, info]
+    up_button.click(browser.go_up, inputs=folder, outputs=outputs)
+    page.submit(browser.get_page, inputs=[folder, page], outputs=outputs)
+    previous_button.click(
+        lambda path, number: browser.get_page(path, number - 1),
+        inputs=[folder, page],
+        outputs=outputs,
+    )
+    next_button.click(
+        lambda path, number: browser.get_page(path, number + 1),
+        inputs=[folder, page],
+        outputs=outputs,
+    )
+    table.select(browser.select, inputs=[folder, table], outputs=outputs + [path_box])
@@ -0,0 +1,110 @@
+import concurrent.futures
+import multiprocessing
+import os
+import time
+from pathlib import Path
+
+from PIL import Image
+
+# the image types nerfstudio writes into the images folder of a dataset
+PYRAMID_EXTENSIONS = (".jpg", ".jpeg", ".png")
+JPEG_QUALITY = 95
+
+
+def get_level_dir(image_dir, factor):
+    return image_dir.parent / f"{image_dir.name}_{factor}"
+
+
+def downscale_image(path, num_downscales, resample=Image.BICUBIC):
+    """Write every downscaled level of one image, decoding it only once.
+
+    Each level is resized from the one before it, so the small levels are cheap.
+    JPEGs are decoded at half size right away, the full size is never needed.
+    """
+    path = Path(path)
+    with Image.open(path) as image:
+        width, height = image.size
+        if image.format == "JPEG":
+            image.draft(image.mode, (width // 2, height // 2))
+        if image.mode == "CMYK":
+            level = image.convert("RGB")
+        elif image.mode.startswith("I;16"):
+            # 16 bit images cannot be resized, I holds the same values and is
+            # saved as 16 bit again
+            level = image.convert("I")
+        else:
+            level = image.copy()
+    for i in range(1, num_downscales + 1):
+        factor = 2**i
+        size = (max(width // factor, 1), max(height // factor, 1))
+        level = level.resize(size, resample)
+        out_path = get_level_dir(path.parent, factor) / path.name
+        # replaced instead of overwritten, the old file may be linked from a cache
+        tmp_path = out_path.with_name(".tmp_" + out_path.name)
+        if path.suffix.lower() in (".jpg", ".jpeg"):
+            level.save(tmp_path, format="JPEG", quality=JPEG_QUALITY)
+        else:
+            level.save(tmp_path, format=image.format)
+        os.replace(tmp_path, out_path)
+
+
+def downscale_images(image_dir, num_downscales, workers=None, resample=Image.BICUBIC):
+    """Build images_2, images_4, ... next to image_dir with a process pool.
+
+    Returns a summary line with the throughput in images per second.
+    """
+    image_dir = Path(image_dir)
+    paths = sorted(
+        path
+        for path in image_dir.iterdir()
+        if path.suffix.lower() in PYRAMID_EXTENSIONS and not path.name.startswith(".")
+    )
+    for i in range(1, num_downscales + 1):
+        get_level_dir(image_dir, 2**i).mkdir(exist_ok=True)
+    if workers is None:
+        # the cores this job was pinned to, not the whole machine
+        workers = (
+            len(os.sched_getaffinity(0))
+            if hasattr(os, "sched_getaffinity")
+            else os.cpu_count() or 1
+        )
+    workers = max(min(workers, len(paths)), 1)
+    started = time.perf_counter()
+    with concurrent.futures.ProcessPoolExecutor(
+        workers, mp_context=multiprocessing.get_context("spawn")
+    ) as executor:
+        # consume the results, so the first failed image raises here
+        list(
+            executor.map(
+                downscale_image,
+                paths,
+                [num_downscales] * len(paths),
+                [resample] * len(paths),
+                chunksize=max(len(paths) // (workers * 8), 1),
+            )
+        )
+    elapsed = max(time.perf_counter() - started, 1e-6)
+    factors = ", ".join(str(2**i) for i in range(1, num_downscales + 1))
+    summary = (
+        f"Downscaled {len(paths)} images by {factors}x in {elapsed:.1f}s with "
+        f"{workers} processes, {len(paths) / elapsed:.1f} images/s"
+    )
+    print(summary)
+    return summary
+
+
+class DownscaleDataset:
+    """Stand-in processor for building the levels of an already processed dataset.
+
+    Its job runs with parallel_downscale, so run_processing builds the levels
+    after main has checked the dataset.
+    """
+
+    def __init__(self, data, num_downscales=3):
+        self.data = Path(data)
+        self.output_dir = self.data
+        self.num_downscales = num_downscales
+
+    def main(self):
+        if not (self.data / "images").is_dir():
+            raise FileNotFoundError(f"{self.data} has no images folder")
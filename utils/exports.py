@@ -0,0 +1,120 @@
+import sys
+import time
+import traceback
+from pathlib import Path
+
+from utils.logs import redirect_output
+from utils.output_cache import fingerprint_file
+
+
+def find_checkpoint(config_path):
+    """Latest checkpoint saved next to a training config.yml, None if there is none."""
+    checkpoint_dir = Path(config_path).parent / "nerfstudio_models"
+    checkpoints = sorted(checkpoint_dir.glob("step-*.ckpt"))
+    return checkpoints[-1] if checkpoints else None
+
+
+def get_export_key(cache, exporter, args):
+    """Cache key of an export, None if its checkpoint cannot be found."""
+    checkpoint = find_checkpoint(exporter.load_config)
+    if checkpoint is None:
+        return None
+    exporter_class = type(exporter)
+    return cache.get_key(
+        {
+            "exporter": f"{exporter_class.__module__}.{exporter_class.__qualname__}",
+            "args": args,
+            # hashed in full, a retrained model can keep the same file size
+            "config": fingerprint_file(exporter.load_config, sampled=False),
+            "checkpoint": fingerprint_file(checkpoint, sampled=False),
+        }
+    )
+
+
+def list_files(path):
+    path = Path(path)
+    if not path.is_dir():
+        return {}
+    return {
+        file.relative_to(path): (file.stat().st_size, file.stat().st_mtime_ns)
+        for file in path.rglob("*")
+        if file.is_file()
+    }
+
+
+def share_pipeline(conn):
+    """Load each pipeline once for all exporters run in this process.
+
+    The exporters call eval_setup themselves, it is replaced by a version that keeps
+    the result per set of arguments and reports each load over conn. Returns a
+    function giving the total seconds spent loading so far.
+    """
+    from nerfstudio.scripts import exporter
+
+    eval_setup = exporter.eval_setup
+    loaded = {}
+    load_time = [0.0]
+
+    def shared_eval_setup(*args, **kwargs):
+        # exporters loading with a different test_mode get a pipeline of their own
+        key = repr((args, sorted(kwargs.items())))
+        if key not in loaded:
+            start = time.perf_counter()
+            loaded[key] = eval_setup(*args, **kwargs)
+            seconds = time.perf_counter() - start
+            load_time[0] += seconds
+            conn.send(("load pipeline", seconds))
+        return loaded[key]
+
+    exporter.eval_setup = shared_eval_setup
+    return lambda: load_time[0]
+
+
+def run_exports(exporters, conn, log_socket=None):
+    """Entry point of an export worker, runs each (name, exporter, cache) in turn.
+
+    Sends (stage, seconds) over conn as each stage is done, seconds is None for an
+    exporter that failed. cache is an (OutputCache, key) pair the files written by
+    the exporter are stored under, or None.
+    """
+    redirect_output(log_socket)
+    get_load_time = share_pipeline(conn)
+    failed = False
+    for name, exporter, cache in exporters:
+        start = time.perf_counter()
+        loading = get_load_time()
+        before = list_files(exporter.output_dir)
+        try:
+            exporter.main()
+        except Exception:  # noqa: BLE001
+            # the other exporters can still use the loaded pipeline
+            traceback.print_exc()
+            conn.send((name, None))
+            failed = True
+            continue
+        # the pipeline load is reported as a stage of its own
+        conn.send((name, time.perf_counter() - start - (get_load_time() - loading)))
+        after = list_files(exporter.output_dir)
+        # only what this exporter wrote, the folder may hold anything else
+        files = [file for file, stat in after.items() if before.get(file) != stat]
+        if cache is not None and files:
+            export_cache, key = cache
+            try:
+                export_cache.store(key, exporter.output_dir, name, files)
+            except OSError as e:
+                print(f"Could not add the export to the cache: {e}")
+    conn.close()
+    if failed:
+        sys.exit(1)
+
+
+def format_timing(stage, seconds):
+    if seconds is None:
+        return f"{stage}: failed"
+    if seconds == "cached":
+        return f"{stage}: cached"
+    return f"{stage}: {seconds:.1f} s"
+
+
+def format_timings(timings):
+    return " | ".join(format_timing(stage, seconds) for stage, seconds in timings)
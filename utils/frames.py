@@ -0,0 +1,301 @@
+import concurrent.futures
+import json
+import math
+import os
+import shutil
+import subprocess
+import sys
+import time
+from fractions import Fraction
+from pathlib import Path
+
+from utils.keyframes import find_keyframes
+
+# video frames decoded per segment at least, shorter ones spend more time seeking
+MIN_SEGMENT_FRAMES = 240
+
+
+def get_video_info(video_path):
+    """Number of frames and frame rate of the first video stream."""
+    output = subprocess.run(
+        [
+            "ffprobe", "-v", "error", "-select_streams", "v:0", "-count_packets",
+            "-show_entries", "stream=nb_read_packets,avg_frame_rate,r_frame_rate",
+            "-of", "json", str(video_path),
+        ],
+        capture_output=True,
+        text=True,
+        check=True,
+    ).stdout
+    stream = json.loads(output)["streams"][0]
+    num_frames = int(stream["nb_read_packets"])
+    for key in ("avg_frame_rate", "r_frame_rate"):
+        numerator, _, denominator = stream.get(key, "0/0").partition("/")
+        if float(denominator or 1) > 0 and float(numerator) > 0:
+            return num_frames, float(numerator) / float(denominator or 1)
+    raise ValueError(f"Cannot read the frame rate of {video_path}")
+
+
+def is_variable_frame_rate(video_path):
+    """Whether the average frame rate of the first video stream is not its base rate.
+
+    Segments are cut at times computed from the frame rate, which only hits the
+    frame boundaries at a constant rate.
+    """
+    output = subprocess.run(
+        [
+            "ffprobe", "-v", "error", "-select_streams", "v:0",
+            "-show_entries", "stream=avg_frame_rate,r_frame_rate", "-of", "json",
+            str(video_path),
+        ],
+        capture_output=True,
+        text=True,
+        check=True,
+    ).stdout
+    stream = json.loads(output)["streams"][0]
+    rates = []
+    for key in ("avg_frame_rate", "r_frame_rate"):
+        numerator, _, denominator = stream.get(key, "0/0").partition("/")
+        if Fraction(numerator) == 0 or Fraction(denominator or 1) == 0:
+            return True  # unknown, only a single pass is safe
+        rates.append(Fraction(numerator) / Fraction(denominator or 1))
+    return rates[0] != rates[1]
+
+
+def get_video_size(video_path):
+    """Width and height of the first video stream."""
+    output = subprocess.run(
+        [
+            "ffprobe", "-v", "error", "-select_streams", "v:0",
+            "-show_entries", "stream=width,height", "-of", "json", str(video_path),
+        ],
+        capture_output=True,
+        text=True,
+        check=True,
+    ).stdout
+    stream = json.loads(output)["streams"][0]
+    return int(stream["width"]), int(stream["height"])
+
+
+def get_num_cores():
+    if hasattr(os, "sched_getaffinity"):
+        # the cores this job was pinned to, not the whole machine
+        return len(os.sched_getaffinity(0))
+    return os.cpu_count() or 1
+
+
+def get_segments(num_frames, spacing, num_segments):
+    """(first frame, number of frames) of each segment.
+
+    Segments start at multiples of spacing, so ffmpeg's thumbnail filter picks
+    from the same groups of frames as in a single pass over the whole video.
+    """
+    num_segments = min(num_segments, math.ceil(num_frames / MIN_SEGMENT_FRAMES))
+    length = math.ceil(num_frames / max(num_segments, 1) / spacing) * spacing
+    return [
+        (first, min(length, num_frames - first))
+        for first in range(0, num_frames, length)
+    ]
+
+
+def convert_video_in_segments(
+    video_path,
+    image_dir,
+    num_frames_target,
+    num_downscales,
+    crop_factor=(0, 0, 0, 0),
+    image_prefix="frame_",
+    keep_image_dir=False,
+    num_segments=None,
+    keyframes=None,
+):
+    """Extract frames like nerfstudio's convert_video_to_images, in parallel.
+
+    The video is split into time segments that ffmpeg extracts at the same time,
+    then the frames are renamed in order, frame_00001.png onwards, so the output
+    is named as in a single pass. keyframes are the indices of the frames to
+    extract, instead of one of every num_frames / num_frames_target frames.
+    Videos with a variable frame rate are extracted in a single segment.
+    Returns the summary log, the number of frames extracted and the number of
+    segments used.
+    """
+    image_dir = Path(image_dir)
+    dirs = [
+        Path(str(image_dir) + (f"_{2**i}" if i > 0 else ""))
+        for i in range(num_downscales + 1)
+    ]
+    if not keep_image_dir:
+        for path in dirs:
+            shutil.rmtree(path, ignore_errors=True)
+    for path in dirs:
+        path.mkdir(parents=True, exist_ok=True)
+
+    num_frames, fps = get_video_info(video_path)
+    if num_frames == 0:
+        raise ValueError(f"{video_path} has no frames")
+    print("Number of frames in video:", num_frames)
+    spacing = num_frames // num_frames_target if keyframes is None else 1
+    cores = get_num_cores()
+    # more segments than cores would only take turns on them
+    num_segments = min(num_segments or cores, cores)
+    if num_segments > 1 and is_variable_frame_rate(video_path):
+        print("The video has a variable frame rate, it is extracted in one segment")
+        num_segments = 1
+    segments = get_segments(num_frames, max(spacing, 1), num_segments)
+    print(f"Extracting frames from {len(segments)} segments in parallel")
+
+    filters = []
+    if spacing > 1:
+        filters.append(f"thumbnail={spacing},setpts=N/TB")
+    if tuple(crop_factor) != (0, 0, 0, 0):
+        top, bottom, left, right = crop_factor
+        filters.append(
+            f"crop=w=iw*{1 - left - right}:h=ih*{1 - top - bottom}"
+            f":x=iw*{left}:y=ih*{top}"
+        )
+    filters.append(
+        f"split={num_downscales + 1}"
+        + "".join(f"[t{i}]" for i in range(num_downscales + 1))
+        + ";"
+        + ";".join(
+            f"[t{i}]scale=iw/{2**i}:ih/{2**i}[out{i}]"
+            for i in range(num_downscales + 1)
+        )
+    )
+    segment_root = image_dir.parent / ".segments"
+    shutil.rmtree(segment_root, ignore_errors=True)
+
+    def extract(index):
+        first, count = segments[index]
+        segment_filters = filters
+        if keyframes is not None:
+            # frame numbers restart at 0 in every segment
+            selected = [i - first for i in keyframes if first <= i < first + count]
+            if not selected:
+                return
+            select = "+".join(f"eq(n\\,{i})" for i in selected)
+            segment_filters = [f"select='{select}'"] + filters
+        outputs = []
+        for i in range(num_downscales + 1):
+            path = segment_root / f"{index:04d}" / str(i)
+            path.mkdir(parents=True, exist_ok=True)
+            outputs += ["-map", f"[out{i}]", str(path / "%06d.png")]
+        cmd = ["ffmpeg", "-nostdin", "-y", "-loglevel", "error"]
+        cmd += ["-threads", str(max(cores // len(segments), 1))]
+        # cut halfway between two frames, so rounding never moves a frame into
+        # the neighbouring segment
+        start = max(first - 0.5, 0) / fps
+        end = (first + count - 0.5) / fps
+        if start > 0:
+            cmd += ["-ss", f"{start:.6f}"]
+        if first + count < num_frames:
+            cmd += ["-t", f"{end - start:.6f}"]
+        cmd += ["-i", str(video_path), "-vsync", "vfr"]
+        if spacing <= 1 and keyframes is None:
+            cmd += ["-pix_fmt", "bgr8"]
+        cmd += ["-filter_complex", ",".join(segment_filters)] + outputs
+        result = subprocess.run(cmd, capture_output=True, text=True, check=False)
+        if result.returncode != 0:
+            raise RuntimeError(
+                f"ffmpeg failed on frames {first}-{first + count - 1}: "
+                + result.stderr.strip()[-1000:]
+            )
+
+    try:
+        with concurrent.futures.ThreadPoolExecutor(len(segments)) as executor:
+            # result() raises the first error of a segment
+            for future in [executor.submit(extract, i) for i in range(len(segments))]:
+                future.result()
+        for i, path in enumerate(dirs):
+            number = 0
+            for index in range(len(segments)):
+                segment_dir = segment_root / f"{index:04d}" / str(i)
+                if not segment_dir.is_dir():
+                    continue  # no keyframe in the segment
+                frames = sorted(segment_dir.iterdir())
+                for frame in frames:
+                    number += 1
+                    os.replace(frame, path / f"{image_prefix}{number:05d}.png")
+    finally:
+        shutil.rmtree(segment_root, ignore_errors=True)
+
+    num_extracted = len(list(image_dir.glob("*.png")))
+    summary_log = [
+        f"Starting with {num_frames} video frames",
+        f"We extracted {num_extracted} images with prefix '{image_prefix}'",
+    ]
+    return summary_log, num_extracted, len(segments)
+
+
+def patch_frame_extraction(channel, num_segments=None, keyframes=False):
+    """Time nerfstudio's frame extraction, and split it into segments if asked.
+
+    With num_segments above 1, videos are extracted by convert_video_in_segments,
+    otherwise in nerfstudio's single ffmpeg pass. Either way the frames per second
+    are printed and added to the summary, so the two can be compared. With
+    keyframes, the sharpest frame of each window is extracted instead, and
+    blurry or redundant windows are skipped.
+    """
+    from nerfstudio.process_data import process_data_utils
+
+    convert = process_data_utils.convert_video_to_images
+
+    def timed_convert(video_path, image_dir, num_frames_target, num_downscales, **kwargs):
+        channel.publish(state="frame extraction", stage_started=time.time())
+        started = time.perf_counter()
+        if keyframes:
+            selected, keyframe_summary = find_keyframes(video_path, num_frames_target)
+            summary_log, num_extracted, used = convert_video_in_segments(
+                video_path,
+                image_dir,
+                num_frames_target,
+                num_downscales,
+                crop_factor=kwargs.get("crop_factor", (0, 0, 0, 0)),
+                image_prefix=kwargs.get("image_prefix", "frame_"),
+                keep_image_dir=kwargs.get("keep_image_dir", False),
+                num_segments=num_segments or 1,
+                keyframes=selected,
+            )
+            summary_log.append(keyframe_summary)
+            mode = "sharpness keyframes" + (
+                f" and {used} parallel segments" if used > 1 else ""
+            )
+        elif (
+            num_segments
+            and num_segments > 1
+            and not kwargs.get("random_seed")
+            and not is_variable_frame_rate(video_path)
+        ):
+            summary_log, num_extracted, used = convert_video_in_segments(
+                video_path,
+                image_dir,
+                num_frames_target,
+                num_downscales,
+                crop_factor=kwargs.get("crop_factor", (0, 0, 0, 0)),
+                image_prefix=kwargs.get("image_prefix", "frame_"),
+                keep_image_dir=kwargs.get("keep_image_dir", False),
+                num_segments=num_segments,
+            )
+            mode = f"{used} parallel segments"
+        else:
+            # randomly sampled frames are picked over the whole video at once, and
+            # segments are only cut on frame boundaries at a constant frame rate
+            summary_log, num_extracted = convert(
+                video_path, image_dir, num_frames_target, num_downscales, **kwargs
+            )
+            mode = "a single pass"
+        elapsed = max(time.perf_counter() - started, 1e-6)
+        line = (
+            f"Extracted {num_extracted} frames in {elapsed:.1f}s with {mode}, "
+            f"{num_extracted / elapsed:.1f} frames/s"
+        )
+        print(line)
+        return summary_log + [line], num_extracted
+
+    # patch every reference, like the run_command patch of track_stages
+    for module in list(sys.modules.values()):
+        name = getattr(module, "__name__", "")
+        if not name.startswith("nerfstudio"):
+            continue
+        if getattr(module, "convert_video_to_images", None) is convert:
+            module.convert_video_to_images = timed_convert
@@ -0,0 +1,231 @@
+import os
+import re
+import shutil
+from pathlib import Path
+
+from PIL import Image
+
+from utils.downscale import downscale_image, get_level_dir
+from utils.jobs import IMAGE_EXTENSIONS
+from utils.output_cache import fingerprint_file
+
+FRAME_PATTERN = re.compile(r"frame_(\d+)$")
+# existing images each new image is matched with in sequential mode
+SEQUENTIAL_OVERLAP = 20
+
+
+def get_frame_number(path):
+    match = FRAME_PATTERN.match(Path(path).stem)
+    return int(match.group(1)) if match else 0
+
+
+class AppendImages:
+    """Stand-in processor adding new images to a dataset processed with COLMAP.
+
+    Only the new images get features extracted and matched. They are registered
+    into the existing sparse model, which is refined by bundle adjustment, and
+    transforms.json is written again from the model. Images of data that are
+    already in the dataset are skipped, so data can be the whole capture folder.
+    The images the model lacks are the new ones, so a failed append is simply
+    run again, and the model is only replaced once every step succeeded.
+    """
+
+    def __init__(
+        self,
+        data,
+        output_dir,
+        matching_method="vocab_tree",
+        colmap_cmd="colmap",
+        gpu=True,
+        verbose=False,
+    ):
+        self.data = Path(data)
+        self.output_dir = Path(output_dir)
+        self.matching_method = matching_method
+        self.colmap_cmd = colmap_cmd
+        self.gpu = gpu
+        self.verbose = verbose
+
+    @property
+    def image_dir(self):
+        return self.output_dir / "images"
+
+    @property
+    def colmap_dir(self):
+        return self.output_dir / "colmap"
+
+    @property
+    def model_dir(self):
+        return self.colmap_dir / "sparse" / "0"
+
+    @property
+    def work_dir(self):
+        # the model being extended, it replaces model_dir once it is done
+        return self.colmap_dir / "append_model"
+
+    def check(self):
+        """Raise if the output folder is not a dataset processed with COLMAP."""
+        for path in (self.image_dir, self.colmap_dir / "database.db", self.model_dir):
+            if not path.exists():
+                raise FileNotFoundError(
+                    f"{path} not found, append needs a dataset processed with COLMAP"
+                )
+
+    def copy_new_images(self):
+        """Copy the images of data that the dataset lacks, numbered after its last.
+
+        Returns the names of all images of the dataset, the copies included.
+        """
+        existing = sorted(
+            path
+            for path in self.image_dir.iterdir()
+            if path.suffix.lower() in IMAGE_EXTENSIONS
+        )
+        # nerfstudio copies the images unchanged, so copies have the same content
+        known = {fingerprint_file(path) for path in existing}
+        new_paths = []
+        for path in sorted(self.data.iterdir()):
+            if path.suffix.lower() not in IMAGE_EXTENSIONS or not path.is_file():
+                continue
+            digest = fingerprint_file(path)
+            if digest not in known:
+                known.add(digest)
+                new_paths.append(path)
+        if existing and new_paths:
+            with Image.open(existing[0]) as image:
+                size = image.size
+            for path in new_paths:
+                with Image.open(path) as image:
+                    if image.size != size:
+                        # cropped images also differ in content, all would be new
+                        raise ValueError(
+                            f"{path.name} is {image.size[0]}x{image.size[1]}, the "
+                            f"dataset's images are {size[0]}x{size[1]}. Append "
+                            "reuses the dataset's camera, it cannot add images of "
+                            "another size or to a dataset cropped when processed."
+                        )
+        number = max((get_frame_number(path) for path in existing), default=0)
+        names = [path.name for path in existing]
+        for path in new_paths:
+            number += 1
+            name = f"frame_{number:05d}{path.suffix.lower()}"
+            shutil.copy2(path, self.image_dir / name)
+            names.append(name)
+        return names
+
+    def get_registered(self):
+        """Names of the images in the sparse model."""
+        from nerfstudio.data.utils.colmap_parsing_utils import read_images_binary
+
+        images = read_images_binary(self.model_dir / "images.bin")
+        return {image.name for image in images.values()}
+
+    def run_colmap(self, *args):
+        from nerfstudio.utils import scripts
+
+        # looked up on every call, so the stage tracking patch applies
+        scripts.run_command(f"{self.colmap_cmd} " + " ".join(args), verbose=self.verbose)
+
+    def match(self, existing, new_names):
+        """Match the new images with each other and with the existing ones."""
+        database = f'--database_path "{self.colmap_dir / "database.db"}"'
+        use_gpu = f"--SiftMatching.use_gpu {int(self.gpu)}"
+        if self.matching_method == "vocab_tree":
+            from nerfstudio.process_data.colmap_utils import get_vocab_tree
+
+            # only the listed images are matched, each with its most similar ones
+            list_path = self.colmap_dir / "new_images.txt"
+            self.run_colmap(
+                "vocab_tree_matcher",
+                database,
+                use_gpu,
+                f'--VocabTreeMatching.vocab_tree_path "{get_vocab_tree()}"',
+                f'--VocabTreeMatching.match_list_path "{list_path}"',
+            )
+            return
+        sequential = self.matching_method == "sequential"
+        # in sequential mode the new images continue the sequence
+        partners = existing[-SEQUENTIAL_OVERLAP:] if sequential else existing
+        pairs = []
+        for i, new in enumerate(new_names):
+            later = new_names[i + 1 :]
+            if sequential:
+                later = later[:SEQUENTIAL_OVERLAP]
+            pairs += [(new, other) for other in partners + later]
+        pairs_path = self.colmap_dir / "new_pairs.txt"
+        pairs_path.write_text("".join(f"{a} {b}\n" for a, b in pairs))
+        self.run_colmap(
+            "matches_importer",
+            database,
+            use_gpu,
+            f'--match_list_path "{pairs_path}"',
+            "--match_type pairs",
+        )
+
+    def main(self):
+        self.check()
+        names = self.copy_new_images()
+        registered = self.get_registered()
+        # also the copies of an append that failed, and images COLMAP could not
+        # register before
+        new_names = [name for name in names if name not in registered]
+        existing = [name for name in names if name in registered]
+        if not new_names:
+            print(f"No new images in {self.data}, every image is registered")
+            return
+        print(f"Appending {len(new_names)} images to {len(existing)} registered ones")
+        list_path = self.colmap_dir / "new_images.txt"
+        list_path.write_text("".join(name + "\n" for name in new_names))
+        if self.work_dir.exists():
+            shutil.rmtree(self.work_dir)
+        self.work_dir.mkdir()
+        model = f'"{self.work_dir}"'
+        self.run_colmap(
+            "feature_extractor",
+            f'--database_path "{self.colmap_dir / "database.db"}"',
+            f'--image_path "{self.image_dir}"',
+            f'--image_list_path "{list_path}"',
+            # the dataset was processed with a single camera, share it
+            "--ImageReader.existing_camera_id 1",
+            f"--SiftExtraction.use_gpu {int(self.gpu)}",
+        )
+        self.match(existing, new_names)
+        self.run_colmap(
+            "image_registrator",
+            f'--database_path "{self.colmap_dir / "database.db"}"',
+            f'--input_path "{self.model_dir}"',
+            f"--output_path {model}",
+        )
+        # registering adds no points, triangulate the new images' matches
+        self.run_colmap(
+            "point_triangulator",
+            f'--database_path "{self.colmap_dir / "database.db"}"',
+            f'--image_path "{self.image_dir}"',
+            f"--input_path {model}",
+            f"--output_path {model}",
+        )
+        self.run_colmap(
+            "bundle_adjuster",
+            f"--input_path {model}",
+            f"--output_path {model}",
+            "--BundleAdjustment.refine_principal_point 1",
+        )
+        for path in self.work_dir.iterdir():
+            os.replace(path, self.model_dir / path.name)
+        self.work_dir.rmdir()
+
+        from nerfstudio.process_data.colmap_utils import colmap_to_json
+
+        num_frames = colmap_to_json(recon_dir=self.model_dir, output_dir=self.output_dir)
+        print(
+            f"transforms.json written with {num_frames} of "
+            f"{len(names)} images registered"
+        )
+        # the new images get the downscaled levels the dataset already has
+        levels = 0
+        while get_level_dir(self.image_dir, 2 ** (levels + 1)).is_dir():
+            levels += 1
+        for name in new_names:
+            # images the model lacked before already have them
+            if levels and not (get_level_dir(self.image_dir, 2) / name).exists():
+                downscale_image(self.image_dir / name, levels)
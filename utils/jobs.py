@@ -0,0 +1,458 @@
+import collections
+import itertools
+import multiprocessing
+import multiprocessing.connection
+import os
+import signal
+import sys
+import threading
+import time
+from pathlib import Path
+
+from PIL import Image
+
+from utils.downscale import downscale_images
+from utils.frames import patch_frame_extraction
+from utils.logs import redirect_output
+from utils.output_cache import fingerprint, unshare_links
+from utils.status_channel import StatusChannel
+
+PROCESSING_STAGES = (
+    "queued",
+    "starting",
+    "checking cache",
+    "frame extraction",
+    "feature extraction",
+    "matching",
+    "mapping",
+    "downscaling",
+    "finished",
+    "failed",
+    "stopped",
+)
+# rough share of the total runtime of each stage, used for the ETA
+STAGE_WEIGHTS = {
+    "frame extraction": 0.1,
+    "feature extraction": 0.2,
+    "matching": 0.3,
+    "mapping": 0.3,
+    "downscaling": 0.1,
+}
+FINAL_STAGES = ("finished", "failed", "stopped")
+VIDEO_EXTENSIONS = (".mp4", ".mov", ".avi", ".mkv", ".m4v", ".webm")
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".tif", ".tiff")
+# thread pool sizes of the numeric libraries, set for jobs with a thread limit
+THREAD_LIMIT_VARIABLES = (
+    "OMP_NUM_THREADS",
+    "MKL_NUM_THREADS",
+    "OPENBLAS_NUM_THREADS",
+    "NUMEXPR_NUM_THREADS",
+)
+
+job_ids = itertools.count(1)
+
+
+def get_stage(cmd):
+    """Map a shell command run by nerfstudio's processing code to its stage."""
+    if "feature_extractor" in cmd:
+        return "feature extraction"
+    if "_matcher" in cmd or "matches_importer" in cmd:
+        return "matching"
+    if any(
+        name in cmd
+        for name in ("mapper", "bundle_adjuster", "image_registrator", "point_triangulator")
+    ):
+        return "mapping"
+    if "ffmpeg" in cmd:
+        return "downscaling" if "scale=iw/" in cmd else "frame extraction"
+    return None
+
+
+def track_stages(channel):
+    """Publish the stage of every command nerfstudio runs in this process."""
+    from nerfstudio.utils import scripts
+
+    run_command = scripts.run_command
+
+    def tracked_run_command(cmd, *args, **kwargs):
+        stage = get_stage(cmd)
+        if stage is not None and channel.read()["state"] != stage:
+            channel.publish(state=stage, stage_started=time.time())
+        return run_command(cmd, *args, **kwargs)
+
+    # the processing modules import run_command by name, patch every reference
+    for module in list(sys.modules.values()):
+        name = getattr(module, "__name__", "")
+        if not name.startswith("nerfstudio"):
+            continue
+        if getattr(module, "run_command", None) is run_command:
+            module.run_command = tracked_run_command
+
+
+def limit_threads(cpu_threads, cpus=None):
+    """Limit this process and its children to cpu_threads threads, on cpus if given."""
+    for name in THREAD_LIMIT_VARIABLES:
+        os.environ[name] = str(cpu_threads)
+    if cpus and hasattr(os, "sched_setaffinity"):
+        # COLMAP and ffmpeg size their thread pools from the core count, pinning
+        # keeps them to their share of the machine
+        os.sched_setaffinity(0, cpus)
+
+
+def get_cache_parts(dataprocessor, args, parallel_downscale=False, keyframes=False):
+    """What identifies a processing run in the cache, but for the input."""
+    parts = {"processor": dataprocessor, "args": args}
+    if parallel_downscale:
+        # the pool resizes with PIL instead of ffmpeg, the levels differ slightly
+        parts["downscale"] = "parallel"
+    if keyframes:
+        parts["frames"] = "keyframes"
+    return parts
+
+
+def get_cache_key(cache, parts, data_path):
+    """Cache key of processing data_path, reads a sample of every input file."""
+    return cache.get_key({**parts, "data": fingerprint(data_path)})
+
+
+def restore_cached(cache, key, output_dir):
+    """Restore a cached output into output_dir, return whether it was found."""
+    try:
+        return cache.restore(key, output_dir)
+    except FileExistsError:
+        print(
+            f"{output_dir} is not empty, processing the data instead of reusing "
+            "the cached output"
+        )
+    except OSError as e:
+        print(f"Could not restore the output from the processing cache: {e}")
+    return False
+
+
+def run_processing(
+    processor,
+    channel,
+    log_socket=None,
+    cpu_threads=None,
+    cpus=None,
+    cache=None,
+    extract_segments=None,
+    parallel_downscale=False,
+    keyframes=False,
+):
+    """Entry point of a data processing worker process.
+
+    cache is an (OutputCache, parts) pair, see get_cache_parts. The output of an
+    identical earlier run is restored from it when output_dir is empty, a new
+    output is stored in it once it is done. With extract_segments above 1, the frames of a video are extracted from that
+    many segments in parallel. With keyframes, the sharpest frame of each window
+    is extracted instead of evenly spaced frames. With parallel_downscale, the
+    downscaled levels of the images are built by a process pool once nerfstudio
+    is done.
+    """
+    redirect_output(log_socket)
+    if cpu_threads:
+        limit_threads(cpu_threads, cpus)
+    if hasattr(os, "setsid"):
+        # own process group, so stopping the job also stops COLMAP / ffmpeg
+        os.setsid()
+    channel.publish(state="starting", stage_started=time.time())
+    try:
+        key = None
+        if cache is not None:
+            channel.publish(state="checking cache", stage_started=time.time())
+            key = get_cache_key(cache[0], cache[1], processor.data)
+            if restore_cached(cache[0], key, processor.output_dir):
+                print("Reused the output of an identical earlier run from the cache")
+                channel.publish(state="finished", cached=1)
+                return
+        track_stages(channel)
+        patch_frame_extraction(channel, extract_segments, keyframes)
+        if Path(processor.output_dir).is_dir():
+            # the folder may hold files linked from the processing cache
+            unshare_links(processor.output_dir)
+        levels = 0
+        if parallel_downscale:
+            # nerfstudio skips its own downscaling, the pool builds the levels
+            levels = getattr(processor, "num_downscales", 0)
+            processor.num_downscales = 0
+        processor.main()
+        if levels:
+            channel.publish(state="downscaling", stage_started=time.time())
+            downscale_images(Path(processor.output_dir) / "images", levels)
+            mask_dir = Path(processor.output_dir) / "masks"
+            if mask_dir.is_dir():
+                # the crop mask nerfstudio saved was not downscaled either, the
+                # dataparser looks for it next to each level
+                downscale_images(mask_dir, levels, resample=Image.NEAREST)
+    except BaseException:
+        channel.publish(state="failed")
+        raise
+    if key is not None:
+        try:
+            cache[0].store(key, processor.output_dir, str(processor.data))
+        except OSError as e:
+            print(f"Could not add the output to the processing cache: {e}")
+    channel.publish(state="finished")
+
+
+class ProcessingJob:
+    """A data processing run in its own worker process."""
+
+    def __init__(self, processor_name, processor, log=None, cpu_threads=None):
+        self.id = next(job_ids)
+        self.processor_name = processor_name
+        self.processor = processor
+        self.log = log  # JobLog receiving the worker's output
+        self.cpu_threads = cpu_threads  # thread limit of the worker, None for all cores
+        self.context = multiprocessing.get_context("spawn")
+        self.channel = StatusChannel(
+            # cached is 1 once the output was restored from the cache
+            fields=("started", "stage_started", "cached"),
+            states=PROCESSING_STAGES,
+            context=self.context,
+        )
+        self.process = None  # worker process, created when the job is started
+        self.submitted = time.time()
+        self.cache = None  # (OutputCache, parts) to reuse or store the output in
+        self.extract_segments = None  # segments to extract video frames from
+        self.parallel_downscale = False  # build the downscaled levels in a pool
+        self.keyframes = False  # extract sharp keyframes instead of evenly spaced frames
+
+    def start(self, cpus=None):
+        """Start the worker, pinned to cpus if given."""
+        if not self.is_running():
+            # stopped while it was queued
+            return self
+        log_socket = self.log.open_socket() if self.log is not None else None
+        self.process = self.context.Process(
+            target=run_processing,
+            args=(
+                self.processor,
+                self.channel,
+                log_socket,
+                self.cpu_threads,
+                cpus,
+                self.cache,
+                self.extract_segments,
+                self.parallel_downscale,
+                self.keyframes,
+            ),
+        )
+        # counted from here, starting the worker is part of the job's time
+        self.channel.publish(started=time.time())
+        self.process.start()
+        if log_socket is not None:
+            log_socket.close()
+        return self
+
+    def fail(self, error):
+        """Mark a job whose worker could not be started as failed."""
+        self.channel.publish(state="failed")
+        if self.log is not None:
+            self.log.write(f"Could not start the job: {error}")
+            self.log.close()
+
+    def is_started(self):
+        return self.process is not None
+
+    def stop(self):
+        if not self.is_running():
+            return False
+        if not self.is_started():
+            self.channel.publish(state="stopped")
+            if self.log is not None:
+                self.log.close()
+            return True
+        if not self.process.is_alive():
+            return False
+        try:
+            os.killpg(self.process.pid, signal.SIGTERM)
+        except (AttributeError, ProcessLookupError, PermissionError):
+            # no process groups on this platform, or the worker has not set one up yet
+            self.process.terminate()
+        self.process.join(5)
+        self.channel.publish(state="stopped")
+        return True
+
+    def get_stage(self):
+        stage = self.channel.read()["state"]
+        if (
+            stage not in FINAL_STAGES
+            and self.process is not None
+            and self.process.exitcode is not None
+        ):
+            # the worker died without reporting, e.g. killed from outside
+            return "failed"
+        return stage
+
+    def is_running(self):
+        return self.get_stage() not in FINAL_STAGES
+
+    def is_cached(self):
+        """Whether the job finished by reusing the output of an identical run."""
+        return bool(self.channel.read()["cached"])
+
+    def get_progress(self):
+        """Elapsed seconds and a rough ETA in seconds (None while unknown)."""
+        if not self.is_started():
+            return 0.0, None
+        status = self.channel.read()
+        stage = self.get_stage()
+        started = status["started"]
+        elapsed = (time.time() if self.is_running() else status["updated"]) - started
+        if stage not in STAGE_WEIGHTS:
+            return elapsed, None
+        # every stage before the current one is done, even if it was skipped
+        done = 0.0
+        for name, weight in STAGE_WEIGHTS.items():
+            if name == stage:
+                break
+            done += weight
+        if done == 0.0:
+            return elapsed, None
+        return elapsed, elapsed * (1.0 - done) / done
+
+    def get_row(self):
+        elapsed, eta = self.get_progress()
+        return [
+            self.id,
+            self.processor_name,
+            str(self.processor.data),
+            self.get_stage() + (" (cached)" if self.is_cached() else ""),
+            format_seconds(elapsed),
+            format_seconds(eta) if eta is not None else "",
+        ]
+
+
+class JobPool:
+    """Start queued jobs as soon as fewer than max_workers of them are running.
+
+    With cpu_threads set, worker slot i is pinned to its own cpu_threads cores.
+    A job whose start raises is handed the exception through its fail method.
+    """
+
+    def __init__(self, max_workers=2, cpu_threads=None):
+        self.max_workers = max_workers
+        self.cpu_threads = cpu_threads
+        self.pending = collections.deque()
+        self.running = {}  # slot -> job
+        self.lock = threading.Lock()
+        self.scheduler = None
+
+    def submit(self, job):
+        with self.lock:
+            self.pending.append(job)
+            self.schedule()
+            if self.scheduler is None or not self.scheduler.is_alive():
+                self.scheduler = threading.Thread(target=self.run, daemon=True)
+                self.scheduler.start()
+        return job
+
+    def get_cpus(self, slot):
+        if not self.cpu_threads:
+            return None
+        cpu_count = os.cpu_count() or 1
+        first = slot * self.cpu_threads
+        return {cpu % cpu_count for cpu in range(first, first + self.cpu_threads)}
+
+    def schedule(self):
+        for slot, job in list(self.running.items()):
+            if not job.is_running():
+                del self.running[slot]
+        while self.pending and len(self.running) < self.max_workers:
+            job = self.pending.popleft()
+            if not job.is_running():
+                # stopped while it was queued
+                continue
+            slot = min(set(range(self.max_workers)) - set(self.running))
+            try:
+                self.running[slot] = self.start_job(job, slot)
+            except Exception as e:  # noqa: BLE001
+                # the scheduler thread must go on with the other jobs
+                job.fail(e)
+
+    def start_job(self, job, slot):
+        return job.start(self.get_cpus(slot))
+
+    def run(self):
+        while True:
+            with self.lock:
+                self.schedule()
+                if not self.pending:
+                    self.scheduler = None
+                    return
+                sentinels = [
+                    job.process.sentinel
+                    for job in self.running.values()
+                    if job.process is not None
+                ]
+            # wake up when a worker exits, or now and then for jobs stopped from the ui
+            multiprocessing.connection.wait(sentinels, timeout=1.0)
+
+
+def find_captures(directory):
+    """Videos and image folders directly inside directory, as (processor name, path)."""
+    captures = []
+    for path in sorted(Path(directory).iterdir()):
+        if path.is_file() and path.suffix.lower() in VIDEO_EXTENSIONS:
+            captures.append(("VideoToNerfstudioDataset", path))
+        elif path.is_dir() and any(
+            child.suffix.lower() in IMAGE_EXTENSIONS for child in path.iterdir()
+        ):
+            captures.append(("ImagesToNerfstudioDataset", path))
+    return captures
+
+
+def get_output_names(captures):
+    """Output folder name of each capture of find_captures, unique in the batch."""
+    names = [path.stem if path.is_file() else path.name for _, path in captures]
+    counts = collections.Counter(name.lower() for name in names)
+    unique = []
+    seen = set()
+    for name, (_, path) in zip(names, captures):
+        if counts[name.lower()] > 1 and path.is_file():
+            # a video next to an image folder or another video of the same name
+            name += "_" + path.suffix[1:].lower()
+        # lower case, as file systems may ignore the case
+        candidate, index = name, 1
+        while candidate.lower() in seen:
+            index += 1
+            candidate = f"{name}_{index}"
+        seen.add(candidate.lower())
+        unique.append(candidate)
+    return unique
+
+
+def get_batch_report(jobs, submitted):
+    """Progress and throughput of a batch of jobs submitted at the given time."""
+    stages = collections.Counter(job.get_stage() for job in jobs)
+    running = sum(
+        job.is_started() and job.get_stage() not in FINAL_STAGES for job in jobs
+    )
+    durations = [job.get_progress()[0] for job in jobs if job.is_started()]
+    if any(job.is_running() for job in jobs):
+        wall = time.time() - submitted
+    else:
+        wall = max(
+            (job.channel.read()["updated"] for job in jobs if job.is_started()),
+            default=submitted,
+        ) - submitted
+    report = (
+        f"{stages['finished']}/{len(jobs)} finished, {stages['failed']} failed, "
+        f"{running} running, {len(jobs) - running - sum(stages[s] for s in FINAL_STAGES)} queued"
+        f" | wall time {format_seconds(wall)}"
+    )
+    if stages["stopped"]:
+        report += f" | {stages['stopped']} stopped"
+    if stages["finished"] and wall > 0:
+        report += f" | {stages['finished'] / wall * 3600:.1f} captures/h"
+    if durations and wall > 0:
+        # how much faster than running the same jobs one after another
+        report += f" | {sum(durations) / wall:.1f}x parallel speedup"
+    return report
+
+
+def format_seconds(seconds):
+    seconds = int(max(seconds, 0))
+    return f"{seconds // 3600}:{seconds // 60 % 60:02d}:{seconds % 60:02d}"
@@ -0,0 +1,126 @@
+import statistics
+import subprocess
+import time
+
+import numpy as np
+
+# frames are scored at this size, the aspect ratio does not matter as scores are
+# only compared between frames of the same video
+SCORE_SIZE = (960, 540)
+SCORE_BATCH = 16  # frames scored at once
+BLURRY_RATIO = 0.3  # sharpness below this share of the median counts as blurry
+# a keyframe moving less than this share of the median motion of a window past
+# the previous keyframe adds nothing new
+MIN_MOTION_RATIO = 0.25
+
+
+def get_sharpness(gray):
+    """Variance of the Laplacian of grayscale images, low for blurry images.
+
+    gray is one image or a batch of them, the variance is taken per image.
+    """
+    laplacian = (
+        gray[..., 1:-1, :-2] + gray[..., 1:-1, 2:] + gray[..., :-2, 1:-1]
+        + gray[..., 2:, 1:-1] - 4 * gray[..., 1:-1, 1:-1]
+    )
+    return laplacian.var(axis=(-2, -1))
+
+
+def score_frames(video_path, size=SCORE_SIZE, batch=SCORE_BATCH):
+    """Sharpness and motion of every frame, in one streaming pass over the video.
+
+    Motion is the mean absolute difference to the previous frame, in gray levels.
+    Frames are decoded by ffmpeg at size and scored a batch at a time, so only a
+    few frames are held in memory.
+    """
+    width, height = size
+    frame_size = width * height
+    process = subprocess.Popen(
+        [
+            "ffmpeg", "-nostdin", "-loglevel", "error", "-i", str(video_path),
+            "-vf", f"scale={width}:{height}", "-pix_fmt", "gray",
+            # one output frame per decoded frame, rawvideo would duplicate and
+            # drop the frames of a variable frame rate video to a constant rate,
+            # and the indices would no longer be the frame numbers select uses
+            "-vsync", "passthrough",
+            "-f", "rawvideo", "-",
+        ],
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+    )
+    sharpness = []
+    motion = []
+    previous = None
+    try:
+        while True:
+            data = process.stdout.read(frame_size * batch)
+            count = len(data) // frame_size
+            if count == 0:
+                break
+            frames = np.frombuffer(data, np.uint8, count * frame_size)
+            frames = frames.reshape(count, height, width).astype(np.float32)
+            sharpness.extend(get_sharpness(frames).tolist())
+            stack = frames if previous is None else np.concatenate([previous, frames])
+            differences = np.abs(np.diff(stack, axis=0)).mean(axis=(1, 2))
+            motion.extend(([0.0] if previous is None else []) + differences.tolist())
+            previous = frames[-1:]
+    finally:
+        process.stdout.close()
+        stderr = process.stderr.read().decode(errors="replace")
+        process.wait()
+    if process.returncode != 0:
+        raise RuntimeError(f"ffmpeg failed on {video_path}: {stderr.strip()[-1000:]}")
+    return np.array(sharpness), np.array(motion)
+
+
+def select_keyframes(sharpness, motion, num_frames_target):
+    """Indices of the sharpest frame of each window, and what was skipped.
+
+    The video is split into windows of equal length, as many as frames are
+    wanted. A window whose sharpest frame is still blurry is skipped, so is one
+    whose sharpest frame barely moved since the previous keyframe.
+    """
+    num_frames = len(sharpness)
+    window = max(num_frames // num_frames_target, 1)
+    starts = range(0, num_frames, window)
+    min_sharpness = BLURRY_RATIO * float(np.median(sharpness))
+    # motion since the first frame, the motion between two frames is a difference
+    travelled = np.cumsum(motion)
+    window_motion = [
+        travelled[min(start + window, num_frames) - 1] - travelled[start]
+        for start in starts
+    ]
+    min_motion = MIN_MOTION_RATIO * statistics.median(window_motion)
+    keyframes = []
+    blurry = redundant = 0
+    for start in starts:
+        best = start + int(np.argmax(sharpness[start : start + window]))
+        if sharpness[best] < min_sharpness:
+            blurry += 1
+        elif keyframes and travelled[best] - travelled[keyframes[-1]] < min_motion:
+            redundant += 1
+        else:
+            keyframes.append(best)
+    return keyframes, blurry, redundant
+
+
+def find_keyframes(video_path, num_frames_target):
+    """Score the frames of a video and select its keyframes.
+
+    Returns the keyframe indices and a summary line.
+    """
+    started = time.perf_counter()
+    sharpness, motion = score_frames(video_path)
+    if len(sharpness) == 0:
+        raise ValueError(f"{video_path} has no frames")
+    elapsed = max(time.perf_counter() - started, 1e-6)
+    keyframes, blurry, redundant = select_keyframes(
+        sharpness, motion, num_frames_target
+    )
+    summary = (
+        f"Scored {len(sharpness)} frames in {elapsed:.1f}s "
+        f"({len(sharpness) / elapsed:.1f} frames/s), kept {len(keyframes)} "
+        f"keyframes, skipped {blurry} blurry and {redundant} redundant windows"
+    )
+    print(summary)
+    return keyframes, summary
@@ -0,0 +1,157 @@
+import asyncio
+import collections
+import gzip
+import io
+import itertools
+import logging
+import logging.handlers
+import os
+import shutil
+import socket
+import sys
+import threading
+import time
+from pathlib import Path
+
+log_ids = itertools.count(1)
+
+
+def get_log_settings(args):
+    return {
+        "log_dir": args.log_dir,
+        "max_bytes": args.log_max_bytes,
+        "backup_count": args.log_backup_count,
+    }
+
+
+def compress_rotated(source, dest):
+    with open(source, "rb") as f_in, gzip.open(dest, "wb") as f_out:
+        shutil.copyfileobj(f_in, f_out)
+    os.remove(source)
+
+
+def redirect_output(log_socket):
+    """Worker side: send this process's stdout / stderr, and its children's, to the log."""
+    if log_socket is None:
+        return
+    sys.stdout.flush()
+    sys.stderr.flush()
+    os.dup2(log_socket.fileno(), 1)
+    os.dup2(log_socket.fileno(), 2)
+    log_socket.close()
+    # not a terminal anymore, keep the lines flowing instead of block buffering
+    sys.stdout.reconfigure(line_buffering=True)
+    sys.stderr.reconfigure(line_buffering=True)
+
+
+class JobLog:
+    """Output of a spawned job.
+
+    The last max_lines lines are kept in memory for the web-ui, and everything is
+    written to log_dir/<name>.log, which is rotated into gzip files once it grows
+    past max_bytes, keeping backup_count of them.
+    """
+
+    def __init__(self, name, log_dir="logs", max_bytes=10_000_000, backup_count=5, max_lines=2000):
+        self.name = f"{name}-{time.strftime('%Y%m%d-%H%M%S')}-{next(log_ids)}"
+        self.lines = collections.deque(maxlen=max_lines)
+        self.num_lines = 0  # lines ever written, so readers can resume where they were
+        self.lock = threading.Lock()
+        self.closed = False  # set once the job's output has ended
+        self.path = None
+        self.handler = None
+        if log_dir:
+            self.path = Path(log_dir) / f"{self.name}.log"
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self.handler = logging.handlers.RotatingFileHandler(
+                self.path, maxBytes=max_bytes, backupCount=backup_count, delay=True
+            )
+            self.handler.namer = lambda name: name + ".gz"
+            self.handler.rotator = compress_rotated
+            self.handler.setFormatter(logging.Formatter("%(message)s"))
+
+    def write(self, line):
+        with self.lock:
+            self.lines.append(line)
+            self.num_lines += 1
+            if self.handler is not None:
+                self.handler.emit(logging.makeLogRecord({"msg": line}))
+
+    def read_since(self, cursor):
+        """Lines written after cursor (as far as they are still kept) and the new cursor."""
+        with self.lock:
+            first = self.num_lines - len(self.lines)
+            start = max(cursor, first) - first
+            return list(itertools.islice(self.lines, start, None)), self.num_lines
+
+    def pump(self, stream):
+        """Read lines from a binary stream until it closes."""
+        for line in io.TextIOWrapper(stream, errors="replace", newline="\n"):
+            # progress bars redraw with \r, only keep what ends up on screen
+            self.write(line.rstrip("\n").rsplit("\r", 1)[-1])
+        self.close()
+
+    def attach(self, stream):
+        threading.Thread(target=self.pump, args=(stream,), daemon=True).start()
+
+    def open_socket(self):
+        """Create the worker's end of a log connection, None where it is unsupported.
+
+        The caller passes it to the worker process and closes its own copy once the
+        worker has started.
+        """
+        if os.name == "nt":
+            # Windows cannot redirect the standard handles to a socket
+            self.write("The output of this job is shown in the terminal.")
+            self.close()
+            return None
+        reader, writer = socket.socketpair()
+        self.attach(reader.makefile("rb"))
+        reader.close()
+        return writer
+
+    def close(self):
+        with self.lock:
+            self.closed = True
+            if self.handler is not None:
+                self.handler.close()
+
+    async def stream(self, interval=0.5, max_chars=200_000):
+        """Yield the text of the log whenever lines were added, until the output ends.
+
+        Every call starts from the lines still kept in memory, so a client that
+        connects late or reloads the page sees the recent output too. The text
+        only grows, so gradio sends just the appended part to the browser. Each
+        time it passes max_chars it is cut back to its second half.
+        """
+        text = ""
+        cursor = 0
+        yield text
+        while True:
+            closed = self.closed  # before reading, so the last lines are not missed
+            lines, cursor = self.read_since(cursor)
+            if lines:
+                text += "\n".join(lines) + "\n"
+                if len(text) > max_chars:
+                    text = text[-max_chars // 2 :]
+                yield text
+            elif closed:
+                return
+            await asyncio.sleep(interval)
+
+
+async def stream_log(get_log):
+    """Yield the text of the JobLog get_log returns, for a gradio output.
+
+    Nothing is yielded while there is no log, e.g. for a job running in a new
+    terminal, where its output is shown.
+    """
+    log = get_log()
+    if log is None:
+        return
+    stream = log.stream()
+    try:
+        async for text in stream:
+            yield text
+    finally:
+        await stream.aclose()
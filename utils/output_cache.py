@@ -0,0 +1,248 @@
+import contextlib
+import hashlib
+import json
+import os
+import shutil
+import time
+from pathlib import Path
+
+from utils.arg_spec_cache import get_package_version
+
+SAMPLE_SIZE = 1 << 16  # bytes read from each sampled part of a large file
+# images are never rewritten by nerfstudio, so they are hard linked instead of copied
+LINKED_EXTENSIONS = (".jpg", ".jpeg", ".png", ".tif", ".tiff")
+LOCK_NAME = ".lock"  # file in the cache root locked by every process using the cache
+
+file_fingerprints = {}  # (path, size, mtime, sampled) -> digest, files are read once
+
+
+def fingerprint_file(path, sampled=True):
+    """Digest of a file, of only a few samples of it for large files if sampled."""
+    stat = Path(path).stat()
+    cache_key = (str(path), stat.st_size, stat.st_mtime_ns, sampled)
+    if cache_key not in file_fingerprints:
+        digest = hashlib.blake2b(str(stat.st_size).encode(), digest_size=16)
+        with open(path, "rb") as f:
+            if not sampled or stat.st_size <= 4 * SAMPLE_SIZE:
+                for chunk in iter(lambda: f.read(1 << 20), b""):
+                    digest.update(chunk)
+            else:
+                # the size plus the start, middle and end tell large files apart
+                for offset in (0, stat.st_size // 2, stat.st_size - SAMPLE_SIZE):
+                    f.seek(offset)
+                    digest.update(f.read(SAMPLE_SIZE))
+        file_fingerprints[cache_key] = digest.hexdigest()
+    return file_fingerprints[cache_key]
+
+
+def fingerprint(path):
+    """Fast content fingerprint of a file, or of all files in a folder."""
+    path = Path(path)
+    digest = hashlib.blake2b(digest_size=16)
+    if path.is_file():
+        digest.update(fingerprint_file(path).encode())
+    else:
+        for file in sorted(p for p in path.rglob("*") if p.is_file()):
+            digest.update(file.relative_to(path).as_posix().encode() + b"\0")
+            digest.update(fingerprint_file(file).encode())
+    return digest.hexdigest()
+
+
+def link_or_copy(src, dst):
+    if os.path.lexists(dst):
+        os.remove(dst)
+    if Path(src).suffix.lower() in LINKED_EXTENSIONS:
+        try:
+            os.link(src, dst)
+            return dst
+        except OSError:
+            # another file system, or one without hard links
+            pass
+    return shutil.copy2(src, dst)
+
+
+def unshare_links(path):
+    """Give hard-linked files under path a copy of their own.
+
+    Run before a job writes into a folder restored from the cache, so overwriting
+    a file there does not change the cached one too.
+    """
+    for file in Path(path).rglob("*"):
+        if file.is_file() and not file.is_symlink() and file.stat().st_nlink > 1:
+            tmp_file = file.with_name(file.name + ".unshare")
+            shutil.copy2(file, tmp_file)
+            os.replace(tmp_file, file)
+
+
+def get_size(path):
+    return sum(p.stat().st_size for p in Path(path).rglob("*") if p.is_file())
+
+
+def is_empty(path):
+    """Whether path is missing or an empty folder."""
+    path = Path(path)
+    return not path.exists() or (path.is_dir() and not any(path.iterdir()))
+
+
+@contextlib.contextmanager
+def lock_file(path):
+    """Hold an exclusive lock on path, across threads and processes."""
+    with open(path, "a+b") as f:
+        if os.name == "nt":
+            import msvcrt
+
+            # locks the first byte, retried for about 10 s before raising OSError
+            msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+        else:
+            import fcntl
+
+            fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if os.name == "nt":
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+            else:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+
+class OutputCache:
+    """On-disk LRU cache of the outputs of processing or export runs.
+
+    Entries are keyed by a digest of whatever identifies a run, typically input
+    fingerprints and arguments, plus the nerfstudio version. Each one is a folder
+    holding the output and an entry.json with its size and last use. The least
+    recently used entries are removed once the cache grows past max_bytes.
+
+    The workers storing outputs run in processes of their own, so looking up and
+    linking, adding and evicting entries hold a lock file in the cache root.
+    """
+
+    def __init__(self, root, max_bytes):
+        self.root = Path(root)
+        self.max_bytes = max_bytes
+        self.version = get_package_version("nerfstudio")
+
+    def get_key(self, parts):
+        payload = json.dumps(
+            {**parts, "nerfstudio_version": self.version},
+            sort_keys=True,
+            default=str,
+        )
+        return hashlib.blake2b(payload.encode(), digest_size=16).hexdigest()
+
+    def read_entry(self, key):
+        try:
+            return json.loads((self.root / key / "entry.json").read_text())
+        except (OSError, ValueError):
+            return None
+
+    def write_entry(self, key, entry):
+        path = self.root / key / "entry.json"
+        tmp_path = path.with_suffix(f".tmp-{os.getpid()}")
+        tmp_path.write_text(json.dumps(entry))
+        os.replace(tmp_path, path)
+
+    def locked(self):
+        self.root.mkdir(parents=True, exist_ok=True)
+        return lock_file(self.root / LOCK_NAME)
+
+    def restore(self, key, output_dir, merge=False):
+        """Copy a cached output to output_dir, return False on a miss.
+
+        output_dir must be missing or empty, so the output is never mixed with the
+        files of another run, FileExistsError is raised otherwise. With merge, the
+        cached files are added to whatever output_dir holds.
+        """
+        if not merge and not is_empty(output_dir):
+            raise FileExistsError(f"{output_dir} is not empty")
+        with self.locked():
+            # an eviction can not remove the entry while it is linked
+            entry = self.read_entry(key)
+            if entry is None:
+                return False
+            shutil.copytree(
+                self.root / key / "output",
+                output_dir,
+                copy_function=link_or_copy,
+                dirs_exist_ok=True,
+            )
+            entry["last_used"] = time.time()
+            self.write_entry(key, entry)
+        return True
+
+    def store(self, key, output_dir, description="", files=None):
+        """Add the output of a finished run, called by the worker that produced it.
+
+        files limits the entry to these paths relative to output_dir.
+        """
+        if self.read_entry(key) is not None:
+            return
+        self.root.mkdir(parents=True, exist_ok=True)
+        # fill a temporary folder first so a crash never leaves a broken entry
+        tmp_dir = self.root / f"{key}.tmp-{os.getpid()}"
+        if files is None:
+            shutil.copytree(output_dir, tmp_dir / "output", copy_function=link_or_copy)
+        else:
+            for file in files:
+                (tmp_dir / "output" / file).parent.mkdir(parents=True, exist_ok=True)
+                link_or_copy(Path(output_dir) / file, tmp_dir / "output" / file)
+        (tmp_dir / "entry.json").write_text(
+            json.dumps(
+                {
+                    "size": get_size(tmp_dir / "output"),
+                    "last_used": time.time(),
+                    "description": description,
+                }
+            )
+        )
+        with self.locked():
+            try:
+                os.rename(tmp_dir, self.root / key)
+            except OSError:
+                # an identical run stored it first
+                shutil.rmtree(tmp_dir, ignore_errors=True)
+            self.evict()
+
+    def get_entries(self):
+        entries = {}
+        if self.root.is_dir():
+            for path in self.root.iterdir():
+                if ".tmp-" in path.name:
+                    # still being filled by a store, outside the lock
+                    continue
+                entry = self.read_entry(path.name)
+                if entry is not None:
+                    entries[path.name] = entry
+        return entries
+
+    def evict(self):
+        """Remove the least recently used entries, called with the lock held."""
+        entries = self.get_entries()
+        total = sum(entry["size"] for entry in entries.values())
+        for key in sorted(entries, key=lambda key: entries[key]["last_used"]):
+            if total <= self.max_bytes:
+                break
+            self.remove(key)
+            total -= entries[key]["size"]
+
+    def remove(self, key):
+        if not (self.root / key).exists():
+            return False
+        shutil.rmtree(self.root / key, ignore_errors=True)
+        return True
+
+    def invalidate(self, key):
+        """Remove an entry, return whether there was one."""
+        with self.locked():
+            return self.remove(key)
+
+    def clear(self):
+        if not self.root.is_dir():
+            return
+        with self.locked():
+            # the lock file stays, other processes may be waiting on it
+            for path in self.root.iterdir():
+                if path.name != LOCK_NAME:
+                    shutil.rmtree(path, ignore_errors=True)
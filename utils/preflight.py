@@ -0,0 +1,261 @@
+import collections
+import concurrent.futures
+import hashlib
+import io
+import json
+import os
+import statistics
+import time
+from pathlib import Path
+
+import numpy as np
+from PIL import Image
+
+from utils.arg_spec_cache import CACHE_DIR
+from utils.jobs import IMAGE_EXTENSIONS
+from utils.keyframes import BLURRY_RATIO, get_sharpness
+
+THUMBNAIL_SIZE = 512  # long side of the thumbnail the sharpness is measured on
+HASH_SIZE = 8  # difference hash of 8 x 8 bits
+NEAR_DUPLICATE_DISTANCE = 4  # differing hash bits of near-duplicate frames
+PREFLIGHT_COLUMNS = ["Image", "Resolution", "Focal Length", "Sharpness", "Issues"]
+EXIF_IFD = 0x8769
+EXIF_MODEL = 0x0110
+EXIF_FOCAL_LENGTH = 0x920A
+EXIF_FOCAL_LENGTH_35MM = 0xA405
+# popcount of every 16 bit word, for counting the differing bits of hashes
+WORDS = np.arange(1 << 16, dtype=np.uint16).view(np.uint8).reshape(-1, 2)
+BIT_COUNTS = np.unpackbits(WORDS, axis=1).sum(1).astype(np.uint8)
+
+
+def get_dhash(image):
+    """64 bit difference hash, similar images differ in only a few bits."""
+    small = np.asarray(
+        image.resize((HASH_SIZE + 1, HASH_SIZE), Image.BILINEAR), dtype=np.int16
+    )
+    bits = (small[:, 1:] > small[:, :-1]).flatten()
+    return int(np.packbits(bits).view(">u8")[0])
+
+
+def analyze_image(path):
+    """Header fields, content digest, sharpness and hash of one image.
+
+    Only a thumbnail is decoded, JPEGs at a reduced scale right away.
+    """
+    data = Path(path).read_bytes()
+    with Image.open(io.BytesIO(data)) as image:
+        width, height = image.size
+        exif = image.getexif()
+        details = exif.get_ifd(EXIF_IFD)
+        image.draft("L", (THUMBNAIL_SIZE, THUMBNAIL_SIZE))
+        image.thumbnail((THUMBNAIL_SIZE, THUMBNAIL_SIZE))
+        thumbnail = image.convert("L")
+    focal = details.get(EXIF_FOCAL_LENGTH)
+    focal_35mm = details.get(EXIF_FOCAL_LENGTH_35MM)
+    return {
+        "width": width,
+        "height": height,
+        "camera": str(exif.get(EXIF_MODEL) or "").strip("\0 "),
+        "focal": round(float(focal), 2) if focal else None,
+        "focal_35mm": int(focal_35mm) if focal_35mm else None,
+        "digest": hashlib.blake2b(data, digest_size=16).hexdigest(),
+        "sharpness": round(
+            float(get_sharpness(np.asarray(thumbnail, dtype=np.float32))), 2
+        ),
+        "dhash": f"{get_dhash(thumbnail):016x}",
+    }
+
+
+def find_near_duplicates(hashes, max_distance=NEAR_DUPLICATE_DISTANCE, chunk=256):
+    """(i, j) index pairs, i < j, of hashes at most max_distance bits apart."""
+    hashes = np.asarray(hashes, dtype=np.uint64)
+    pairs = []
+    for start in range(0, len(hashes), chunk):
+        block = hashes[start : start + chunk, None] ^ hashes[None, :]
+        distances = (
+            BIT_COUNTS[block.view(np.uint16)]
+            .reshape(*block.shape, 4)
+            .sum(-1, dtype=np.uint8)
+        )
+        rows, columns = np.nonzero(distances <= max_distance)
+        rows += start
+        keep = rows < columns
+        pairs.extend(zip(rows[keep].tolist(), columns[keep].tolist()))
+    return pairs
+
+
+class PreflightCache:
+    """Results of earlier scans, one file per folder.
+
+    Only the images whose size or mtime changed are analyzed again. The folder's
+    own mtime is not enough, it does not change when an image is rewritten in
+    place, so every image is checked.
+    """
+
+    def __init__(self, path=CACHE_DIR / "preflight"):
+        self.path = Path(path)
+
+    def get_path(self, folder):
+        digest = hashlib.sha1(str(folder).encode()).hexdigest()[:16]
+        return self.path / f"{digest}.json"
+
+    def load(self, folder):
+        try:
+            cached = json.loads(self.get_path(folder).read_text())
+        except (OSError, ValueError):
+            return None
+        return cached if cached.get("folder") == str(folder) else None
+
+    def save(self, folder, scan):
+        try:
+            self.path.mkdir(parents=True, exist_ok=True)
+            path = self.get_path(folder)
+            # write to a temporary file first so a crash never leaves a broken entry
+            tmp_path = path.with_suffix(".tmp")
+            tmp_path.write_text(json.dumps(scan))
+            os.replace(tmp_path, path)
+        except OSError as e:
+            print(f"Could not write the preflight cache: {e}")
+
+
+preflight_cache = PreflightCache()
+
+
+def scan_folder(folder, workers=None, cache=preflight_cache):
+    """Analyze every image directly in folder with a thread pool.
+
+    Returns the scan, {"folder", "images": {name: [size, mtime, result]},
+    "analyzed", "seconds"}, with result None for unreadable images.
+    """
+    folder = Path(folder).resolve()
+    cached = cache.load(folder) if cache is not None else None
+    previous = cached["images"] if cached is not None else {}
+    started = time.perf_counter()
+    images = {}
+    pending = []
+    with os.scandir(folder) as entries:
+        for entry in entries:
+            if entry.name.startswith(".") or not entry.is_file():
+                continue
+            if os.path.splitext(entry.name)[1].lower() not in IMAGE_EXTENSIONS:
+                continue
+            stat = entry.stat()
+            entry_previous = previous.get(entry.name)
+            if entry_previous is not None and entry_previous[:2] == [
+                stat.st_size,
+                stat.st_mtime_ns,
+            ]:
+                images[entry.name] = entry_previous
+            else:
+                pending.append((entry.name, stat.st_size, stat.st_mtime_ns))
+
+    def analyze(name):
+        try:
+            return analyze_image(folder / name)
+        except (OSError, ValueError, Image.DecompressionBombError) as e:
+            print(f"Could not read {name}: {e}")
+            return None
+
+    # decoding and hashing release the GIL, threads keep the files' data shared
+    with concurrent.futures.ThreadPoolExecutor(workers or os.cpu_count()) as executor:
+        results = executor.map(analyze, [name for name, _, _ in pending])
+        for (name, size, file_mtime), result in zip(pending, results):
+            images[name] = [size, file_mtime, result]
+    scan = {
+        "folder": str(folder),
+        "images": dict(sorted(images.items())),
+    }
+    if cache is not None and (pending or images.keys() != previous.keys()):
+        cache.save(folder, scan)
+    return dict(scan, analyzed=len(pending), seconds=time.perf_counter() - started)
+
+
+def format_count(counter, limit=6):
+    text = ", ".join(f"{key}: {count}" for key, count in counter.most_common(limit))
+    return text + (", ..." if len(counter) > limit else "")
+
+
+def get_report(scan):
+    """Markdown summary and per-image table, images with issues first."""
+    names = [name for name, entry in scan["images"].items() if entry[2] is not None]
+    results = [scan["images"][name][2] for name in names]
+    unreadable = len(scan["images"]) - len(names)
+    lines = [f"**{len(names)} images** in {scan['folder']}"]
+    if unreadable:
+        lines[0] += f", {unreadable} unreadable"
+    if not results:
+        return "\n\n".join(lines), []
+
+    resolutions = collections.Counter(f"{r['width']}x{r['height']}" for r in results)
+    lines.append("**Resolutions:** " + format_count(resolutions))
+    if len(resolutions) > 1:
+        lines.append("Mixed resolutions, turn off same_dimensions when processing")
+    focals = collections.Counter(
+        f"{r['focal']} mm" + (f" ({r['focal_35mm']} mm eq.)" if r["focal_35mm"] else "")
+        for r in results
+        if r["focal"]
+    )
+    missing = sum(not r["focal"] for r in results)
+    lines.append(
+        "**EXIF focal lengths:** "
+        + (format_count(focals) if focals else "none")
+        + (f" | {missing} without" if missing and focals else "")
+    )
+    cameras = collections.Counter(r["camera"] for r in results if r["camera"])
+    if cameras:
+        lines.append("**Cameras:** " + format_count(cameras))
+
+    issues = collections.defaultdict(list)
+    by_digest = collections.defaultdict(list)
+    for name, result in zip(names, results):
+        by_digest[result["digest"]].append(name)
+    duplicates = 0
+    for group in by_digest.values():
+        for name in group[1:]:
+            issues[name].append(f"duplicate of {group[0]}")
+            duplicates += 1
+    # each image names the first earlier one it nearly duplicates, not all of them
+    near_duplicate_of = {}
+    for i, j in find_near_duplicates([int(r["dhash"], 16) for r in results]):
+        if results[i]["digest"] != results[j]["digest"]:
+            near_duplicate_of[j] = min(i, near_duplicate_of.get(j, i))
+    for j, i in near_duplicate_of.items():
+        issues[names[j]].append(f"near duplicate of {names[i]}")
+    lines.append(
+        f"**Duplicates:** {duplicates} exact, {len(near_duplicate_of)} near duplicates "
+        "of an earlier image"
+    )
+
+    sharpness = [r["sharpness"] for r in results]
+    median = statistics.median(sharpness)
+    blurry = 0
+    for name, value in zip(names, sharpness):
+        if value < BLURRY_RATIO * median:
+            issues[name].append("blurry")
+            blurry += 1
+    lines.append(
+        f"**Sharpness:** median {median:.1f}, min {min(sharpness):.1f}, "
+        f"{blurry} blurry (below {BLURRY_RATIO:.0%} of the median)"
+    )
+    if scan["analyzed"]:
+        lines.append(
+            f"Analyzed {scan['analyzed']} images in {scan['seconds']:.1f}s "
+            f"({scan['analyzed'] / max(scan['seconds'], 1e-6):.0f} images/s), "
+            f"{len(scan['images']) - scan['analyzed']} from the cache"
+        )
+    else:
+        lines.append("Unchanged since the last scan, all results from the cache")
+
+    rows = [
+        [
+            name,
+            f"{result['width']}x{result['height']}",
+            result["focal"] or "",
+            result["sharpness"],
+            "; ".join(issues.get(name, [])),
+        ]
+        for name, result in zip(names, results)
+    ]
+    # the images to look at first on top
+    rows.sort(key=lambda row: (not row[4], row[3]))
+    return "\n\n".join(lines), rows
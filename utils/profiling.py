@@ -0,0 +1,182 @@
+import builtins
+import collections
+import json
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+
+class ImportProfiler:
+    """Record how long each newly imported module takes to load.
+
+    Wraps builtins.__import__ while active. A module's self time excludes the
+    modules it imports in turn, so the heaviest entries point at the module that
+    actually does the work.
+    """
+
+    def __init__(self):
+        self.records = []  # (name, self ms, cumulative ms)
+        self.children_time = [0.0]  # time spent in nested imports, per level
+        self.original_import = None
+
+    def start(self):
+        self.original_import = builtins.__import__
+        builtins.__import__ = self.profiled_import
+        return self
+
+    def stop(self):
+        if self.original_import is not None:
+            builtins.__import__ = self.original_import
+            self.original_import = None
+
+    def profiled_import(self, name, globals=None, locals=None, fromlist=(), level=0):
+        if level == 0 and name in sys.modules and not fromlist:
+            return self.original_import(name, globals, locals, fromlist, level)
+
+        num_modules = len(sys.modules)
+        self.children_time.append(0.0)
+        start = time.perf_counter()
+        try:
+            return self.original_import(name, globals, locals, fromlist, level)
+        finally:
+            elapsed = time.perf_counter() - start
+            children = self.children_time.pop()
+            self.children_time[-1] += elapsed
+            # only count imports that actually loaded something
+            if len(sys.modules) > num_modules:
+                self.records.append(
+                    (name, (elapsed - children) * 1000, elapsed * 1000)
+                )
+
+    def report(self, title="Import profile", limit=30):
+        total = sum(self_ms for _, self_ms, _ in self.records)
+        lines = [f"{title}: {len(self.records)} imports, {total:.1f} ms total"]
+        lines.append(f"{'self ms':>10} {'cumul ms':>10}  module")
+        for name, self_ms, cumulative_ms in sorted(
+            self.records, key=lambda record: record[1], reverse=True
+        )[:limit]:
+            lines.append(f"{self_ms:10.1f} {cumulative_ms:10.1f}  {name}")
+        return "\n".join(lines)
+
+
+class StepProfiler:
+    """Time the phases of training steps into a fixed-size ring buffer.
+
+    Only every sample_every-th step is timed, with the device synchronized at the
+    phase boundaries so asynchronous GPU work lands in the phase that queued it.
+    The other steps only pay for a modulo. Evaluation and checkpoint writes are
+    rare and timed on every step, without synchronizing, and only kept when they
+    took at least min_always_ms, as they are called on every step and usually
+    return right away.
+    """
+
+    def __init__(
+        self, sample_every=20, max_spans=20000, synchronize=None, min_always_ms=1.0
+    ):
+        self.sample_every = sample_every
+        self.min_always_ms = min_always_ms
+        self.synchronize = synchronize or (lambda: None)
+        self.spans = collections.deque(maxlen=max_spans)  # (name, start, end, step)
+        self.origin = time.perf_counter()
+        self.step = 0
+        self.sampled = False  # whether the current step is timed
+        self.step_start = 0.0
+        self.phase_end = 0.0  # end of the last phase, where the next one starts
+
+    def record(self, name, start, end):
+        self.spans.append((name, start, end, self.step))
+
+    def begin_step(self, step):
+        self.step = step
+        self.sampled = step % self.sample_every == 0
+        if self.sampled:
+            self.synchronize()
+            self.step_start = self.phase_end = time.perf_counter()
+
+    def end_step(self):
+        if self.sampled:
+            self.synchronize()
+            end = time.perf_counter()
+            self.record("step", self.step_start, end)
+            self.sampled = False
+
+    def phase(self, name, func, gap_name=None, after_nested=False, always=False):
+        """Wrap func so its calls are timed as name.
+
+        With gap_name, the time between the previous phase and this one is recorded
+        under that name, e.g. the backward pass, which runs between the loss and the
+        optimizer step without a call of its own. With after_nested, only the time
+        after the last phase nested in this call counts, so the loss computation
+        does not include the data loading it starts with.
+        """
+
+        def timed(*args, **kwargs):
+            sampled = self.sampled
+            if not (sampled or always):
+                return func(*args, **kwargs)
+            if sampled:
+                self.synchronize()
+            start = time.perf_counter()
+            if gap_name is not None and sampled:
+                self.record(gap_name, self.phase_end, start)
+            self.phase_end = start
+            try:
+                return func(*args, **kwargs)
+            finally:
+                if sampled:
+                    self.synchronize()
+                end = time.perf_counter()
+                if sampled or (end - start) * 1000 >= self.min_always_ms:
+                    self.record(name, self.phase_end if after_nested else start, end)
+                self.phase_end = end
+
+        return timed
+
+    def get_trace(self):
+        """Chrome trace of the buffered spans, for chrome://tracing or Perfetto."""
+        return {
+            "traceEvents": [
+                {
+                    "name": name,
+                    "ph": "X",
+                    "ts": (start - self.origin) * 1e6,
+                    "dur": (end - start) * 1e6,
+                    "pid": 0,
+                    # whole steps on their own row, the phases below them
+                    "tid": 0 if name == "step" else 1,
+                    "args": {"step": step},
+                }
+                for name, start, end, step in list(self.spans)
+            ],
+            "displayTimeUnit": "ms",
+        }
+
+    def get_summary(self):
+        durations = collections.defaultdict(list)
+        for name, start, end, _ in list(self.spans):
+            durations[name].append((end - start) * 1000)
+        step_total = sum(durations.get("step", [])) or 1.0
+        summary = {}
+        for name, values in durations.items():
+            values = np.array(values)
+            summary[name] = {
+                "count": len(values),
+                "mean_ms": float(values.mean()),
+                "p50_ms": float(np.percentile(values, 50)),
+                "p95_ms": float(np.percentile(values, 95)),
+                "max_ms": float(values.max()),
+                "share_of_steps": float(values.sum() / step_total),
+            }
+        return summary
+
+    def save(self, directory):
+        """Write trace.json and summary.json to directory, return their paths."""
+        directory = Path(directory)
+        directory.mkdir(parents=True, exist_ok=True)
+        trace_path = directory / "trace.json"
+        summary_path = directory / "summary.json"
+        trace_path.write_text(json.dumps(self.get_trace()))
+        summary_path.write_text(json.dumps(self.get_summary(), indent=2))
+        return trace_path, summary_path
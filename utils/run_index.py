@@ -0,0 +1,324 @@
+import functools
+import hashlib
+import json
+import math
+import os
+import re
+import threading
+import time
+from pathlib import Path
+
+import gradio as gr
+import yaml
+
+from utils.arg_spec_cache import CACHE_DIR
+from utils.output_cache import get_size
+
+RUN_COLUMNS = ["Method", "Dataset", "Experiment", "Timestamp", "Step", "Size", "Config"]
+PAGE_SIZE = 20
+CHECKPOINT_PATTERN = re.compile(r"step-(\d+)\.ckpt$")
+
+
+class RunConfigLoader(yaml.SafeLoader):
+    """Read a saved config.yml as plain data, without importing nerfstudio.
+
+    The python/ tags of the dataclasses become dicts and lists, and paths become
+    strings, so nothing in the file is ever constructed or executed.
+    """
+
+
+def construct_plain(loader, tag_suffix, node):
+    if isinstance(node, yaml.SequenceNode):
+        value = loader.construct_sequence(node, deep=True)
+        if "pathlib" in tag_suffix:
+            return str(Path(*value)) if value else ""
+        return value
+    if isinstance(node, yaml.MappingNode):
+        return loader.construct_mapping(node, deep=True)
+    return loader.construct_scalar(node)
+
+
+RunConfigLoader.add_multi_constructor("tag:yaml.org,2002:python/", construct_plain)
+
+
+def read_run_config(path):
+    """Method, experiment, dataset and timestamp saved in a config.yml."""
+    config = yaml.load(Path(path).read_text(), Loader=RunConfigLoader)
+    if not isinstance(config, dict):
+        config = {}
+    dataset = config.get("data")
+    if not dataset:
+        datamanager = config.get("pipeline", {}).get("datamanager", {})
+        dataset = datamanager.get("data") if isinstance(datamanager, dict) else None
+    return {
+        "method": str(config.get("method_name") or ""),
+        "experiment": str(config.get("experiment_name") or ""),
+        "dataset": str(dataset or ""),
+        "timestamp": str(config.get("timestamp") or ""),
+    }
+
+
+def get_latest_checkpoint(checkpoint_dir):
+    """Step and file name of the latest checkpoint, (None, None) if there is none."""
+    latest = (None, None)
+    for entry in os.scandir(checkpoint_dir):
+        match = CHECKPOINT_PATTERN.match(entry.name)
+        if match and (latest[0] is None or int(match.group(1)) > latest[0]):
+            latest = (int(match.group(1)), entry.name)
+    return latest
+
+
+def get_mtime(path):
+    try:
+        return os.stat(path).st_mtime_ns
+    except OSError:
+        return None
+
+
+class RunIndex:
+    """Index of the trained runs, the folders holding a config.yml, under root.
+
+    Rescans are incremental. A folder is only listed again when its mtime changed,
+    otherwise its cached subfolders are visited, so the images of big datasets are
+    not walked over and over. The folders of runs are not searched further, and a
+    run is only read again when the mtime of its config, its checkpoint folder or
+    its latest checkpoint changed, so files rewritten in place are noticed. The
+    index is saved, so a restarted web-ui starts from the previous scan.
+    """
+
+    def __init__(self, root, interval=30.0, path=None):
+        self.root = os.path.abspath(root)
+        self.interval = interval
+        digest = hashlib.sha1(self.root.encode()).hexdigest()[:16]
+        self.path = Path(path or CACHE_DIR / "run_index" / f"{digest}.json")
+        self.dirs = {}  # folder -> [mtime, subfolder names, holds a config.yml]
+        self.runs = {}  # run folder -> run entry
+        self.lock = threading.Lock()
+        self.scanned = None  # time of the last finished scan
+        self.load()
+
+    def load(self):
+        try:
+            index = json.loads(self.path.read_text())
+        except (OSError, ValueError):
+            return
+        if index.get("root") == self.root:
+            self.dirs = index.get("dirs", {})
+            self.runs = index.get("runs", {})
+
+    def save(self):
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            # write to a temporary file first so a crash never leaves a broken index
+            tmp_path = self.path.with_suffix(".tmp")
+            tmp_path.write_text(
+                json.dumps({"root": self.root, "dirs": self.dirs, "runs": self.runs})
+            )
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            print(f"Could not write the run index to {self.path}: {e}")
+
+    def start(self):
+        """Scan now and every interval seconds in a background thread."""
+        threading.Thread(target=self.run, daemon=True).start()
+        return self
+
+    def run(self):
+        while True:
+            self.scan()
+            if self.interval <= 0:
+                return
+            time.sleep(self.interval)
+
+    def scan(self):
+        with self.lock:
+            dirs = {}
+            runs = {}
+            stack = [self.root]
+            while stack:
+                path = stack.pop()
+                mtime = get_mtime(path)
+                if mtime is None:
+                    continue
+                cached = self.dirs.get(path)
+                if cached is None or cached[0] != mtime:
+                    cached = self.list_dir(path, mtime)
+                    if cached is None:
+                        continue
+                dirs[path] = cached
+                _, subdirs, has_config = cached
+                run = self.read_run(path, self.runs.get(path)) if has_config else None
+                if run is not None:
+                    runs[path] = run
+                    # a run's subfolders hold checkpoints and renders, not runs
+                    continue
+                stack.extend(os.path.join(path, name) for name in subdirs)
+            changed = dirs != self.dirs or runs != self.runs
+            self.dirs = dirs
+            self.runs = runs
+            self.scanned = time.time()
+        if changed:
+            self.save()
+
+    @staticmethod
+    def list_dir(path, mtime):
+        try:
+            with os.scandir(path) as entries:
+                subdirs = []
+                has_config = False
+                for entry in entries:
+                    if entry.name.startswith("."):
+                        continue
+                    if entry.is_dir(follow_symlinks=False):
+                        subdirs.append(entry.name)
+                    elif entry.name == "config.yml":
+                        has_config = True
+        except OSError:
+            return None
+        return [mtime, sorted(subdirs), has_config]
+
+    @staticmethod
+    def read_run(path, previous):
+        """Entry of the run in path, None if its config.yml is not a training config."""
+        config_path = os.path.join(path, "config.yml")
+        checkpoint_dir = os.path.join(path, "nerfstudio_models")
+        mtimes = [get_mtime(config_path), get_mtime(checkpoint_dir)]
+        # the folder's mtime only changes when a checkpoint is added or removed
+        checkpoint = previous.get("checkpoint") if previous is not None else None
+        if checkpoint is not None:
+            mtimes.append(get_mtime(os.path.join(checkpoint_dir, checkpoint)))
+        # entries of older indexes do not know their checkpoint, read them again
+        if (
+            previous is not None
+            and "checkpoint" in previous
+            and previous["mtimes"] == mtimes
+        ):
+            return previous
+        try:
+            run = read_run_config(config_path)
+        except (OSError, yaml.YAMLError) as e:
+            print(f"Could not read {config_path}: {e}")
+            return None
+        if not run["method"]:
+            return None
+        step = checkpoint = None
+        if mtimes[1] is not None:
+            try:
+                step, checkpoint = get_latest_checkpoint(checkpoint_dir)
+            except OSError:
+                pass
+        mtimes = mtimes[:2]
+        if checkpoint is not None:
+            mtimes.append(get_mtime(os.path.join(checkpoint_dir, checkpoint)))
+        run.update(
+            config=config_path,
+            step=step,
+            checkpoint=checkpoint,
+            size=get_size(path),
+            mtimes=mtimes,
+        )
+        return run
+
+    def search(self, query="", page=1, page_size=PAGE_SIZE):
+        """Rows of the runs matching every word of query, newest first.
+
+        Returns the rows of the page, the page number clamped to the pages there
+        are, the number of pages and the number of matching runs.
+        """
+        words = query.lower().split()
+        # a scan replaces the dict when it is done, no need to wait for it
+        runs = list(self.runs.values())
+        matches = [
+            run
+            for run in runs
+            if all(
+                any(
+                    word in run[key].lower()
+                    for key in ("method", "dataset", "experiment", "timestamp", "config")
+                )
+                for word in words
+            )
+        ]
+        matches.sort(key=lambda run: run["timestamp"], reverse=True)
+        num_pages = max(math.ceil(len(matches) / page_size), 1)
+        page = min(max(int(page or 1), 1), num_pages)
+        rows = [
+            [
+                run["method"],
+                run["dataset"],
+                run["experiment"],
+                run["timestamp"],
+                run["step"] if run["step"] is not None else "",
+                f"{run['size'] / 1e6:.1f} MB",
+                run["config"],
+            ]
+            for run in matches[(page - 1) * page_size : page * page_size]
+        ]
+        return rows, page, num_pages, len(matches)
+
+    def get_page(self, query="", page=1):
+        """Table, page and page info for the run browser."""
+        rows, page, num_pages, count = self.search(query, page)
+        info = f"{count} runs, page {page} of {num_pages}"
+        if self.scanned is None:
+            info += " (scanning...)"
+        return rows, page, info
+
+
+@functools.cache
+def get_run_index(root, interval=30.0):
+    """The run index of root, shared by the tabs and scanned in the background."""
+    return RunIndex(root, interval).start()
+
+
+def setup_run_browser(root, interval, config_path):
+    """Searchable, paginated table of the indexed runs.
+
+    Selecting a run writes the path of its config.yml into config_path. The
+    table starts empty, nothing is scanned until the returned listener, a dict
+    of fn, inputs and outputs, fills it when the tab is opened.
+    """
+
+    def get_page(text, number):
+        # the index of root is started by the first call
+        return get_run_index(root, interval).get_page(text, number)
+
+    with gr.Row():
+        query = gr.Textbox(
+            label="Search Runs",
+            placeholder="Method, dataset, experiment or timestamp",
+            scale=5,
+        )
+        refresh_button = gr.Button(value="Rescan", scale=1)
+    runs = gr.Dataframe(headers=RUN_COLUMNS, interactive=False)
+    with gr.Row():
+        previous_button = gr.Button(value="Previous", scale=1)
+        page = gr.Number(value=1, label="Page", precision=0, minimum=1, scale=1)
+        next_button = gr.Button(value="Next", scale=1)
+        page_info = gr.Markdown()
+
+    outputs = [runs, page, page_info]
+    query.submit(lambda text: get_page(text, 1), inputs=query, outputs=outputs)
+    page.submit(get_page, inputs=[query, page], outputs=outputs)
+    previous_button.click(
+        lambda text, number: get_page(text, number - 1),
+        inputs=[query, page],
+        outputs=outputs,
+    )
+    next_button.click(
+        lambda text, number: get_page(text, number + 1),
+        inputs=[query, page],
+        outputs=outputs,
+    )
+
+    def rescan(text, number):
+        get_run_index(root, interval).scan()
+        return get_page(text, number)
+
+    refresh_button.click(rescan, inputs=[query, page], outputs=outputs)
+
+    def select_run(table, evt: gr.SelectData):
+        return table.iloc[evt.index[0], -1]
+
+    runs.select(select_run, inputs=runs, outputs=config_path)
+    return {"fn": get_page, "inputs": [query, page], "outputs": outputs}
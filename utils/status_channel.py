@@ -0,0 +1,44 @@
+import multiprocessing
+import time
+
+
+class StatusChannel:
+    """Status and control channel between the web-ui and a worker process.
+
+    The worker publishes numeric status fields into a small shared-memory array that
+    the web-ui reads without locking or waiting on the worker. Commands such as pause
+    or stop travel the other way over a pipe. String states are stored as their index
+    in states. The channel is created in the web-ui and passed to the worker process
+    when it is started.
+    """
+
+    def __init__(self, fields, states, context=None):
+        context = context or multiprocessing.get_context("spawn")
+        self.fields = tuple(fields) + ("state", "updated")
+        self.states = tuple(states)
+        self.values = context.RawArray("d", len(self.fields))
+        self.ui_conn, self.worker_conn = context.Pipe()
+
+    def publish(self, **values):
+        """Worker side: update some of the status fields."""
+        for key, value in values.items():
+            if key == "state":
+                value = self.states.index(value)
+            self.values[self.fields.index(key)] = value
+        self.values[-1] = time.time()
+
+    def read(self):
+        """Web-ui side: snapshot of the latest status, never blocks."""
+        status = dict(zip(self.fields, self.values[:]))
+        status["state"] = self.states[int(status["state"])]
+        return status
+
+    def send(self, command):
+        """Web-ui side: queue a command for the worker."""
+        self.ui_conn.send(command)
+
+    def poll(self, timeout=0.0):
+        """Worker side: return the next command, or None if none arrived in time."""
+        if self.worker_conn.poll(timeout):
+            return self.worker_conn.recv()
+        return None
@@ -0,0 +1,76 @@
+import asyncio
+
+
+class StatusBroadcaster:
+    """Push status changes to every subscribed client.
+
+    A single sampler task reads the status at most once per min_interval, however
+    many clients are connected, and wakes the subscribers only when the value has
+    changed. read is called on the server's event loop and must not block.
+    """
+
+    def __init__(self, read, min_interval=0.5):
+        self.read = read
+        self.min_interval = min_interval
+        self.value = None
+        self.version = 0
+        self.subscribers = 0
+        self.changed = None  # asyncio.Condition, created on the server's event loop
+        self.sampler = None
+
+    async def notify(self, value):
+        if value == self.value:
+            return
+        self.value = value
+        self.version += 1
+        async with self.changed:
+            self.changed.notify_all()
+
+    async def sample(self):
+        while self.subscribers > 0:
+            await asyncio.sleep(self.min_interval)
+            await self.notify(self.read())
+
+    async def subscribe(self):
+        """Yield the current status, then every change until the client goes away."""
+        if self.changed is None:
+            self.changed = asyncio.Condition()
+        self.subscribers += 1
+        if self.sampler is None or self.sampler.done():
+            # the cached value may be stale while nobody was listening
+            await self.notify(self.read())
+            self.sampler = asyncio.get_running_loop().create_task(self.sample())
+        seen = None
+        try:
+            while True:
+                async with self.changed:
+                    await self.changed.wait_for(lambda seen=seen: self.version != seen)
+                seen = self.version
+                yield self.value
+        finally:
+            self.subscribers -= 1
+
+
+async def follow(get_source, interval=0.5):
+    """Yield the updates of get_source().stream(), moving on to each new source.
+
+    For gradio streams that last as long as a client is connected and show the
+    current run, whichever it is: nothing is yielded while get_source returns
+    None, and once it returns another object, e.g. the JobLog of a new run, that
+    one's stream takes over.
+    """
+    source = None
+    while True:
+        current = get_source()
+        if current is None or current is source:
+            await asyncio.sleep(interval)
+            continue
+        source = current
+        stream = source.stream()
+        try:
+            async for update in stream:
+                yield update
+                if get_source() is not source:
+                    break
+        finally:
+            await stream.aclose()
@@ -0,0 +1,367 @@
+import copy
+import itertools
+import json
+import math
+import random
+import threading
+import time
+
+from utils.jobs import JobPool, format_seconds
+from utils.trainer import WebUITrainer
+
+SWEEP_MODES = ("grid", "random")
+MAX_TRIALS = 256
+# shown first in the results, the rest of the metrics follow in name order
+MAIN_METRICS = ("psnr", "ssim", "lpips")
+LOWER_IS_BETTER = ("lpips",)
+
+
+def parse_value(spec, text):
+    """Convert one entered value to the type of the field described by spec."""
+    text = text.strip().strip("'\"")
+    if spec["kind"] in ("int", "float"):
+        try:
+            value = float(text)
+        except ValueError:
+            raise ValueError(f"{spec['name']} takes a number, not {text}")
+        return int(value) if spec["kind"] == "int" else value
+    if spec["kind"] == "bool":
+        if text.lower() not in ("true", "false"):
+            raise ValueError(f"{spec['name']} takes True or False, not {text}")
+        return text.lower() == "true"
+    if spec["kind"] == "radio" and text not in spec["choices"]:
+        raise ValueError(
+            f"{spec['name']} takes one of {', '.join(spec['choices'])}, not {text}"
+        )
+    return text
+
+
+def parse_sweep(text, specs):
+    """Parse lines of "field = values" into {field: values}.
+
+    values is either a list, written "a, b, c", or for numbers a range, written
+    "low..high" or "low..high log" for a log scale, kept as (low, high, log).
+    """
+    specs = {spec["name"]: spec for spec in specs}
+    sweep = {}
+    for line in text.splitlines():
+        line = line.split("#")[0].strip()
+        if not line:
+            continue
+        name, _, values = line.partition("=")
+        name = name.strip().removeprefix("--pipeline.model.")
+        if not values.strip():
+            raise ValueError(f'Expected "field = values", got "{line}"')
+        if name not in specs:
+            raise ValueError(f"{name} is not a field of the model config")
+        spec = specs[name]
+        if ".." in values:
+            if spec["kind"] not in ("int", "float"):
+                raise ValueError(f"{name} is not a number, list its values instead")
+            bounds, log, rest = values.partition(" log")
+            low, _, high = bounds.partition("..")
+            low, high = parse_value(spec, low), parse_value(spec, high)
+            log = bool(log)
+            if rest.strip() or low >= high or (log and low <= 0):
+                raise ValueError(f"Invalid range for {name}: {values.strip()}")
+            sweep[name] = (low, high, log)
+        else:
+            sweep[name] = [parse_value(spec, value) for value in values.split(",")]
+    if not sweep:
+        raise ValueError("Enter at least one field to sweep")
+    return sweep
+
+
+def round_float(value):
+    # 0.1 rather than 0.10000000000000002 in the configs and the results
+    return float(f"{value:.6g}")
+
+
+def get_range_points(low, high, log, points, integer):
+    """points values spread evenly over [low, high], on a log scale if log."""
+    if points == 1:
+        values = [math.sqrt(low * high) if log else (low + high) / 2]
+    elif log:
+        ratio = (high / low) ** (1 / (points - 1))
+        values = [low * ratio**i for i in range(points)]
+    else:
+        values = [low + (high - low) * i / (points - 1) for i in range(points)]
+    if integer:
+        # rounding can map several points to the same integer
+        return list(dict.fromkeys(round(value) for value in values))
+    return [round_float(value) for value in values]
+
+
+def sample_range(rng, low, high, log, integer):
+    if log:
+        value = math.exp(rng.uniform(math.log(low), math.log(high)))
+    else:
+        value = rng.uniform(low, high)
+    return round(value) if integer else round_float(value)
+
+
+def expand_sweep(sweep, specs, mode="grid", num_trials=8, points=3, seed=None):
+    """The field overrides of each trial of a sweep.
+
+    The grid is every combination, ranges contribute points values each. Random
+    mode draws num_trials combinations, ranges are sampled uniformly.
+    """
+    integer = {spec["name"]: spec["kind"] == "int" for spec in specs}
+    if mode == "grid":
+        axes = [
+            get_range_points(*values, points, integer[name])
+            if isinstance(values, tuple)
+            else values
+            for name, values in sweep.items()
+        ]
+        size = math.prod(len(axis) for axis in axes)
+        if size > MAX_TRIALS:
+            raise ValueError(
+                f"The grid has {size} trials, more than {MAX_TRIALS}. "
+                "Use fewer values or the random mode."
+            )
+        return [dict(zip(sweep, values)) for values in itertools.product(*axes)]
+    rng = random.Random(seed)
+    trials = []
+    for _ in range(min(num_trials, MAX_TRIALS)):
+        trials.append(
+            {
+                name: sample_range(rng, *values, integer[name])
+                if isinstance(values, tuple)
+                else rng.choice(values)
+                for name, values in sweep.items()
+            }
+        )
+    return trials
+
+
+class SweepTrial(WebUITrainer):
+    """One training run of a sweep, queued until a device is free."""
+
+    def __init__(self, index, config, overrides, timestamp, log=None):
+        super().__init__()
+        self.index = index
+        self.overrides = overrides
+        self.config = copy.deepcopy(config)
+        for key, value in overrides.items():
+            setattr(self.config.pipeline.model, key, value)
+        self.config.machine.num_devices = 1
+        # trials started in the same second would share an output folder otherwise
+        self.config.timestamp = f"{timestamp}_trial{index:03d}"
+        self.log = log  # JobLog receiving the worker's output
+        self.stopped = False  # stopped while it was queued
+        self.started = None
+        self.results = None  # final eval metrics, once they are written
+        self.stopped_at_rung = None  # rung where early termination stopped it
+        self.error = None  # why the trial could not be started
+
+    def start_on(self, device):
+        """Start the worker on the device-th GPU, or the CPU."""
+        if not self.is_running():
+            return self
+        env = None
+        if self.config.machine.device_type == "cuda":
+            env = {"CUDA_VISIBLE_DEVICES": str(device)}
+        if "viewer" in self.config.vis:
+            from nerfstudio.viewer_legacy.server import viewer_utils
+
+            # every trial on this machine needs a viewer port of its own
+            self.config.viewer.websocket_port = viewer_utils.get_free_port()
+        self.started = time.time()
+        self.start(
+            self.log,
+            final_eval=True,
+            env=env,
+            rung_steps=self.rung_steps,
+            rung_metric=self.rung_metric,
+        )
+        return self
+
+    def fail(self, error):
+        """Give up on a trial whose worker could not be started."""
+        self.error = error
+        self.started = None
+        if self.log is not None:
+            self.log.write(f"Could not start trial {self.index}: {error}")
+            self.log.close()
+
+    def is_running(self):
+        if self.error is not None:
+            return False
+        if self.process is None:
+            return not self.stopped
+        return self.process.is_alive()
+
+    def stop(self):
+        if self.process is None:
+            self.stopped = True
+            if self.log is not None:
+                self.log.close()
+        elif self.process.is_alive():
+            # the worker saves a checkpoint and skips the final eval
+            self.channel.send("stop")
+
+    def get_state(self):
+        if self.error is not None:
+            return "failed"
+        if self.process is None:
+            return "stopped" if self.stopped else "queued"
+        state = self.channel.read()["state"]
+        if self.process.is_alive():
+            # training is done, the final eval is still running
+            return "evaluating" if state == "completed" else state
+        if state not in ("completed", "stopped"):
+            return "failed"
+        if state == "stopped" and self.stopped_at_rung is not None:
+            return "stopped early"
+        return state
+
+    def get_rung(self):
+        """Number of rungs passed and the metric at the last one."""
+        if self.channel is None:
+            return 0, None
+        status = self.channel.read()
+        return int(status["rung"]), status["rung_value"]
+
+    def get_results(self):
+        if self.results is None and self.get_state() == "completed":
+            try:
+                self.results = json.loads(self.get_eval_path().read_text())["results"]
+            except (OSError, ValueError, KeyError):
+                self.results = {}
+        return self.results or {}
+
+    def get_elapsed(self):
+        if self.started is None:
+            return None
+        end = self.channel.read()["updated"] if not self.is_running() else time.time()
+        return max(end - self.started, 0.0)
+
+
+def get_rung_steps(min_steps, max_steps, eta):
+    """min_steps, min_steps * eta, min_steps * eta^2, ... below max_steps."""
+    steps = []
+    step = min_steps
+    while step < max_steps:
+        steps.append(step)
+        step *= eta
+    return steps
+
+
+class SuccessiveHalving:
+    """Asynchronous successive halving (ASHA) over the trials of a sweep.
+
+    The trials evaluate at each rung step. A trial continues only if its metric
+    is in the best 1/eta of all the trials that reached the rung so far, the
+    others are stopped and save their checkpoint. Nothing waits for a rung to
+    fill up, so the devices stay busy and the freed ones go to queued trials.
+    """
+
+    def __init__(self, min_steps, max_steps, eta=3, metric="psnr"):
+        self.rung_steps = get_rung_steps(min_steps, max_steps, eta)
+        self.eta = eta
+        self.metric = metric
+        self.recorded = [{} for _ in self.rung_steps]  # trial index -> metric
+
+    def should_stop(self, rung, index, value):
+        recorded = self.recorded[rung]
+        recorded[index] = value
+        ranked = sorted(
+            recorded.values(), reverse=self.metric not in LOWER_IS_BETTER
+        )
+        keep = math.ceil(len(ranked) / self.eta)
+        return ranked.index(value) >= keep
+
+    def update(self, trials):
+        """Record the rungs the trials reached since the last call."""
+        for trial in trials:
+            rung, value = trial.get_rung()
+            if rung == 0 or not trial.is_running() or trial.stopped_at_rung:
+                continue
+            if trial.index in self.recorded[rung - 1] or math.isnan(value):
+                continue
+            if self.should_stop(rung - 1, trial.index, value):
+                trial.stopped_at_rung = rung
+                trial.stop()
+
+
+class DevicePool(JobPool):
+    """JobPool running each trial on a device of its own, slot i is device i."""
+
+    def start_job(self, job, slot):
+        return job.start_on(slot)
+
+
+class Sweep:
+    """The trials of one sweep and their results."""
+
+    def __init__(self, trials, fields, scheduler=None):
+        self.trials = trials
+        self.fields = fields  # names of the swept fields, one column each
+        self.scheduler = scheduler  # SuccessiveHalving, None to run every trial out
+        if scheduler is not None:
+            threading.Thread(target=self.follow_rungs, daemon=True).start()
+
+    def follow_rungs(self):
+        while self.is_running():
+            self.scheduler.update(self.trials)
+            time.sleep(1.0)
+
+    def is_running(self):
+        return any(trial.is_running() for trial in self.trials)
+
+    def stop(self):
+        for trial in self.trials:
+            trial.stop()
+
+    def get_table(self):
+        """Results for a gr.Dataframe, the best PSNR first and unfinished trials last."""
+        results = [trial.get_results() for trial in self.trials]
+        metrics = sorted(
+            {name for result in results for name in result},
+            key=lambda name: (name.split("_")[0] not in MAIN_METRICS, name),
+        )
+        rows = []
+        for trial, result in zip(self.trials, results):
+            elapsed = trial.get_elapsed()
+            step = int(trial.channel.read()["step"]) if trial.channel else 0
+            rows.append(
+                [trial.index, trial.get_state(), step]
+                + [trial.overrides[name] for name in self.fields]
+                + self.get_rung_column(trial)
+                + [
+                    round(result[name], 4) if name in result else ""
+                    for name in metrics
+                ]
+                + [
+                    format_seconds(elapsed) if elapsed is not None else "",
+                    str(trial.config.get_base_dir()) if trial.started else "",
+                ]
+            )
+        if "psnr" in metrics:
+            column = len(rows[0]) - 2 - len(metrics) + metrics.index("psnr")
+            rows.sort(key=lambda row: (row[column] == "", -(row[column] or 0)))
+        return {
+            "headers": ["Trial", "State", "Step"]
+            + self.fields
+            + (["Last Rung"] if self.scheduler is not None else [])
+            + metrics
+            + ["Time", "Output"],
+            "data": rows,
+        }
+
+    def get_rung_column(self, trial):
+        if self.scheduler is None:
+            return []
+        rung, value = trial.get_rung()
+        if rung == 0:
+            return [""]
+        step = self.scheduler.rung_steps[rung - 1]
+        return [f"{self.scheduler.metric} {value:.4g} at {step}"]
+
+    def get_summary(self):
+        states = [trial.get_state() for trial in self.trials]
+        counts = {state: states.count(state) for state in dict.fromkeys(states)}
+        return f"{len(self.trials)} trials: " + ", ".join(
+            f"{count} {state}" for state, count in counts.items()
+        )
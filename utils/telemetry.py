@@ -0,0 +1,243 @@
+import asyncio
+import functools
+import os
+import threading
+import time
+from pathlib import Path
+
+import pandas as pd
+
+PAGE_SIZE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+CLOCK_TICKS = os.sysconf("SC_CLK_TCK") if hasattr(os, "sysconf") else 100
+METRICS = {
+    "steps_per_sec": "Steps / s",
+    "rays_per_sec": "Rays / s",
+    "rss_mb": "Memory (MB)",
+    "cpu_percent": "CPU (% of a core)",
+    "write_mb_per_sec": "Disk Writes (MB / s)",
+}
+
+
+parent_ids = {}  # pid -> parent pid, of every process seen by the last /proc scan
+parent_ids_lock = threading.Lock()  # the samplers of several jobs share it
+
+
+@functools.cache
+def has_children_files():
+    """Whether the kernel lists the children of each thread in /proc."""
+    return any(Path("/proc/self/task").glob("*/children"))
+
+
+def get_children(pid):
+    """Child pids of pid, from the children file of each of its threads."""
+    children = []
+    for children_path in (Path("/proc") / str(pid) / "task").glob("*/children"):
+        try:
+            children.extend(int(child) for child in children_path.read_text().split())
+        except OSError:
+            continue  # the thread or the process exited while reading
+    return children
+
+
+def scan_parent_ids():
+    """Parent pid of every process, only the stat files of new pids are read."""
+    with parent_ids_lock:
+        pids = {
+            int(path.name) for path in Path("/proc").iterdir() if path.name.isdigit()
+        }
+        for pid in list(parent_ids):
+            if pid not in pids:
+                del parent_ids[pid]
+        for pid in pids - parent_ids.keys():
+            try:
+                stat = (Path("/proc") / str(pid) / "stat").read_text()
+            except OSError:
+                continue  # exited while scanning
+            # the command name may contain spaces and parentheses, skip past it
+            parent_ids[pid] = int(stat[stat.rindex(")") + 2 :].split()[1])
+        children = {}
+        for pid, ppid in parent_ids.items():
+            children.setdefault(ppid, []).append(pid)
+        return children
+
+
+def get_process_tree(pid):
+    """pid and all its descendants.
+
+    The tree is walked down from pid through /proc/<pid>/task/*/children. Kernels
+    built without those files get a scan of /proc instead, which only reads the
+    parent pid of processes it has not seen before.
+    """
+    if has_children_files():
+        get_pid_children = get_children
+    else:
+        get_pid_children = scan_parent_ids().get
+    tree = [pid]
+    for parent in tree:
+        tree.extend(get_pid_children(parent) or [])
+    return tree
+
+
+def read_process_counters(pid):
+    """RSS bytes, CPU seconds and bytes written of pid and its descendants.
+
+    Shared pages are counted once per process, so the RSS of a process tree is an
+    upper bound. Returns None once pid has exited.
+    """
+    rss = cpu = written = 0
+    found = False
+    for member in get_process_tree(pid):
+        proc = Path("/proc") / str(member)
+        try:
+            fields = (proc / "stat").read_text()
+            fields = fields[fields.rindex(")") + 2 :].split()
+            if member == pid and fields[0] in "ZX":
+                # exited, waiting to be reaped
+                return None
+            rss += int((proc / "statm").read_text().split()[1]) * PAGE_SIZE
+            cpu += (int(fields[11]) + int(fields[12])) / CLOCK_TICKS
+            for line in (proc / "io").read_text().splitlines():
+                if line.startswith("write_bytes:"):
+                    written += int(line.split()[1])
+        except (OSError, ValueError, IndexError):
+            continue
+        found = found or member == pid
+    return (rss, cpu, written) if found else None
+
+
+class DownsampledSeries:
+    """Time series of a few metrics holding at most capacity points.
+
+    When it is full, the older half is averaged in pairs, so the recent past keeps
+    the sampling resolution and older data gets coarser instead of being dropped.
+    """
+
+    def __init__(self, capacity=240):
+        self.capacity = capacity
+        self.points = []  # (seconds since start, {metric: value or None})
+        self.lock = threading.Lock()
+
+    def append(self, t, values):
+        with self.lock:
+            self.points.append((t, values))
+            if len(self.points) > self.capacity:
+                half = self.capacity // 2
+                old = self.points[:half]
+                merged = [self.merge(old[i : i + 2]) for i in range(0, half, 2)]
+                self.points = merged + self.points[half:]
+
+    @staticmethod
+    def merge(points):
+        values = {}
+        for key in points[0][1]:
+            known = [value[key] for _, value in points if value[key] is not None]
+            values[key] = sum(known) / len(known) if known else None
+        return sum(t for t, _ in points) / len(points), values
+
+    def get_points(self):
+        with self.lock:
+            return list(self.points)
+
+
+class JobTelemetry:
+    """Sample the resource use and throughput of a job's process tree.
+
+    A daemon thread reads /proc every interval seconds until the process is gone.
+    For jobs with steps, read_step returns the current step, and rays_per_step
+    turns the step rate into a ray rate. The rates come from the step counter, so
+    a stalled job shows up as a drop right away. Only supported on Linux.
+    """
+
+    def __init__(
+        self, pid, read_step=None, rays_per_step=None, interval=2.0, capacity=240
+    ):
+        self.pid = pid
+        self.read_step = read_step
+        self.rays_per_step = rays_per_step
+        self.interval = interval
+        self.series = DownsampledSeries(capacity)
+        self.finished = False
+        self.started = time.time()
+
+    @staticmethod
+    def is_supported():
+        return Path("/proc/self/statm").exists()
+
+    def start(self):
+        if not self.is_supported():
+            self.finished = True
+            return self
+        threading.Thread(target=self.run, daemon=True).start()
+        return self
+
+    def run(self):
+        previous = None
+        while True:
+            now = time.time()
+            counters = read_process_counters(self.pid)
+            if counters is None:
+                break
+            rss, cpu, written = counters
+            values = {
+                "steps_per_sec": None,
+                "rays_per_sec": None,
+                "rss_mb": rss / 1e6,
+                "cpu_percent": None,
+                "write_mb_per_sec": None,
+            }
+            step = self.read_step() if self.read_step is not None else None
+            if previous is not None:
+                elapsed = now - previous[0]
+                # children exiting take their counters with them, never go negative
+                values["cpu_percent"] = max(cpu - previous[1], 0) / elapsed * 100
+                values["write_mb_per_sec"] = (
+                    max(written - previous[2], 0) / elapsed / 1e6
+                )
+                if step is not None:
+                    values["steps_per_sec"] = max(step - previous[3], 0) / elapsed
+                    if self.rays_per_step:
+                        values["rays_per_sec"] = (
+                            values["steps_per_sec"] * self.rays_per_step
+                        )
+            self.series.append(now - self.started, values)
+            previous = (now, cpu, written, step)
+            time.sleep(self.interval)
+        self.finished = True
+
+    def get_latest(self):
+        points = self.series.get_points()
+        if not points:
+            return "Waiting for the first sample..."
+        values = points[-1][1]
+        return " | ".join(
+            f"{label}: {values[key]:.1f}"
+            for key, label in METRICS.items()
+            if values.get(key) is not None
+        )
+
+    def get_frames(self):
+        """One DataFrame per metric, time in minutes, for gr.LinePlot."""
+        points = self.series.get_points()
+        frames = []
+        for key, label in METRICS.items():
+            rows = [
+                (t / 60, values[key])
+                for t, values in points
+                if values.get(key) is not None
+            ]
+            frames.append(pd.DataFrame(rows, columns=["Minutes", label]))
+        return frames
+
+    async def stream(self):
+        """Yield the latest values and the plots whenever a sample was added."""
+        seen = ()  # matches no sample time, so the first round always yields
+        while True:
+            finished = self.finished  # before reading, so the last sample is not missed
+            points = self.series.get_points()
+            latest = points[-1][0] if points else None
+            if latest != seen:
+                seen = latest
+                yield [self.get_latest()] + self.get_frames()
+            if finished:
+                return
+            await asyncio.sleep(self.interval)
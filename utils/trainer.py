@@ -1,26 +1,84 @@
+import json
+import multiprocessing
+import os
+import pickle
 import random
+import threading
+import time
+from typing import TYPE_CHECKING
 
 import numpy as np
 import yaml
-from torch import manual_seed
 
-from nerfstudio.engine.trainer import TrainerConfig
-from nerfstudio.scripts import train
-from nerfstudio.utils.rich_utils import CONSOLE
+from utils.logs import redirect_output
+from utils.profiling import StepProfiler
+from utils.status_channel import StatusChannel
+
+# torch and nerfstudio are imported where they are used, so the web-ui can start
+# without paying for them until training is actually requested
+if TYPE_CHECKING:
+    from nerfstudio.engine.trainer import TrainerConfig
+
+TRAINING_STATES = ("initializing", "training", "paused", "completed", "stopped", "failed")
+PUBLISH_INTERVAL = 0.25  # seconds between loss / throughput updates
+
+
+def run_worker(
+    config_data,
+    channel,
+    log_socket=None,
+    profile_every=0,
+    final_eval=False,
+    env=None,
+    rung_steps=(),
+    rung_metric="psnr",
+):
+    """Entry point of the training worker process.
+
+    env is applied before torch is imported, e.g. to pick the GPU with
+    CUDA_VISIBLE_DEVICES. config_data is the pickled TrainerConfig, unpickling it
+    imports nerfstudio and torch, so it is only unpickled after that.
+    """
+    os.environ.update(env or {})
+    redirect_output(log_socket)
+    webui_trainer = WebUITrainer()
+    webui_trainer.config = pickle.loads(config_data)
+    webui_trainer.channel = channel
+    webui_trainer.profile_every = profile_every
+    webui_trainer.final_eval = final_eval
+    webui_trainer.rung_steps = rung_steps
+    webui_trainer.rung_metric = rung_metric
+    try:
+        webui_trainer.launch()
+    except BaseException:
+        channel.publish(state="failed")
+        raise
+    if channel.read()["state"] != "stopped":
+        channel.publish(state="completed")
 
 
 class WebUITrainer:
     def __init__(self):
-        self.trainer = None
+        self.trainer = None  # nerfstudio trainer, only set in the process that trains
         self.config = None
+        self.channel = None  # status channel shared with the training worker
+        self.process = None  # training worker process, seen from the web-ui
+        self.profile_every = 0  # time every n-th step, 0 to not profile
+        self.profiler = None
+        self.final_eval = False  # evaluate on all eval images once training is done
+        # steps to evaluate at and publish rung_metric, for early termination
+        self.rung_steps = ()
+        self.rung_metric = "psnr"
 
     def train_loop(
         self,
         local_rank: int,
         world_size: int,
-        config: TrainerConfig,
+        config: "TrainerConfig",
         global_rank: int = 0,
     ):
+        from torch import manual_seed
+
         def _set_random_seed(seed) -> None:
             """Set randomness seed in torch and numpy"""
             random.seed(seed)
@@ -30,9 +88,163 @@ class WebUITrainer:
         _set_random_seed(config.machine.seed + global_rank)
         self.trainer = config.setup(local_rank=local_rank, world_size=world_size)
         self.trainer.setup()
+        if self.profile_every > 0 and global_rank == 0:
+            self.attach_profiler()
+        if self.channel is not None and global_rank == 0:
+            self.attach_channel()
+            if self.rung_steps:
+                self.attach_rungs()
         self.trainer.train()
+        if self.profiler is not None:
+            self.profiler.save(self.get_profile_dir())
+        stopped = self.channel is not None and self.channel.read()["state"] == "stopped"
+        if self.final_eval and global_rank == 0 and not stopped:
+            self.save_final_eval()
+
+    def get_profile_dir(self):
+        return self.config.get_base_dir() / "profile"
+
+    def get_eval_path(self):
+        return self.config.get_base_dir() / "final_eval.json"
+
+    def save_final_eval(self):
+        """Average the metrics over all eval images and save them as ns-eval does."""
+        metrics = self.trainer.pipeline.get_average_eval_image_metrics(get_std=True)
+        self.get_eval_path().write_text(
+            json.dumps(
+                {
+                    "experiment_name": self.config.experiment_name,
+                    "method_name": self.config.method_name,
+                    "results": metrics,
+                },
+                indent=2,
+            )
+        )
+
+    def attach_profiler(self):
+        """Time the phases of sampled training steps, see StepProfiler."""
+        import torch
+        from nerfstudio.engine.callbacks import (
+            TrainingCallback,
+            TrainingCallbackLocation,
+        )
+
+        synchronize = None
+        if torch.cuda.is_available() and self.config.machine.device_type == "cuda":
+            synchronize = torch.cuda.synchronize
+        profiler = StepProfiler(self.profile_every, synchronize=synchronize)
+        trainer = self.trainer
+        pipeline = trainer.pipeline
+        trainer.callbacks.append(
+            TrainingCallback(
+                [TrainingCallbackLocation.BEFORE_TRAIN_ITERATION],
+                lambda step: profiler.begin_step(step),
+            )
+        )
+        trainer.callbacks.append(
+            TrainingCallback(
+                [TrainingCallbackLocation.AFTER_TRAIN_ITERATION],
+                lambda step: profiler.end_step(),
+            )
+        )
+        pipeline.datamanager.next_train = profiler.phase(
+            "data", pipeline.datamanager.next_train
+        )
+        pipeline.get_train_loss_dict = profiler.phase(
+            "forward", pipeline.get_train_loss_dict, after_nested=True
+        )
+        trainer.optimizers.optimizer_scaler_step_all = profiler.phase(
+            "optimizer",
+            trainer.optimizers.optimizer_scaler_step_all,
+            gap_name="backward",
+        )
+        trainer.eval_iteration = profiler.phase(
+            "eval", trainer.eval_iteration, always=True
+        )
+        trainer.save_checkpoint = profiler.phase(
+            "checkpoint", trainer.save_checkpoint, always=True
+        )
+        self.profiler = profiler
+
+    def attach_rungs(self):
+        """Evaluate on all eval images at the rung steps and publish the metric.
+
+        The web-ui compares the trials of a sweep at each rung and stops the worst.
+        """
+        from nerfstudio.engine.callbacks import (
+            TrainingCallback,
+            TrainingCallbackLocation,
+        )
+
+        trainer = self.trainer
+        channel = self.channel
+        rung_steps = list(self.rung_steps)
+
+        def evaluate(step):
+            if step not in rung_steps:
+                return
+            metrics = trainer.pipeline.get_average_eval_image_metrics(step=step)
+            channel.publish(
+                rung=rung_steps.index(step) + 1,
+                # NaN for methods without the metric, they are never stopped
+                rung_value=metrics.get(self.rung_metric, float("nan")),
+            )
+
+        trainer.callbacks.append(
+            TrainingCallback([TrainingCallbackLocation.AFTER_TRAIN_ITERATION], evaluate)
+        )
+
+    def attach_channel(self):
+        """Publish the training progress and follow the web-ui's commands."""
+        trainer = self.trainer
+        channel = self.channel
+        train_iteration = trainer.train_iteration
+        last_publish = {"time": time.perf_counter(), "step": 0}
+
+        def publishing_train_iteration(step):
+            loss, loss_dict, metrics_dict = train_iteration(step)
+            now = time.perf_counter()
+            elapsed = now - last_publish["time"]
+            if elapsed >= PUBLISH_INTERVAL:
+                # loss.item() waits for the device, so only do it when publishing
+                channel.publish(
+                    step=step,
+                    loss=loss.item(),
+                    steps_per_sec=(step - last_publish["step"]) / elapsed,
+                )
+                last_publish["time"] = now
+                last_publish["step"] = step
+            else:
+                channel.publish(step=step)
+            return loss, loss_dict, metrics_dict
+
+        def follow_commands():
+            while True:
+                command = channel.poll(PUBLISH_INTERVAL)
+                if command == "pause":
+                    trainer.training_state = "paused"
+                elif command == "resume":
+                    trainer.training_state = "training"
+                elif command == "stop":
+                    channel.publish(state="stopped")
+                    if self.profiler is not None:
+                        self.profiler.save(self.get_profile_dir())
+                    trainer.shutdown()
+                    return
+                elif command == "save_profile" and self.profiler is not None:
+                    self.profiler.save(self.get_profile_dir())
+                    channel.publish(profile_saved=time.time())
+                # also picks up a pause from the viewer
+                if trainer.training_state in TRAINING_STATES:
+                    channel.publish(state=trainer.training_state)
+
+        trainer.train_iteration = publishing_train_iteration
+        channel.publish(state="training")
+        threading.Thread(target=follow_commands, daemon=True).start()
+
+    def setup_config(self):
+        from nerfstudio.utils.rich_utils import CONSOLE
 
-    def main(self):
         assert self.config is not None, "Config is not set"
         if self.config.data:
             CONSOLE.log("Using --data alias for --data.pipeline.datamanager.data")
@@ -56,6 +268,10 @@ class WebUITrainer:
         # print and save config
         self.config.print_to_terminal()
         self.config.save_config()
+
+    def launch(self):
+        from nerfstudio.scripts import train
+
         train.launch(
             main_func=self.train_loop,
             num_devices_per_machine=self.config.machine.num_devices,
@@ -65,3 +281,57 @@ class WebUITrainer:
             dist_url=self.config.machine.dist_url,
             config=self.config,
         )
+
+    def main(self):
+        """Train in the current process."""
+        self.setup_config()
+        self.launch()
+
+    def start(
+        self,
+        log=None,
+        profile_every=0,
+        final_eval=False,
+        env=None,
+        rung_steps=(),
+        rung_metric="psnr",
+    ):
+        """Train in a separate worker process that reports through self.channel.
+
+        The config is set up here so its output directory is known to the web-ui.
+        The worker's output goes to log, a JobLog, when one is given, and every
+        profile_every-th step is profiled when it is not 0. With final_eval, the
+        metrics over all eval images are written to get_eval_path() at the end.
+        env holds extra environment variables for the worker. At each of
+        rung_steps, rung_metric over all eval images is published as rung_value.
+        """
+        self.setup_config()
+        context = multiprocessing.get_context("spawn")
+        self.channel = StatusChannel(
+            fields=(
+                "step", "loss", "steps_per_sec", "profile_saved", "rung", "rung_value"
+            ),
+            states=TRAINING_STATES,
+            context=context,
+        )
+        log_socket = log.open_socket() if log is not None else None
+        self.process = context.Process(
+            target=run_worker,
+            args=(
+                # the process arguments are unpickled before run_worker applies env
+                pickle.dumps(self.config),
+                self.channel,
+                log_socket,
+                profile_every,
+                final_eval,
+                env,
+                rung_steps,
+                rung_metric,
+            ),
+        )
+        self.process.start()
+        if log_socket is not None:
+            log_socket.close()
+
+    def is_running(self):
+        return self.process is not None and self.process.is_alive()
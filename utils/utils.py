@@ -1,11 +1,11 @@
+import functools
 import os
 import subprocess
 import tkinter as tk
-from dataclasses import asdict, fields
+from dataclasses import fields
 from pathlib import Path
 from tkinter import filedialog
 import re
-from typing import Literal
 
 import gradio as gr
 
@@ -55,40 +55,58 @@ def run_cmd(cmd):
             )
 
 
-def generate_args(config, visible=True):
-    # config_dict = asdict(config)
-    # config_fields = fields(config)
-    # print(config_fields)
-    config_inputs = []
-    config_labels = []
+def get_arg_specs(config):
+    """Collect name, widget kind, Literal choices and default of each supported config field."""
+    specs = []
     for field in fields(config):
-        config_labels.append(field.name)
         value = getattr(config, field.name)
         type = field.type  # string
-        # print(field.name, value, type)
         # special case for Literal
         pattern = r"(?:typing_extensions\.Literal|typing\.Literal|Literal)\[(.*?)\]"
         matches = re.findall(pattern, str(type))
         if matches:
-            # print("matches", matches)
-            if isinstance(value, str):
-                values = matches[0].split(", ")
-                values = [value.strip("'\"()") for value in values]
-                # create a radio button
-                config_inputs.append(
-                    gr.Radio(
-                        choices=values,
-                        label=field.name,
-                        visible=visible,
-                        interactive=True,
-                        value=value,
-                    )
-                )
-        # if type is float, then add a textbox
+            if not isinstance(value, str):
+                continue
+            values = matches[0].split(", ")
+            values = [value.strip("'\"()") for value in values]
+            specs.append(
+                {"name": field.name, "kind": "radio", "choices": values, "default": value}
+            )
+        # bool has to be checked before int, as bool is a subclass of int
         elif isinstance(value, float):
+            specs.append({"name": field.name, "kind": "float", "default": value})
+        elif isinstance(value, bool):
+            specs.append({"name": field.name, "kind": "bool", "default": value})
+        elif isinstance(value, int):
+            specs.append({"name": field.name, "kind": "int", "default": value})
+        elif isinstance(value, str):
+            specs.append({"name": field.name, "kind": "str", "default": value})
+    return specs
+
+
+def build_args(specs, visible=True, values=None):
+    """Create the gr components described by specs, preferring values over defaults."""
+    values = values or {}
+    config_inputs = []
+    for spec in specs:
+        name = spec["name"]
+        value = values.get(name, spec["default"])
+        # if type is Literal, then add a radio
+        if spec["kind"] == "radio":
+            config_inputs.append(
+                gr.Radio(
+                    choices=spec["choices"],
+                    label=name,
+                    visible=visible,
+                    interactive=True,
+                    value=value,
+                )
+            )
+        # if type is float, then add a number with step
+        elif spec["kind"] == "float":
             config_inputs.append(
                 gr.Number(
-                    label=field.name,
+                    label=name,
                     value=value,
                     visible=visible,
                     interactive=True,
@@ -96,88 +114,118 @@ def generate_args(config, visible=True):
                 )
             )
         # if type is bool, then add a checkbox
-        elif isinstance(value, bool):
+        elif spec["kind"] == "bool":
             config_inputs.append(
-                gr.Checkbox(
-                    label=field.name, value=value, visible=visible, interactive=True
-                )
+                gr.Checkbox(label=name, value=value, visible=visible, interactive=True)
             )
         # if type is int, then add a number
-        elif isinstance(value, int):
+        elif spec["kind"] == "int":
             config_inputs.append(
                 gr.Number(
-                    label=field.name,
+                    label=name,
                     value=value,
                     visible=visible,
                     interactive=True,
                     precision=0,
                 )
             )
-        elif isinstance(value, str):
+        # if type is str, then add a textbox
+        else:
             config_inputs.append(
                 gr.Textbox(
-                    label=field.name,
+                    label=name,
                     lines=1,
                     value=value,
                     visible=visible,
                     interactive=True,
                 )
             )
-        else:
-            # erase the last one
-            config_labels.pop()
-            continue
+    return config_inputs
 
-    # print(config_dict)
-    # for key, value in config_dict.items():
-    #     # if type is float, then add a textbox
-    #     config_labels.append(key)
-    #     if isinstance(value, float):
-    #         config_inputs.append(
-    #             gr.Number(
-    #                 label=key, value=value, visible=visible, interactive=True, step=0.01
-    #             )
-    #         )
-    #     # if type is bool, then add a checkbox
-    #     elif isinstance(value, bool):
-    #         config_inputs.append(
-    #             gr.Checkbox(label=key, value=value, visible=visible, interactive=True)
-    #         )
-    #     # if type is int, then add a number
-    #     elif isinstance(value, int):
-    #         config_inputs.append(
-    #             gr.Number(
-    #                 label=key,
-    #                 value=value,
-    #                 visible=visible,
-    #                 interactive=True,
-    #                 precision=0,
-    #             )
-    #         )
-    #     # if type is Literal, then add a radio
-    #     # TODO: fix this
-    #     elif hasattr(value, "__origin__") and value.__origin__ is Literal:
-    #         print(value.__args__)
-    #         config_inputs.append(
-    #             gr.Radio(
-    #                 choices=value.__args__, label=key, visible=visible, interactive=True
-    #             )
-    #         )
-    #     # if type is str, then add a textbox
-    #     elif isinstance(value, str):
-    #         config_inputs.append(
-    #             gr.Textbox(
-    #                 label=key, lines=1, value=value, visible=visible, interactive=True
-    #             )
-    #         )
-    #     else:
-    #         # erase the last one
-    #         config_labels.pop()
-    #         continue
-    # print(config_inputs)
+
+def generate_args(config, visible=True):
+    specs = get_arg_specs(config)
+    config_inputs = build_args(specs, visible=visible)
+    config_labels = [spec["name"] for spec in specs]
     return config_inputs, config_labels
 
 
+def render_args(specs, form_values, key, values=None):
+    """Build a config form whose edits are kept in form_values.
+
+    form_values is a gr.State holding {key: {field: value}} for each browser
+    session, so a form built again in a gr.render block can show the session's
+    earlier inputs, passed as values, instead of the defaults.
+    """
+    config_inputs = build_args(specs, visible=True, values=values)
+    for spec, component in zip(specs, config_inputs):
+        # only edits by the user are sent, not values set by the server. Text is
+        # sent when the user leaves the field; gradio's Number has no blur event,
+        # so edits made while one is being sent are merged into the next one.
+        event = component.blur if spec["kind"] == "str" else component.input
+        event(
+            functools.partial(set_form_value, key, spec["name"]),
+            inputs=[component, form_values],
+            outputs=form_values,
+            # outside the queue, so it is applied before a click that ends the edit
+            queue=False,
+            show_progress="hidden",
+            trigger_mode="always_last",
+        )
+    return config_inputs
+
+
+def set_form_value(key, name, value, form_values):
+    form_values.setdefault(key, {})[name] = value
+    return form_values
+
+
+def get_form_args(specs, form_values, key):
+    """The field values of a form, the defaults for fields never edited."""
+    entered = (form_values or {}).get(key, {})
+    return {spec["name"]: entered.get(spec["name"], spec["default"]) for spec in specs}
+
+
+def render_form_groups(forms, form_values, values, selection, selected, titled=False):
+    """Build every config form in a gr.render block, showing the selected ones.
+
+    forms maps each key to its field specs, keys without specs get no form.
+    selection is the Radio or CheckboxGroup choosing the keys, selected its value
+    when the block is rendered; its changes only toggle which forms are visible.
+    """
+    keys = []
+    groups = []
+    for key, specs in forms.items():
+        if not specs:
+            continue
+        with gr.Group(visible=key in as_list(selected)) as group:
+            if titled:
+                gr.Markdown(key)
+            render_args(specs, form_values, key, values.get(key))
+        keys.append(key)
+        groups.append(group)
+    if groups:
+        selection.change(
+            functools.partial(show_forms, keys),
+            inputs=selection,
+            outputs=groups,
+            show_progress="hidden",
+        )
+
+
+def show_forms(keys, selected):
+    """Visibility updates of the forms of keys, showing the selected ones."""
+    updates = [gr.update(visible=key in as_list(selected)) for key in keys]
+    # gradio expects the bare value of a single output
+    return updates[0] if len(updates) == 1 else updates
+
+
+def as_list(selected):
+    if selected is None:
+        return []
+    return selected if isinstance(selected, list) else [selected]
+
+
 def get_folder_path(x):
     if len(x) > 0:
         x = x[0]
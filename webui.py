@@ -1,5 +1,9 @@
 import gradio as gr
 import argparse
+import time
+
+from utils.arg_spec_cache import arg_spec_cache
+from utils.profiling import ImportProfiler
 
 
 class WebUI:
@@ -9,6 +13,7 @@ class WebUI:
         self.run_in_new_terminal = args.run_in_new_terminal  # run in new terminal
         self.demo = gr.Blocks()
         self.tabs = []
+        self.setup_times = {}  # time in ms spent in each tab's setup_ui
         if args.enable_trainer_tab:
             from modules.trainer_tab import TrainerTab
 
@@ -35,13 +40,27 @@ class WebUI:
     def setup_ui(self):
         with self.demo:
             for tab in self.tabs:
+                start = time.perf_counter()
                 tab.setup_ui()
+                self.setup_times[type(tab).__name__] = (
+                    time.perf_counter() - start
+                ) * 1000
+            # tabs load their heavy parts when selected, but the first tab is
+            # already open when the page loads
+            if self.tabs and hasattr(self.tabs[0], "load_listener"):
+                self.demo.load(**self.tabs[0].load_listener)
+            # pushed updates every client follows for as long as it is connected
+            for tab in self.tabs:
+                for stream in getattr(tab, "session_streams", []):
+                    self.demo.load(**stream, inputs=None, concurrency_limit=None)
+        # persist the config field specs introspected while building the forms
+        arg_spec_cache.save()
 
     def launch(self, **kwargs):
         self.demo.launch(**kwargs)
 
 
-if __name__ == "__main__":
+def get_parser() -> argparse.ArgumentParser:
     parser = argparse.ArgumentParser(
         prog="nerfstudio webui",
         description="A gradio based web-ui for nerfstudio.",
@@ -144,10 +163,92 @@ if __name__ == "__main__":
         default=False,
         help="Use external methods in the Trainer tab",
     )
+    parser.add_argument(
+        "--lazy_config_forms",
+        action="store_true",
+        default=False,
+        help="Build only the form of the selected config, when it is selected, "
+        "instead of the forms of all the configs when the tab is opened",
+    )
+    parser.add_argument(
+        "--status_interval",
+        type=float,
+        default=0.5,
+        help="Minimum interval in seconds between pushed status updates",
+    )
+    parser.add_argument(
+        "--log_dir",
+        type=str,
+        default="logs",
+        help="Directory for the output of spawned jobs, empty to keep it in memory only",
+    )
+    parser.add_argument(
+        "--log_max_bytes",
+        type=int,
+        default=10_000_000,
+        help="Size at which a job's log file is rotated into a gzip file",
+    )
+    parser.add_argument(
+        "--log_backup_count",
+        type=int,
+        default=5,
+        help="Number of rotated gzip files kept per job",
+    )
+    parser.add_argument(
+        "--processing_cache_size",
+        type=float,
+        default=20,
+        help="Size limit in GB of the cache of processed datasets, 0 to disable it",
+    )
+    parser.add_argument(
+        "--export_cache_size",
+        type=float,
+        default=10,
+        help="Size limit in GB of the cache of exported files, 0 to disable it",
+    )
+    parser.add_argument(
+        "--profile_every",
+        type=int,
+        default=20,
+        help="Training steps between profiled steps when profiling is enabled",
+    )
+    parser.add_argument(
+        "--run_index_interval",
+        type=float,
+        default=30,
+        help="Seconds between rescans of root_dir for trained runs, 0 to rescan "
+        "only on request",
+    )
+    parser.add_argument(
+        "--telemetry_interval",
+        type=float,
+        default=2.0,
+        help="Seconds between the resource samples of a running job",
+    )
+    parser.add_argument(
+        "--profile_startup",
+        action="store_true",
+        default=False,
+        help="Print the import time (ms) of each module loaded while building the web-ui",
+    )
+    return parser
 
-    parsed_args: argparse.Namespace = parser.parse_args()
 
-    app = WebUI(parsed_args)
+if __name__ == "__main__":
+    parsed_args: argparse.Namespace = get_parser().parse_args()
+
+    if parsed_args.profile_startup:
+        profiler = ImportProfiler().start()
+        start = time.perf_counter()
+        app = WebUI(parsed_args)
+        elapsed = (time.perf_counter() - start) * 1000
+        profiler.stop()
+        print(profiler.report("Startup imports"))
+        for name, setup_time in app.setup_times.items():
+            print(f"{name}.setup_ui: {setup_time:.1f} ms")
+        print(f"WebUI built in {elapsed:.1f} ms")
+    else:
+        app = WebUI(parsed_args)
     app.launch(
         inbrowser=True,
         share=parsed_args.share,